@@ -4,7 +4,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
 
 db = SQLAlchemy()
-socketio = SocketIO(async_mode='eventlet', cors_allowed_origins="*")
+socketio = SocketIO(cors_allowed_origins="*")
 
 def create_app(test_config=None):
     app = Flask(__name__, static_folder='static', template_folder='templates')
@@ -12,15 +12,28 @@ def create_app(test_config=None):
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'kalambur')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///kalambury.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 'eventlet' (gunicorn) lub 'threading' - tryb ASGI (app/asgi.py) podmienia serwer Socket.IO
+    app.config['SOCKETIO_ASYNC_MODE'] = os.environ.get('SOCKETIO_ASYNC_MODE', 'eventlet')
+    # Token do /admin/* (nagłówek X-Admin-Token); bez niego panel jest wyłączony
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
 
     # 🟢 ZMIANA 2: Załaduj konfigurację testową, jeśli istnieje
     if test_config is not None:
         app.config.update(test_config)
     db.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(app, async_mode=app.config['SOCKETIO_ASYNC_MODE'])
 
-    from . import routes, sockets 
+    from . import routes, sockets, words, assets, sharding, rooms, admission, profiling, janitor, fanout, schema
     app.register_blueprint(routes.bp)
+    app.cli.add_command(words.words_cli)
+    app.cli.add_command(schema.schema_cli)
+    assets.init_app(app)
+    sharding.init_app(app)
+    rooms.init_app(app)
+    admission.init_app(app)
+    profiling.init_app(app)
+    janitor.init_app(app)
+    fanout.init_app(app)
     '''
     with app.app_context():
         # Upewnij się, że modele są zaimportowane przed tworzeniem tabel
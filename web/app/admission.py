@@ -0,0 +1,228 @@
+"""Kontrola przyjęć: pojemność pokoi, limity workera, kolejka i zrzucanie obciążenia.
+
+- Pojemność pokoju (Game.max_players) pilnuje licznik Game.player_count,
+  zwiększany warunkowym UPDATE ... WHERE player_count < max_players. To jedno
+  atomowe zapytanie (także między workerami), bez COUNT przy każdym dołączeniu.
+- Limity workera (MAX_SOCKETS graczy w grach, MAX_ACTIVE_ROOMS pokoi) liczone są
+  w pamięci procesu. Kto się nie mieści, czeka w kolejce FIFO i widzi swoją
+  pozycję (join_queued). Zwolnione miejsce zajmuje pierwszy pasujący z kolejki.
+- Gdy opóźnienie pętli zdarzeń przekracza SHED_LAG_MS, nowe dołączenia są
+  odrzucane (join_rejected z retry_after), a trwające pokoje grają dalej.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import update
+
+from . import socketio
+from .models import Game, db
+
+ADMITTED = 'admitted'
+QUEUED = 'queued'
+REJECTED = 'rejected'
+
+LAG_INTERVAL = 0.05
+# Wygładzanie pomiaru opóźnienia - pojedyncza czkawka nie zrzuca ruchu
+LAG_SMOOTHING = 0.3
+RETRY_AFTER = 5
+
+_limits = {'sockets': 0, 'rooms': 0, 'queue': 0, 'shed_lag': None}
+_state = {'open': 0, 'lag': 0.0, 'monitor': False}
+
+# sid -> game_id przyjętych graczy
+admitted = {}
+# game_id -> liczba przyjętych połączeń
+room_members = {}
+# sid -> (game_id, username) w kolejności przyjścia
+waiting = OrderedDict()
+# Decyzje zmieniają kilka struktur naraz; w trybie ASGI wołają je wątki różnych pokoi
+_lock = threading.RLock()
+
+
+# ---------- pojemność pokoju (baza) ----------
+
+def reserve_seat(game_id):
+    """Zajmuje miejsce w pokoju. Zatwierdza je commit wywołującego (razem z Player)."""
+    result = db.session.execute(
+        update(Game)
+        .where(Game.id == game_id, Game.player_count < Game.max_players)
+        .values(player_count=Game.player_count + 1)
+    )
+    return result.rowcount == 1
+
+
+def release_seat(game_id):
+    db.session.execute(
+        update(Game)
+        .where(Game.id == game_id, Game.player_count > 0)
+        .values(player_count=Game.player_count - 1)
+    )
+
+
+# ---------- limity workera i kolejka ----------
+
+def accept_connection():
+    """Twardy limit gniazd: przyjęci gracze + kolejka. Wywoływane przy connect."""
+    hard_limit = _limits['sockets'] + _limits['queue']
+    with _lock:
+        if _limits['sockets'] and _state['open'] >= hard_limit:
+            return False
+        _state['open'] += 1
+        return True
+
+
+def connection_closed(sid):
+    with _lock:
+        _state['open'] = max(0, _state['open'] - 1)
+        return release(sid)
+
+
+def lag_ms():
+    return _state['lag'] * 1000
+
+
+def is_overloaded():
+    return _limits['shed_lag'] is not None and _state['lag'] >= _limits['shed_lag']
+
+
+def _fits(game_id):
+    if _limits['sockets'] and len(admitted) >= _limits['sockets']:
+        return False
+    if _limits['rooms'] and game_id not in room_members and len(room_members) >= _limits['rooms']:
+        return False
+    return True
+
+
+def _admit(sid, game_id):
+    admitted[sid] = game_id
+    room_members[game_id] = room_members.get(game_id, 0) + 1
+
+
+def try_admit(sid, game_id, username):
+    """Decyzja dla join_game: (ADMITTED, None), (QUEUED, pozycja) albo (REJECTED, powód)."""
+    with _lock:
+        return _try_admit(sid, game_id, username)
+
+
+def _try_admit(sid, game_id, username):
+    current = admitted.get(sid)
+    if current == game_id:
+        return ADMITTED, None
+    if current is not None:
+        # Przejście do innego pokoju - zwolnione miejsce dostanie kolejka przy następnym release
+        _forget(sid)
+
+    if is_overloaded():
+        return REJECTED, 'overloaded'
+    if _fits(game_id):
+        waiting.pop(sid, None)
+        _admit(sid, game_id)
+        return ADMITTED, None
+
+    if sid not in waiting and _limits['queue'] and len(waiting) >= _limits['queue']:
+        return REJECTED, 'server_full'
+    waiting[sid] = (game_id, username)
+    return QUEUED, queue_position(sid)
+
+
+def queue_position(sid):
+    for position, queued_sid in enumerate(waiting, start=1):
+        if queued_sid == sid:
+            return position
+    return None
+
+
+def queued_sids():
+    """Kopia kolejki (sidy w kolejności pozycji)."""
+    with _lock:
+        return list(waiting)
+
+
+def _forget(sid):
+    waiting.pop(sid, None)
+    game_id = admitted.pop(sid, None)
+    if game_id is None:
+        return False
+    members = room_members.get(game_id, 0) - 1
+    if members > 0:
+        room_members[game_id] = members
+    else:
+        room_members.pop(game_id, None)
+    return True
+
+
+def release(sid):
+    """Zwalnia miejsce gracza. Zwraca listę (sid, game_id, username) przyjętych z kolejki."""
+    with _lock:
+        if not _forget(sid):
+            return []
+        return drain()
+
+
+def drain():
+    promoted = []
+    with _lock:
+        for queued_sid, (game_id, username) in list(waiting.items()):
+            if _limits['sockets'] and len(admitted) >= _limits['sockets']:
+                break
+            if _fits(game_id):
+                del waiting[queued_sid]
+                _admit(queued_sid, game_id)
+                promoted.append((queued_sid, game_id, username))
+    return promoted
+
+
+def stats():
+    with _lock:
+        return {
+            'open_sockets': _state['open'], 'admitted': len(admitted), 'active_rooms': len(room_members),
+            'waiting': len(waiting), 'loop_lag_ms': round(lag_ms(), 1), 'overloaded': is_overloaded()
+        }
+
+
+# ---------- opóźnienie pętli zdarzeń ----------
+
+def _record_lag(overshoot):
+    _state['lag'] += LAG_SMOOTHING * (max(0.0, overshoot) - _state['lag'])
+
+
+def _monitor_lag():
+    while True:
+        start = time.perf_counter()
+        socketio.sleep(LAG_INTERVAL)
+        _record_lag(time.perf_counter() - start - LAG_INTERVAL)
+
+
+async def _monitor_lag_async():
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        _record_lag(time.perf_counter() - start - LAG_INTERVAL)
+
+
+def start_loop_monitor():
+    """Tryb ASGI: pomiar opóźnienia na pętli asyncio (wywoływane z app/asgi.py)."""
+    if _limits['shed_lag'] is not None and not _state['monitor']:
+        _state['monitor'] = True
+        asyncio.get_running_loop().create_task(_monitor_lag_async())
+
+
+def init_app(app):
+    app.config.setdefault('MAX_SOCKETS', int(os.environ.get('MAX_SOCKETS', 5000)))
+    app.config.setdefault('MAX_ACTIVE_ROOMS', int(os.environ.get('MAX_ACTIVE_ROOMS', 1000)))
+    app.config.setdefault('ADMISSION_QUEUE_LIMIT', int(os.environ.get('ADMISSION_QUEUE_LIMIT', 1000)))
+    # 0 wyłącza zrzucanie obciążenia
+    app.config.setdefault('SHED_LAG_MS', float(os.environ.get('SHED_LAG_MS', 250)))
+
+    _limits.update(
+        sockets=app.config['MAX_SOCKETS'],
+        rooms=app.config['MAX_ACTIVE_ROOMS'],
+        queue=app.config['ADMISSION_QUEUE_LIMIT'],
+        shed_lag=app.config['SHED_LAG_MS'] / 1000.0 if app.config['SHED_LAG_MS'] else None
+    )
+    if _limits['shed_lag'] is not None and app.config['SOCKETIO_ASYNC_MODE'] == 'eventlet' and not _state['monitor']:
+        _state['monitor'] = True
+        socketio.start_background_task(_monitor_lag)
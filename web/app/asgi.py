@@ -0,0 +1,233 @@
+"""Tryb ASGI: handlery z sockets.py na asyncio (python-socketio AsyncServer + uvicorn).
+
+Pętla asyncio obsługuje połączenia, pakiety i rozsyłanie zdarzeń. Handlery zostają
+synchroniczne (ORM Flask-SQLAlchemy) i wykonują się w ograniczonej puli wątków
+- warstwie sesji bazy danych - więc zapytanie nigdy nie blokuje pętli. Wywołania
+Flask-SocketIO z handlerów (emit, join_room, ...) trafiają do `socketio.server`,
+który w tym trybie jest fasadą przekazującą je do pętli.
+
+Pod eventlet handler zmieniał stan w pamięci (rooms, connected_players, ...) bez
+przerwy na inne greenthready. W puli wątków handlery jednego pokoju są więc
+szeregowane (asyncio.Lock na game_id), a struktury wspólne dla wszystkich
+pokoi (rejestr połączeń, kontrola przyjęć) mają własne blokady.
+
+Uruchomienie: uvicorn run_asgi:app (albo RUNTIME=asgi w entrypoint.sh).
+Trasy Flask działają bez zmian, przez adapter WSGI -> ASGI.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio as python_socketio
+from asgiref.wsgi import WsgiToAsgi
+
+from . import admission, create_app, profiling, rooms, socketio
+
+# pool_size (5) + max_overflow (10) domyślnej puli SQLAlchemy - więcej wątków
+# i tak czekałoby na połączenie z bazą
+DEFAULT_HANDLER_THREADS = 15
+
+
+class DatabaseExecutor:
+    """Asynchroniczna warstwa sesji: wykonuje synchroniczny kod ORM poza pętlą.
+
+    Handler Flask-SocketIO zakłada własny kontekst żądania, więc każde wywołanie
+    dostaje osobną sesję Flask-SQLAlchemy, zamykaną przy teardown.
+    """
+
+    def __init__(self, max_workers):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kalambury-db')
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        # Jak asyncio.to_thread: wątek dostaje kopię kontekstu wywołującego zadania
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.pool, functools.partial(ctx.run, fn, *args))
+
+
+class SyncServerFacade:
+    """Synchroniczny interfejs `socketio.Server` nad AsyncServer.
+
+    Flask-SocketIO woła metody `socketio.server` z wątków handlerów; tutaj każda
+    taka operacja jest wykonywana w pętli asyncio, a wątek czeka na jej koniec,
+    więc kolejność emisji z jednego handlera jest zachowana.
+    """
+
+    def __init__(self, runtime):
+        self._runtime = runtime
+        self._async_server = runtime.sio
+
+    def __getattr__(self, name):
+        # manager, environ, eio, handlers, ... - bezpośrednio z AsyncServer
+        return getattr(self._async_server, name)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._runtime.loop).result()
+
+    def emit(self, event, *args, **kwargs):
+        kwargs.pop('broadcast', None)
+        data = args[0] if len(args) == 1 else (tuple(args) if args else None)
+        return self._call(self._async_server.emit(event, data, **kwargs))
+
+    def send(self, data, **kwargs):
+        return self.emit('message', data, **kwargs)
+
+    def enter_room(self, sid, room, namespace=None):
+        return self._call(self._async_server.enter_room(sid, room, namespace=namespace))
+
+    def leave_room(self, sid, room, namespace=None):
+        return self._call(self._async_server.leave_room(sid, room, namespace=namespace))
+
+    def close_room(self, room, namespace=None):
+        return self._call(self._async_server.close_room(room, namespace=namespace))
+
+    def disconnect(self, sid, namespace=None, ignore_queue=False):
+        return self._call(self._async_server.disconnect(sid, namespace=namespace, ignore_queue=ignore_queue))
+
+    def participants(self, namespace, room):
+        """Członkowie pokoju {sid: eio_sid}. Pokoje zmienia pętla - tam też je czytamy."""
+        async def read():
+            return dict(self._async_server.manager.get_participants(namespace, room))
+        return self._call(read())
+
+    def dispatch_event(self, sid, event, data, namespace='/'):
+        """Obsługuje zdarzenie tak, jakby przysłał je klient sid - pod blokadą jego pokoju.
+
+        Wywoływane z handlera innego (albo tego samego) pokoju, więc nie czekamy
+        na wynik: czekanie na blokadę pokoju, trzymając własną, groziłoby
+        zakleszczeniem. Gdy handlery nie są zadaniami w tle (klient testowy),
+        zdarzenia i tak idą po kolei - obsługujemy je od razu w tym wątku, jak pod eventlet.
+        """
+        if not self._async_server.async_handlers:
+            return self._runtime.handlers[namespace][event](sid, data)
+
+        ctx = contextvars.copy_context()
+
+        async def in_caller_context():
+            return await asyncio.get_running_loop().create_task(
+                self._async_server._trigger_event(event, namespace, sid, data), context=ctx
+            )
+
+        asyncio.run_coroutine_threadsafe(in_caller_context(), self._runtime.loop)
+
+    def get_environ(self, sid, namespace=None):
+        environ = self._async_server.get_environ(sid, namespace=namespace)
+        if environ is not None:
+            environ.setdefault('flask.app', self._runtime.app)
+        return environ
+
+    def on(self, event, handler=None, namespace=None):
+        if handler is None:
+            return lambda h: self.on(event, h, namespace)
+        self._runtime.register_handler(event, handler, namespace)
+        return handler
+
+    # Zadania w tle (janitor, nasłuch lobby, ...) to zwykłe wątki - ich kod jest synchroniczny
+    def start_background_task(self, target, *args, **kwargs):
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def sleep(self, seconds=0):
+        time.sleep(seconds)
+
+
+class AsgiRuntime:
+    """Przenosi handlery zarejestrowane w Flask-SocketIO na AsyncServer."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = None
+        self._loop_thread = None
+        self.db = DatabaseExecutor(app.config.get('ASGI_HANDLER_THREADS', DEFAULT_HANDLER_THREADS))
+        self.sio = python_socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+        # game_id -> asyncio.Lock; wpis znika, gdy żaden handler pokoju nie trzyma blokady
+        self._room_locks = weakref.WeakValueDictionary()
+        # namespace -> {zdarzenie: synchroniczny handler z sockets.py}
+        self.handlers = {}
+        self.sio.on('connect', self._on_connect)
+
+        # Handlery z sockets.py zostały zarejestrowane w synchronicznym serwerze
+        # Flask-SocketIO podczas create_app - przepinamy je na AsyncServer
+        sync_server = socketio.server
+        for namespace, handlers in sync_server.handlers.items():
+            for event, handler in handlers.items():
+                self.register_handler(event, handler, namespace)
+        socketio.server = SyncServerFacade(self)
+
+        self.asgi_app = python_socketio.ASGIApp(
+            self.sio, other_asgi_app=WsgiToAsgi(app), on_startup=self._on_startup
+        )
+
+    def register_handler(self, event, handler, namespace=None):
+        if event == 'connect':
+            return
+        self.handlers.setdefault(namespace or '/', {})[event] = handler
+
+        async def async_handler(sid, *args):
+            async with self.room_lock(sid, args):
+                return await self.db.run(handler, sid, *args)
+
+        self.sio.on(event, async_handler, namespace=namespace)
+
+    def room_lock(self, sid, args):
+        """Blokada pokoju, którego dotyczy zdarzenie (zdarzenia bez pokoju dzielą jedną)."""
+        try:
+            game_id = int(profiling.event_game_id(sid, args))
+        except (ValueError, TypeError):
+            game_id = None
+        lock = self._room_locks.get(game_id)
+        if lock is None:
+            lock = self._room_locks[game_id] = asyncio.Lock()
+        return lock
+
+    async def _on_startup(self):
+        self.loop = asyncio.get_running_loop()
+        rooms.install_sigterm_handler(self.app)
+        profiling.start_loop_heartbeat()
+        admission.start_loop_monitor()
+
+    async def _on_connect(self, sid, environ, auth=None):
+        self.loop = asyncio.get_running_loop()
+        environ['flask.app'] = self.app
+        # Odpowiednik on_connect z sockets.py (handler 'connect' nie jest przepinany)
+        if not admission.accept_connection():
+            return False
+
+    def start_loop_thread(self):
+        """Własna pętla w wątku w tle - dla testów i uruchomień bez uvicorna."""
+        if self._loop_thread is None:
+            self.loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self._loop_thread.start()
+        return self.loop
+
+    def run(self, coro):
+        """Wykonuje korutynę w pętli i czeka na wynik (z innego wątku).
+
+        Zadanie dostaje kontekst wątku wywołującego - handler widzi np. kontekst
+        aplikacji testu, tak jak test client Flask-SocketIO w trybie eventlet.
+        """
+        ctx = contextvars.copy_context()
+
+        async def in_caller_context():
+            return await asyncio.get_running_loop().create_task(coro, context=ctx)
+
+        return asyncio.run_coroutine_threadsafe(in_caller_context(), self.start_loop_thread()).result()
+
+
+def install(app):
+    """Przełącza już utworzoną aplikację na AsyncServer. Zwraca AsgiRuntime."""
+    runtime = AsgiRuntime(app)
+    app.extensions['asgi_runtime'] = runtime
+    return runtime
+
+
+def create_asgi_app(test_config=None):
+    config = {'SOCKETIO_ASYNC_MODE': 'threading'}
+    config.update(test_config or {})
+    return install(create_app(config)).asgi_app
@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import json
+import os
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+
+# Pliki statyczne budowane z odciskiem treści (ścieżki względem app/static)
+ASSETS = [
+    'game.js',
+    'vendor/socket.io.min.js',
+]
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Manifesty ostatnich buildów - na ich podstawie wiemy, które pliki jeszcze zostawić
+HISTORY_NAME = 'builds.json'
+# Tyle buildów zostaje w dist: strony wydane przed wdrożeniem (i trzymane w cache
+# jako immutable) wciąż wskazują pliki poprzedniej wersji
+KEEP_BUILDS = 3
+# Nie kompresujemy plików, na których gzip nic nie zyska
+MIN_COMPRESS_SIZE = 256
+
+assets_cli = AppGroup('assets', help='Budowanie plików statycznych.')
+
+
+def _hashed_name(path, content):
+    base, ext = os.path.splitext(path)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f"{base}.{digest}{ext}"
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def _prune(dist_dir, manifests):
+    """Usuwa z dist_dir pliki, których nie wskazuje żaden z podanych manifestów."""
+    prefix = os.path.basename(dist_dir) + '/'
+    keep = {MANIFEST_NAME, HISTORY_NAME}
+    for manifest in manifests:
+        for path in manifest.values():
+            name = path[len(prefix):] if path.startswith(prefix) else path
+            keep.update((name, name + '.gz'))
+
+    for root, dirs, files in os.walk(dist_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, dist_dir).replace(os.sep, '/') not in keep:
+                os.remove(path)
+        if root != dist_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def build_assets(static_dir, dist_dir, assets=ASSETS, keep_builds=KEEP_BUILDS):
+    """Kopiuje pliki do dist_dir z hashem w nazwie i wersją .gz obok.
+
+    Pliki `keep_builds` ostatnich buildów (łącznie z tym) zostają, starsze są
+    usuwane. Zwraca manifest {nazwa źródłowa: ścieżka w dist}, który zapisujemy
+    też jako dist_dir/manifest.json.
+    """
+    # Sprzątamy zawartość, a nie sam katalog - w dockerze to punkt montowania wolumenu
+    os.makedirs(dist_dir, exist_ok=True)
+    history = _read_json(os.path.join(dist_dir, HISTORY_NAME))
+    if not isinstance(history, list):
+        # Katalog z buildu sprzed historii - zostawiamy przynajmniej poprzedni manifest
+        previous = _read_json(os.path.join(dist_dir, MANIFEST_NAME))
+        history = [previous] if isinstance(previous, dict) else []
+
+    manifest = {}
+    for name in assets:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            content = f.read()
+
+        hashed = _hashed_name(name, content)
+        target = os.path.join(dist_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+
+        if len(content) >= MIN_COMPRESS_SIZE:
+            # mtime=0 - ten sam plik wejściowy daje zawsze identyczny .gz
+            with open(target + '.gz', 'wb') as raw, gzip.GzipFile(
+                filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0
+            ) as gz:
+                gz.write(content)
+
+        manifest[name] = f"{os.path.basename(dist_dir)}/{hashed}"
+
+    history = (history + [manifest])[-keep_builds:]
+    _write_json(os.path.join(dist_dir, MANIFEST_NAME), manifest)
+    _write_json(os.path.join(dist_dir, HISTORY_NAME), history)
+    _prune(dist_dir, history)
+    return manifest
+
+
+def load_manifest(app):
+    """Wczytuje manifest buildu (pusty słownik, jeśli build nie był uruchomiony)."""
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(name):
+    """URL pliku statycznego - wersja z hashem z manifestu lub zwykły plik (dev)."""
+    manifest = current_app.extensions.get('assets_manifest')
+    if not manifest:
+        manifest = load_manifest(current_app)
+        # Brak manifestu nie trafia do pamięci - shard z BUILD_ASSETS=0 mógł wystartować,
+        # zanim web1 zbudował dist/, i do końca życia serwowałby pliki bez hasha
+        if manifest:
+            current_app.extensions['assets_manifest'] = manifest
+    return url_for('static', filename=manifest.get(name, name))
+
+
+def init_app(app):
+    app.add_template_global(asset_url)
+    app.cli.add_command(assets_cli)
+
+
+@assets_cli.command('build')
+def build_command():
+    """Buduje pliki statyczne z hashem w nazwie i wersjami .gz."""
+    static_dir = current_app.static_folder
+    manifest = build_assets(static_dir, os.path.join(static_dir, DIST_DIR))
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
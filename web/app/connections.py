@@ -0,0 +1,78 @@
+"""Rejestr połączonych graczy: sid -> (gracz, gra) i gra -> sidy.
+
+Wpis jednego połączenia to obiekt z __slots__ (bez słownika na instancję),
+nazwa gracza jest internowana (te same obiekty str co klucze RoomState.scores),
+a ID gry to zwykły int. Indeks odwrotny gra -> sidy pozwala sprawdzić, kto gra
+w pokoju, bez przechodzenia po wszystkich połączeniach workera.
+"""
+import sys
+import threading
+
+
+class Connection:
+    __slots__ = ('username', 'game_id')
+
+    def __init__(self, username, game_id):
+        self.username = username
+        self.game_id = game_id
+
+
+class ConnectionRegistry:
+    def __init__(self):
+        # sid -> Connection
+        self._by_sid = {}
+        # game_id -> set sidów
+        self._by_game = {}
+        # W trybie ASGI handlery różnych pokoi działają w osobnych wątkach naraz
+        self._lock = threading.Lock()
+
+    def add(self, sid, username, game_id):
+        """Rejestruje gracza połączenia sid w grze (ponowne dołączenie zastępuje poprzedni wpis)."""
+        connection = Connection(sys.intern(username), int(game_id))
+        with self._lock:
+            self._discard(sid)
+            self._by_sid[sid] = connection
+            self._by_game.setdefault(connection.game_id, set()).add(sid)
+        return connection
+
+    def get(self, sid, default=None):
+        return self._by_sid.get(sid, default)
+
+    def pop(self, sid, default=None):
+        with self._lock:
+            connection = self._discard(sid)
+        return default if connection is None else connection
+
+    def _discard(self, sid):
+        connection = self._by_sid.pop(sid, None)
+        if connection is not None:
+            sids = self._by_game.get(connection.game_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_game[connection.game_id]
+        return connection
+
+    def sids(self, game_id):
+        """Kopia sidów połączonych z grą - bezpieczna, gdy handlery w innych wątkach (ASGI) zmieniają rejestr."""
+        with self._lock:
+            return tuple(self._by_game.get(game_id, ()))
+
+    def is_playing(self, game_id, username):
+        """Czy któreś połączenie tego workera gra danym graczem w tej grze."""
+        for sid in self.sids(game_id):
+            connection = self._by_sid.get(sid)
+            if connection is not None and connection.username == username:
+                return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._by_sid.clear()
+            self._by_game.clear()
+
+    def __contains__(self, sid):
+        return sid in self._by_sid
+
+    def __len__(self):
+        return len(self._by_sid)
@@ -0,0 +1,200 @@
+"""Kolejki wychodzące pokoi: rozsyłanie zdarzeń poza handlerem.
+
+Handler nie wysyła zdarzenia do pokoju sam - dokłada je do kolejki pokoju
+(broadcast) i od razu wraca. Kolejkę opróżnia greenthread pokoju: każde
+zdarzenie jest kodowane raz i wysyłane do wszystkich nadążających graczy.
+
+Gracz, któremu w buforze gniazda (engineio) czeka więcej niż
+FANOUT_CLIENT_BUFFER pakietów, nie dostaje nowych zdarzeń od razu:
+- rysunek (draw_line, cofnięcia, czyszczenie) jest zwijany - zamiast
+  zaległych odcinków gracz dostanie jeden canvas_state ze stanem płótna,
+- pozostałe zdarzenia czekają w jego buforze (najwyżej FANOUT_CLIENT_BUFFER,
+  najstarsze są odrzucane).
+Gdy bufor gniazda spadnie poniżej połowy limitu, dostaje zaległe zdarzenia
+i stan płótna, a potem znów zdarzenia na bieżąco.
+"""
+import os
+import threading
+from collections import deque
+
+from . import socketio
+from .rooms import rooms
+
+CLIENT_BUFFER = 256
+# Jak często sprawdzamy, czy zaległy gracz już nadąża
+FLUSH_INTERVAL = 0.05
+# Zdarzenia rysunku - zaległe zastępuje jeden canvas_state
+DRAWING_EVENTS = frozenset({'draw_line', 'stroke_undone', 'stroke_redone', 'clear_drawing'})
+
+_settings = {'async': True, 'client_buffer': CLIENT_BUFFER}
+_stats = {'sent': 0, 'collapsed': 0, 'snapshots': 0, 'dropped': 0}
+_lock = threading.Lock()
+
+# game_id -> RoomQueue
+queues = {}
+
+
+class Backlog:
+    """Zaległości jednego gracza, który nie nadąża z odbiorem."""
+    __slots__ = ('held', 'snapshot')
+
+    def __init__(self):
+        self.held = deque(maxlen=_settings['client_buffer'])
+        self.snapshot = False
+
+
+class RoomQueue:
+    __slots__ = ('messages', 'draining', 'lagging')
+
+    def __init__(self):
+        # (event, data, to, skip_sid) w kolejności wywołań broadcast
+        self.messages = deque()
+        self.draining = False
+        # sid -> Backlog
+        self.lagging = {}
+
+
+def broadcast(game_id, event, data, to=None, skip_sid=None):
+    """Kolejkuje zdarzenie dla pokoju gry (albo jednego gracza w nim: to=sid).
+
+    Zdarzenia do pojedynczego gracza idą tą samą kolejką, gdy ich kolejność
+    względem zdarzeń pokoju ma znaczenie (np. your_word po game_started).
+    """
+    with _lock:
+        queue = queues.get(game_id)
+        if queue is None:
+            queue = queues[game_id] = RoomQueue()
+        queue.messages.append((event, data, to, skip_sid))
+        if queue.draining:
+            return
+        queue.draining = True
+    if _settings['async']:
+        socketio.start_background_task(_drain, game_id, queue)
+    else:
+        # Tryb synchroniczny (testy): jeden przebieg od razu w handlerze
+        _drain_once(game_id, queue)
+        _release(game_id, queue)
+
+
+def _drain(game_id, queue):
+    while True:
+        _drain_once(game_id, queue)
+        if _release(game_id, queue):
+            return
+        # Nowe zdarzenia obsługujemy od razu, na zaległych graczy czekamy
+        socketio.sleep(0 if queue.messages else FLUSH_INTERVAL)
+
+
+def _release(game_id, queue):
+    """Kończy opróżnianie, gdy nic już nie czeka. Zwraca True, jeśli zakończono."""
+    with _lock:
+        # W trybie synchronicznym zaległych sprawdzimy przy następnym broadcast
+        if queue.messages or (queue.lagging and _settings['async']):
+            return False
+        queue.draining = False
+        if not queue.lagging and queues.get(game_id) is queue:
+            del queues[game_id]
+        return True
+
+
+def _members(room_name):
+    """sid -> eio_sid graczy w pokoju Socket.IO.
+
+    W trybie ASGI kolejkę opróżnia wątek, a pokoje zmienia pętla asyncio -
+    odczyt idzie przez fasadę serwera (app/asgi.py), w pętli.
+    """
+    participants = getattr(socketio.server, 'participants', None)
+    if participants is not None:
+        return participants('/', room_name)
+    return dict(socketio.server.manager.get_participants('/', room_name))
+
+
+def _backlog_size(eio_sid):
+    sock = socketio.server.eio.sockets.get(eio_sid)
+    return sock.queue.qsize() if sock is not None else 0
+
+
+def _drain_once(game_id, queue):
+    """Wysyła zebrane zdarzenia, a zaległym graczom - ich zaległości, jeśli już nadążają."""
+    batch = []
+    while queue.messages:
+        batch.append(queue.messages.popleft())
+
+    room_name = f"game_{game_id}"
+    members = _members(room_name)
+    limit = _settings['client_buffer']
+    if batch:
+        for sid, eio_sid in members.items():
+            if sid not in queue.lagging and _backlog_size(eio_sid) > limit:
+                queue.lagging[sid] = Backlog()
+
+    for event, data, to, skip_sid in batch:
+        _deliver(queue, room_name, event, data, to, skip_sid)
+    _flush_lagging(game_id, queue, members, limit)
+
+
+def _deliver(queue, room_name, event, data, to, skip_sid):
+    if to is not None:
+        recipients = [to]
+    else:
+        recipients = [sid for sid in queue.lagging if sid != skip_sid]
+        skip = list(queue.lagging)
+        if skip_sid is not None:
+            skip.append(skip_sid)
+        socketio.emit(event, data, to=room_name, skip_sid=skip or None, namespace='/')
+        _stats['sent'] += 1
+
+    for sid in recipients:
+        backlog = queue.lagging.get(sid)
+        if backlog is None:
+            socketio.emit(event, data, to=sid, namespace='/')
+            _stats['sent'] += 1
+        elif event in DRAWING_EVENTS:
+            backlog.snapshot = True
+            _stats['collapsed'] += 1
+        else:
+            if len(backlog.held) == backlog.held.maxlen:
+                _stats['dropped'] += 1
+            backlog.held.append((event, data))
+
+
+def _flush_lagging(game_id, queue, members, limit):
+    for sid, backlog in list(queue.lagging.items()):
+        if sid not in members:
+            # Rozłączony albo wyszedł z pokoju - zaległości są już nikomu niepotrzebne
+            del queue.lagging[sid]
+            continue
+        if _backlog_size(members[sid]) > limit // 2:
+            continue
+        for event, data in backlog.held:
+            socketio.emit(event, data, to=sid, namespace='/')
+        if backlog.snapshot:
+            room = rooms.get(game_id)
+            strokes = list(room.strokes) if room is not None else []
+            undone = room.undone if room is not None else []
+            socketio.emit('canvas_state', {'strokes': strokes, 'undone': undone}, to=sid, namespace='/')
+            _stats['snapshots'] += 1
+        del queue.lagging[sid]
+
+
+def stats(top=10):
+    """Głębokość kolejek pokoi i zaległych graczy - do /admin/fanout."""
+    with _lock:
+        depths = {game_id: len(queue.messages) for game_id, queue in queues.items()}
+        lagging = {game_id: len(queue.lagging) for game_id, queue in queues.items() if queue.lagging}
+    deepest = sorted(depths.items(), key=lambda item: item[1], reverse=True)[:top]
+    return dict(
+        _stats,
+        async_mode=_settings['async'],
+        rooms_queued=len(depths),
+        queued_messages=sum(depths.values()),
+        lagging_clients=sum(lagging.values()),
+        deepest_rooms=[{'game_id': game_id, 'depth': depth} for game_id, depth in deepest],
+    )
+
+
+def init_app(app):
+    app.config.setdefault('FANOUT_ASYNC', os.environ.get('FANOUT_ASYNC', '1') != '0')
+    app.config.setdefault('FANOUT_CLIENT_BUFFER', int(os.environ.get('FANOUT_CLIENT_BUFFER', CLIENT_BUFFER)))
+    _settings['async'] = app.config['FANOUT_ASYNC']
+    _settings['client_buffer'] = app.config['FANOUT_CLIENT_BUFFER']
@@ -0,0 +1,176 @@
+"""Sprzątanie w tle: osierocone wpisy graczy i puste gry.
+
+Rozłączenie gracza nie sprawdza już, czy pokój opustoszał (COUNT + DELETE
++ emisja do całego serwera przy każdym disconnect). Robi to okresowo
+jeden greenthread, przechodząc po grach paczkami w kolejności Game.created_at:
+
+- gracz jest osierocony, gdy żaden socket tego workera nie gra nim w tej grze
+  przez dwa kolejne przebiegi (np. po awarii procesu albo wejściu przez
+  /join bez połączenia). Drugi przebieg daje czas na ponowne połączenie,
+- gra jest pusta, gdy nie ma graczy i albo ktoś w niej już grał (pokój jest
+  w app/rooms.py), albo istnieje dłużej niż JANITOR_EMPTY_GRACE,
+- pokój w pamięci bez gry w bazie (usuniętej na innym workerze albo przed
+  restartem, po którym wrócił z migawki) jest porzucany.
+
+Usunięcia z jednego przebiegu trafiają do lobby jednym zdarzeniem games_deleted.
+W trybie shardowanym każdy worker sprząta tylko swoje gry.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+
+from . import db, socketio
+from .models import Game, Player
+from .rooms import rooms, drop_room, is_shutting_down
+from .sharding import emit_lobby, owns_game
+
+JANITOR_INTERVAL = 30.0
+JANITOR_BATCH = 500
+JANITOR_EMPTY_GRACE = 300.0
+
+# ID graczy bez połączenia z poprzedniego przebiegu
+_suspects = set()
+
+
+def _is_live(game_id, username):
+    from .sockets import connected_players
+    return connected_players.is_playing(game_id, username)
+
+
+def _forget_player(game_id, username):
+    from .sockets import _forget_player
+    _forget_player(game_id, username)
+
+
+def _game_batches(batch_size):
+    """Paczki (id, created_at) gier w kolejności utworzenia (keyset po created_at, id)."""
+    last = None
+    while True:
+        query = select(Game.id, Game.created_at).order_by(Game.created_at, Game.id).limit(batch_size)
+        if last is not None:
+            query = query.where(or_(
+                Game.created_at > last[1],
+                and_(Game.created_at == last[1], Game.id > last[0])
+            ))
+        batch = db.session.execute(query).all()
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+        if len(batch) < batch_size:
+            return
+
+
+def _delete_players(player_ids):
+    """Usuwa graczy jednym DELETE i przelicza liczniki miejsc ich gier."""
+    game_ids = db.session.scalars(
+        select(Player.game_id).where(Player.id.in_(player_ids)).distinct()
+    ).all()
+    db.session.execute(
+        update(Game).where(Game.current_drawer_id.in_(player_ids)).values(current_drawer_id=None)
+    )
+    db.session.execute(delete(Player).where(Player.id.in_(player_ids)))
+    players_in_game = (
+        select(func.count(Player.id)).where(Player.game_id == Game.id).correlate(Game).scalar_subquery()
+    )
+    db.session.execute(
+        update(Game).where(Game.id.in_(game_ids)).values(player_count=players_in_game),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _delete_empty_games(game_ids):
+    """Usuwa gry, o ile nadal nie mają graczy (ktoś mógł właśnie dołączyć). Zwraca usunięte ID."""
+    has_players = exists().where(Player.game_id == Game.id)
+    return db.session.scalars(
+        delete(Game).where(Game.id.in_(game_ids), ~has_players).returning(Game.id),
+        execution_options={'synchronize_session': False}
+    ).all()
+
+
+def _drop_rooms_without_game():
+    """Porzuca pokoje, których gier nie ma już w bazie. Zwraca ich ID."""
+    game_ids = list(rooms)
+    if not game_ids:
+        return []
+    existing = set(db.session.scalars(select(Game.id).where(Game.id.in_(game_ids))))
+    gone = [game_id for game_id in game_ids if game_id not in existing]
+    for game_id in gone:
+        drop_room(game_id)
+    return gone
+
+
+def sweep(batch_size=JANITOR_BATCH, empty_grace=JANITOR_EMPTY_GRACE):
+    """Jeden przebieg sprzątania. Zwraca (liczba usuniętych graczy, lista usuniętych gier)."""
+    global _suspects
+    cutoff = datetime.utcnow() - timedelta(seconds=empty_grace)
+    suspects = set()
+    removed_players = 0
+    deleted_games = []
+
+    for batch in _game_batches(batch_size):
+        owned = {game_id: created_at for game_id, created_at in batch if owns_game(game_id)}
+        players = db.session.execute(
+            select(Player.id, Player.game_id, Player.username).where(Player.game_id.in_(list(owned)))
+        ).all()
+
+        orphans = []
+        occupied = set()
+        for player_id, game_id, username in players:
+            if _is_live(game_id, username):
+                occupied.add(game_id)
+            elif player_id in _suspects:
+                orphans.append((player_id, game_id, username))
+            else:
+                suspects.add(player_id)
+                occupied.add(game_id)
+        if orphans:
+            _delete_players([player_id for player_id, _, _ in orphans])
+            removed_players += len(orphans)
+            for _, game_id, username in orphans:
+                _forget_player(game_id, username)
+
+        empty = [
+            game_id for game_id, created_at in owned.items()
+            if game_id not in occupied and (game_id in rooms or created_at is None or created_at < cutoff)
+        ]
+        if empty:
+            deleted_games.extend(_delete_empty_games(empty))
+        db.session.commit()
+        # Oddajemy pętlę między paczkami
+        socketio.sleep(0)
+
+    _suspects = suspects
+    for game_id in deleted_games:
+        drop_room(game_id)
+    _drop_rooms_without_game()
+    if deleted_games:
+        emit_lobby('games_deleted', {'game_ids': deleted_games})
+    return removed_players, deleted_games
+
+
+def _run(app, interval):
+    while not is_shutting_down():
+        socketio.sleep(interval)
+        if is_shutting_down():
+            return
+        with app.app_context():
+            try:
+                removed_players, deleted_games = sweep(
+                    app.config['JANITOR_BATCH'], app.config['JANITOR_EMPTY_GRACE']
+                )
+            except Exception as e:
+                db.session.rollback()
+                print(f"BŁĄD janitora: {e}")
+                continue
+            if removed_players or deleted_games:
+                print(f"INFO: Janitor usunął {removed_players} graczy i {len(deleted_games)} pustych gier")
+
+
+def init_app(app):
+    app.config.setdefault('JANITOR_INTERVAL', float(os.environ.get('JANITOR_INTERVAL', JANITOR_INTERVAL)))
+    app.config.setdefault('JANITOR_BATCH', int(os.environ.get('JANITOR_BATCH', JANITOR_BATCH)))
+    app.config.setdefault('JANITOR_EMPTY_GRACE', float(os.environ.get('JANITOR_EMPTY_GRACE', JANITOR_EMPTY_GRACE)))
+    if app.config['JANITOR_INTERVAL']:
+        socketio.start_background_task(_run, app, app.config['JANITOR_INTERVAL'])
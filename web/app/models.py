@@ -1,6 +1,7 @@
 from . import db
 from datetime import datetime
 import enum
+import random
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -8,14 +9,19 @@ from werkzeug.security import generate_password_hash, check_password_hash
 class Game(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), default="Gra")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     is_private = db.Column(db.Boolean, default=False)
     password_hash = db.Column(db.String(512), nullable=True)
     max_players = db.Column(db.Integer, default=8)
+    # Zajęte miejsca - licznik utrzymywany przez app/admission.py (bez COUNT przy dołączaniu).
+    # W bazach sprzed tej kolumny dodaje i uzupełnia ją `flask schema upgrade` (app/schema.py)
+    player_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     round_time = db.Column(db.Integer, default=120)
     current_word = db.Column(db.String(200), nullable=True)
     current_drawer_id = db.Column(db.Integer, db.ForeignKey('player.id', ondelete='SET NULL'), nullable=True)
     creator = db.Column(db.String(64), nullable=False)
+    # Kategorie haseł wybrane dla pokoju (rozdzielone przecinkami, None = wszystkie)
+    categories = db.Column(db.String(255), nullable=True)
 
 # 👇 Główna relacja kaskadowego usuwania
     players = db.relationship(
@@ -41,13 +47,19 @@ class Game(db.Model):
             return False
         return check_password_hash(self.password_hash, pwd)
 
+    @property
+    def category_list(self):
+        if not self.categories:
+            return []
+        return [c for c in self.categories.split(',') if c]
+
 
 class Player(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80))
     score = db.Column(db.Integer, default=0)
     sid = db.Column(db.String(120), nullable=True)
-    game_id = db.Column(db.Integer, db.ForeignKey('game.id'))
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), index=True)
 
     # 👇 Dodaj foreign_keys=[game_id]
     game = db.relationship('Game', back_populates='players', foreign_keys=[game_id])
@@ -56,3 +68,16 @@ class Word(db.Model):
     __tablename__ = "word"
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(100), nullable=False, unique=True)
+    category = db.Column(db.String(50), nullable=True)
+    difficulty = db.Column(db.Integer, nullable=False, default=2, server_default='2')  # 1 - łatwe, 2 - średnie, 3 - trudne
+    # Losowy klucz z indeksem - losowanie hasła to jedno wyszukiwanie w indeksie
+    # zamiast ORDER BY random() na całej tabeli. W bazach sprzed tej kolumny
+    # uzupełnia ją `flask schema upgrade` (app/schema.py)
+    random_key = db.Column(db.Float, nullable=False, default=random.random)
+
+    __table_args__ = (
+        db.Index('ix_word_random_key', 'random_key'),
+        db.Index('ix_word_category_random_key', 'category', 'random_key'),
+        # Wyszukiwanie po prefiksie (LIKE 'abc%') w PostgreSQL niezależnie od collation
+        db.Index('ix_word_text_prefix', 'text', postgresql_ops={'text': 'text_pattern_ops'}),
+    )
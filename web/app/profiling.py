@@ -0,0 +1,288 @@
+"""Wykrywanie wolnych handlerów i zatrzymań pętli zdarzeń (opt-in, do produkcji).
+
+SLOW_HANDLER_MS > 0 włącza pomiar: każdy handler Socket.IO i widok Flask
+dłuższy niż próg trafia do historii z nazwą zdarzenia, game_id, zapytaniami
+SQL (treść i czas, bez parametrów) oraz stosem próbkowanym w trakcie działania.
+
+Watchdog to dwie części: greenthread (w trybie ASGI zadanie asyncio) co
+HEARTBEAT_INTERVAL zapisuje znacznik czasu, a zwykły wątek systemowy sprawdza,
+czy znacznik jest świeży. Jeśli pętla nie odezwała się przez HUB_STALL_MS,
+wątek zrzuca stos wątku pętli - czyli kod, który ją blokuje - i listę
+trwających handlerów. Historia jest dostępna pod /admin/slow.
+"""
+import asyncio
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import socketio
+
+HISTORY = 200
+HEARTBEAT_INTERVAL = 0.02
+DEFAULT_STALL_MS = 100
+# Limity pojedynczego wpisu - historia ma zostać mała także przy złośliwym handlerze
+MAX_SQL_STATEMENTS = 50
+MAX_STATEMENT_LENGTH = 500
+STACK_DEPTH = 30
+
+# Progi w sekundach; None = wyłączone
+_settings = {'slow': None, 'stall': None}
+
+records = deque(maxlen=HISTORY)
+
+# id -> wpis trwającego handlera/widoku (czyta go wątek watchdoga)
+_active = {}
+_ids = itertools.count()
+_current = contextvars.ContextVar('profiling_entry', default=None)
+
+# stall - trwające zatrzymanie pętli, zamykane przy następnym pulsie
+_watchdog = {'beat': None, 'hub_thread': None, 'started': False, 'stall': None}
+
+
+def _real_threading():
+    """Moduły threading/time bez łatek eventlet - watchdog musi być prawdziwym wątkiem."""
+    try:
+        from eventlet.patcher import original
+    except ImportError:
+        return threading, time
+    return original('threading'), original('time')
+
+
+_threading, _time = _real_threading()
+# Zegar pomiarów - testy podmieniają go na ręcznie przesuwany
+_now = time.perf_counter
+
+
+def is_enabled():
+    return _settings['slow'] is not None
+
+
+def enable(slow_ms, stall_ms=None):
+    _settings['slow'] = slow_ms / 1000.0
+    _settings['stall'] = stall_ms / 1000.0 if stall_ms else None
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def disable():
+    _settings['slow'] = None
+    _settings['stall'] = None
+
+
+# ---------- pomiar handlerów i widoków ----------
+
+def start(kind, name, game_id=None):
+    """Otwiera pomiar w bieżącym greenthreadzie/wątku. Zwraca wpis albo None."""
+    if _settings['slow'] is None:
+        return None
+    entry = {
+        'id': next(_ids), 'kind': kind, 'name': name, 'game_id': game_id,
+        'start': _now(), 'thread': _threading.get_ident(), 'greenlet': getcurrent(),
+        'sql': [], 'sql_count': 0, 'stack': None
+    }
+    entry['token'] = _current.set(entry)
+    _active[entry['id']] = entry
+    return entry
+
+
+def finish(entry):
+    if entry is None:
+        return
+    duration = _now() - entry['start']
+    _active.pop(entry['id'], None)
+    _current.reset(entry['token'])
+    if _settings['slow'] is not None and duration >= _settings['slow']:
+        records.append({
+            'kind': entry['kind'], 'name': entry['name'], 'game_id': entry['game_id'],
+            'at': time.time(), 'duration_ms': round(duration * 1000, 1),
+            'sql_count': entry['sql_count'], 'sql': entry['sql'], 'stack': entry['stack']
+        })
+
+
+@contextmanager
+def track(kind, name, game_id=None):
+    entry = start(kind, name, game_id)
+    try:
+        yield entry
+    finally:
+        finish(entry)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('profiling_start', []).append(_now())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    entry = _current.get()
+    if entry is None or not conn.info.get('profiling_start'):
+        return
+    elapsed = _now() - conn.info['profiling_start'].pop()
+    entry['sql_count'] += 1
+    if len(entry['sql']) < MAX_SQL_STATEMENTS:
+        entry['sql'].append({'ms': round(elapsed * 1000, 2), 'statement': statement[:MAX_STATEMENT_LENGTH]})
+
+
+def event_game_id(sid, args):
+    """Gra, której dotyczy zdarzenie Socket.IO (z danych albo z rejestru połączeń)."""
+    data = args[0] if args else None
+    if isinstance(data, dict):
+        return data.get('game_id') or data.get('room')
+    # disconnect i inne zdarzenia bez danych - gra z mapy połączonych graczy
+    from .sockets import connected_players
+    info = connected_players.get(sid)
+    return info.game_id if info else None
+
+
+def _profiled_handler(event_name, handler):
+    def profiled(sid, *args):
+        with track('event', event_name, event_game_id(sid, args)):
+            return handler(sid, *args)
+    return profiled
+
+
+def _before_request():
+    from flask import g, request
+    g.profiling_entry = start('view', request.endpoint, (request.view_args or {}).get('game_id'))
+
+
+def _teardown_request(exc=None):
+    from flask import g
+    finish(g.pop('profiling_entry', None))
+
+
+# ---------- watchdog ----------
+
+def _format_stack(frame):
+    if frame is None:
+        return None
+    return ''.join(traceback.format_stack(frame, limit=STACK_DEPTH))
+
+
+def _frame_of(entry):
+    # Greenthread czekający na I/O ma własną ramkę; działający (także blokujący
+    # pętlę) to po prostu bieżąca ramka swojego wątku
+    frame = entry['greenlet'].gr_frame if entry['greenlet'] is not None else None
+    return frame or sys._current_frames().get(entry['thread'])
+
+
+def _active_summary():
+    now = _now()
+    return [
+        {'kind': e['kind'], 'name': e['name'], 'game_id': e['game_id'],
+         'running_ms': round((now - e['start']) * 1000, 1)}
+        for e in list(_active.values())
+    ]
+
+
+def _sample_slow_handlers():
+    slow = _settings['slow']
+    now = _now()
+    for entry in list(_active.values()):
+        if entry['stack'] is None and now - entry['start'] >= slow:
+            entry['stack'] = _format_stack(_frame_of(entry))
+
+
+def _check():
+    """Jeden przebieg watchdoga: próbkuje wolne handlery i pilnuje pulsu pętli."""
+    if _settings['slow'] is None:
+        return
+    _sample_slow_handlers()
+
+    beat = _watchdog['beat']
+    if beat is None or _settings['stall'] is None:
+        return
+    stall = _watchdog['stall']
+    if stall is None and _now() - beat >= _settings['stall'] + HEARTBEAT_INTERVAL:
+        # Pętla milczy - zrzucamy to, co właśnie wykonuje jej wątek
+        _watchdog['stall'] = {
+            'kind': 'stall', 'name': None, 'game_id': None, 'at': time.time(), 'beat': beat,
+            'stack': _format_stack(sys._current_frames().get(_watchdog['hub_thread'])),
+            'active': _active_summary()
+        }
+    elif stall is not None and beat != stall['beat']:
+        duration = beat - stall.pop('beat') - HEARTBEAT_INTERVAL
+        stall['duration_ms'] = round(duration * 1000, 1)
+        records.append(stall)
+        _watchdog['stall'] = None
+
+
+def _watch():
+    while True:
+        _time.sleep(HEARTBEAT_INTERVAL)
+        _check()
+
+
+def _start_watchdog():
+    if _watchdog['started']:
+        return
+    _watchdog['started'] = True
+    _threading.Thread(target=_watch, name='kalambury-watchdog', daemon=True).start()
+
+
+def _heartbeat():
+    _watchdog['hub_thread'] = _threading.get_ident()
+    while True:
+        _watchdog['beat'] = _now()
+        socketio.sleep(HEARTBEAT_INTERVAL)
+
+
+async def _heartbeat_async():
+    _watchdog['hub_thread'] = _threading.get_ident()
+    while True:
+        _watchdog['beat'] = _now()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+def start_loop_heartbeat():
+    """Tryb ASGI: puls na pętli asyncio (wywoływane przy starcie z app/asgi.py)."""
+    if _settings['stall'] is not None and _watchdog['beat'] is None:
+        asyncio.get_running_loop().create_task(_heartbeat_async())
+        _start_watchdog()
+
+
+# ---------- raport ----------
+
+def report(kind=None, limit=HISTORY):
+    """Historia (najnowsze pierwsze) i trwające handlery - dla /admin/slow."""
+    history = [r for r in reversed(records) if kind is None or r['kind'] == kind][:limit]
+    return {
+        'enabled': is_enabled(),
+        'slow_handler_ms': _settings['slow'] * 1000 if is_enabled() else None,
+        'hub_stall_ms': _settings['stall'] * 1000 if _settings['stall'] is not None else None,
+        'active': _active_summary(),
+        'records': history
+    }
+
+
+def init_app(app):
+    app.config.setdefault('SLOW_HANDLER_MS', float(os.environ.get('SLOW_HANDLER_MS') or 0))
+    app.config.setdefault('HUB_STALL_MS', float(os.environ.get('HUB_STALL_MS') or DEFAULT_STALL_MS))
+    if not app.config['SLOW_HANDLER_MS']:
+        return
+
+    enable(app.config['SLOW_HANDLER_MS'], app.config['HUB_STALL_MS'])
+
+    # Handlery z sockets.py są już zarejestrowane - owijamy je w serwerze
+    # (tryb ASGI przepina potem te same, owinięte handlery na AsyncServer)
+    for handlers in socketio.server.handlers.values():
+        for event_name, handler in list(handlers.items()):
+            handlers[event_name] = _profiled_handler(event_name, handler)
+
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+
+    _start_watchdog()
+    if app.config['HUB_STALL_MS'] and app.config['SOCKETIO_ASYNC_MODE'] == 'eventlet':
+        socketio.start_background_task(_heartbeat)
@@ -0,0 +1,429 @@
+"""Stan pokoi w pamięci procesu i jego migawki na dysku (ciepły restart).
+
+Baza danych przechowuje gry i graczy, ale przebieg rundy (hasło, rysujący,
+wyniki, koniec rundy, ostatnie kreski) żyje tutaj. Migawka jest zapisywana
+okresowo i przy SIGTERM, a po starcie wczytywana, więc klienci łączący się
+ponownie wracają do trwającej rundy bez odtwarzania stanu z bazy.
+
+Okresowa migawka nie zatrzymuje huba: pokoje są kodowane paczkami
+(SNAPSHOT_CHUNK, z oddaniem pętli między nimi), a kompresja kresek, zapis
+i fsync idą do puli wątków eventlet (tpool).
+"""
+import itertools
+import json
+import os
+import signal
+import struct
+import time
+import zlib
+from collections import deque
+
+from . import socketio
+from .profiling import _real_threading
+
+# Ile ostatnich odcinków rysunku trzymamy na pokój (dla późno dołączających i restartu)
+RECENT_STROKES = 500
+# Ile cofniętych kresek można przywrócić (redo)
+REDO_DEPTH = 20
+SNAPSHOT_INTERVAL = 5.0
+# Ile pokoi kodujemy w migawce między oddaniami pętli
+SNAPSHOT_CHUNK = 10
+# Nagłówek pliku z wersją formatu
+SNAPSHOT_MAGIC = b'KALROOM1'
+_LENGTHS = struct.Struct('>II')
+
+# game_id -> RoomState
+rooms = {}
+
+# written - numer ostatniej zapisanej migawki
+_state = {'dirty': False, 'shutting_down': False, 'written': 0}
+# Migawka z wątku puli nie może zastąpić nowszej (np. zapisanej przy SIGTERM w trakcie).
+# Prawdziwa blokada - trzyma ją wątek puli, a nie greenthread
+_save_ids = itertools.count(1)
+_write_lock = _real_threading()[0].RLock()
+
+
+class RoomState:
+    """Bieżący stan jednego pokoju."""
+
+    def __init__(self, game_id, word=None, drawer=None, round_deadline=None, scores=None, strokes=None,
+                 last_stroke_id=0, current_stroke=None, undone=None):
+        self.game_id = game_id
+        self.word = word
+        self.drawer = drawer
+        # Czas uniksowy końca rundy - przeżywa restart procesu
+        self.round_deadline = round_deadline
+        # username -> punkty; kolejność kluczy to kolejność dołączania
+        self.scores = dict(scores or {})
+        # Odcinki jako [x1, y1, x2, y2, color, width, stroke_id]. Kreska to odcinki
+        # jednego pociągnięcia (od wciśnięcia do puszczenia myszy) o wspólnym ID
+        self._strokes = deque(strokes or (), maxlen=RECENT_STROKES)
+        # Kreski jako skompresowany JSON - pamięć podręczna zapisu i leniwego odczytu migawki
+        self._packed_strokes = None
+        # Rośnie przy każdej zmianie kresek - kompresja w wątku wie, czy jej wynik jest aktualny
+        self._strokes_version = 0
+        # ID nadaje serwer, rosnąco w obrębie pokoju - przeżywają restart razem z migawką
+        self.last_stroke_id = last_stroke_id
+        # Kreska, do której trafiają kolejne odcinki bez new_stroke
+        self.current_stroke = current_stroke
+        # Cofnięte kreski [stroke_id, odcinki], ostatnia na końcu
+        self.undone = list(undone or ())
+
+    @property
+    def strokes(self):
+        if self._strokes is None:
+            # Pokój z migawki: kreski dekodujemy dopiero, gdy ktoś ich potrzebuje
+            strokes = _unpack_strokes(self._packed_strokes)
+            if strokes is None:
+                # Uszkodzony blok - puste płótno zamiast błędu przy każdym join_game do pokoju
+                print(f"[SYSTEM] Uszkodzone kreski pokoju {self.game_id} w migawce - płótno wyczyszczone")
+                strokes = []
+                self._packed_strokes = None
+            self._strokes = deque(strokes, maxlen=RECENT_STROKES)
+        return self._strokes
+
+    def add_stroke(self, segment, new_stroke=False):
+        """Dodaje odcinek [x1, y1, x2, y2, color, width] do bieżącej kreski albo zaczyna nową.
+
+        Zwraca ID kreski. Nowa kreska kasuje historię redo, jak w każdym edytorze.
+        """
+        if new_stroke or self.current_stroke is None:
+            self.last_stroke_id += 1
+            self.current_stroke = self.last_stroke_id
+            self.undone.clear()
+        self.strokes.append([*segment, self.current_stroke])
+        self._strokes_changed()
+        return self.current_stroke
+
+    def undo_stroke(self):
+        """Cofa ostatnią kreskę. Zwraca jej ID albo None, gdy nie ma czego cofać."""
+        strokes = self.strokes
+        # Odcinki ze starej migawki nie mają ID kreski - tych nie cofamy
+        if not strokes or len(strokes[-1]) < 7:
+            return None
+        stroke_id = strokes[-1][6]
+        segments = []
+        # Jeden rysujący - odcinki kreski leżą w historii jeden po drugim, na końcu
+        while strokes and strokes[-1][6] == stroke_id:
+            segments.append(strokes.pop())
+        segments.reverse()
+        self.undone.append([stroke_id, segments])
+        del self.undone[:-REDO_DEPTH]
+        if self.current_stroke == stroke_id:
+            self.current_stroke = None
+        self._strokes_changed()
+        return stroke_id
+
+    def redo_stroke(self):
+        """Przywraca ostatnio cofniętą kreskę na koniec historii. Zwraca jej ID albo None."""
+        if not self.undone:
+            return None
+        stroke_id, segments = self.undone.pop()
+        self.strokes.extend(segments)
+        self._strokes_changed()
+        return stroke_id
+
+    def clear_strokes(self):
+        self._strokes = deque(maxlen=RECENT_STROKES)
+        self.current_stroke = None
+        self.undone = []
+        self._strokes_changed()
+
+    def _strokes_changed(self):
+        self._packed_strokes = None
+        self._strokes_version += 1
+        mark_dirty()
+
+    def strokes_json(self):
+        return json.dumps(list(self._strokes), separators=(',', ':')).encode('utf-8')
+
+    def packed_strokes(self):
+        if self._packed_strokes is None:
+            self._packed_strokes = zlib.compress(self.strokes_json(), 1)
+        return self._packed_strokes
+
+    def start_round(self, word, round_time):
+        self.word = word
+        self.round_deadline = time.time() + round_time
+        self.clear_strokes()
+
+    def end_round(self):
+        self.word = None
+        self.round_deadline = None
+        self.clear_strokes()
+
+    def remaining_time(self):
+        """Sekundy do końca rundy (None, jeśli runda nie trwa)."""
+        if not self.word or self.round_deadline is None:
+            return None
+        return max(0, int(round(self.round_deadline - time.time())))
+
+    def to_record(self):
+        return [
+            self.game_id, self.word, self.drawer, self.round_deadline, list(self.scores.items()),
+            self.last_stroke_id, self.current_stroke, self.undone
+        ]
+
+    @classmethod
+    def from_record(cls, record, packed_strokes):
+        game_id, word, drawer, round_deadline, scores, *stroke_state = record
+        # Migawki sprzed ID kresek mają tylko pięć pól
+        room = cls(game_id, word, drawer, round_deadline, scores, None, *stroke_state)
+        room._strokes = None
+        room._packed_strokes = packed_strokes
+        return room
+
+
+def _unpack_strokes(packed):
+    """Lista odcinków ze skompresowanego bloku migawki albo None, gdy blok jest uszkodzony."""
+    try:
+        strokes = json.loads(zlib.decompress(packed))
+    except (zlib.error, ValueError):
+        return None
+    if not isinstance(strokes, list) or not all(isinstance(segment, list) for segment in strokes):
+        return None
+    return strokes
+
+
+def get_room(game_id):
+    """Zwraca stan pokoju, tworząc pusty przy pierwszym użyciu."""
+    room = rooms.get(game_id)
+    if room is None:
+        room = rooms[game_id] = RoomState(game_id)
+        mark_dirty()
+    return room
+
+
+def drop_room(game_id):
+    if rooms.pop(game_id, None) is not None:
+        mark_dirty()
+
+
+def mark_dirty():
+    _state['dirty'] = True
+
+
+def is_shutting_down():
+    return _state['shutting_down']
+
+
+def _encode_rooms(chunk=None):
+    """Rekordy pokoi do migawki: (pokój, wersja kresek, rekord JSON, kreski).
+
+    Kreski to skompresowany blok z pamięci podręcznej albo - dla pokoi, które
+    rysowały od ostatniej migawki - surowy JSON do skompresowania (bytearray,
+    żeby odróżnić go od gotowego bloku). Z chunk oddaje pętlę co chunk pokoi.
+    """
+    entries = []
+    # Kopia listy - w trybie wątkowym (ASGI) handlery mogą dodawać pokoje w trakcie
+    for i, room in enumerate(list(rooms.values())):
+        if chunk and i and i % chunk == 0:
+            socketio.sleep(0)
+        record = json.dumps(room.to_record(), separators=(',', ':')).encode('utf-8')
+        strokes = room._packed_strokes
+        if strokes is None:
+            strokes = bytearray(room.strokes_json())
+        entries.append((room, room._strokes_version, record, strokes))
+    return entries
+
+
+def _build_snapshot(entries):
+    """Składa migawkę z zakodowanych pokoi, kompresując nowe kreski. Zwraca (dane, nowe bloki).
+
+    Po nagłówku każdy pokój to dwie długości (struct) i dwa bloki: rekord JSON
+    (hasło, rysujący, koniec rundy, wyniki) oraz skompresowane kreski. Kreski
+    są kodowane ponownie tylko po zmianie - zapis kosztuje tyle, ile pokoi
+    faktycznie rysowało od ostatniej migawki.
+    """
+    parts = [SNAPSHOT_MAGIC]
+    packed = []
+    for room, version, record, strokes in entries:
+        if isinstance(strokes, bytearray):
+            strokes = zlib.compress(strokes, 1)
+            packed.append((room, version, strokes))
+        parts.append(_LENGTHS.pack(len(record), len(strokes)))
+        parts.append(record)
+        parts.append(strokes)
+    return b''.join(parts), packed
+
+
+def _keep_packed(packed):
+    """Zapamiętuje skompresowane kreski pokoi, które nie zmieniły się w trakcie zapisu."""
+    for room, version, strokes in packed:
+        if room._strokes_version == version:
+            room._packed_strokes = strokes
+
+
+def dump_rooms():
+    """Serializuje wszystkie pokoje do zwartego formatu binarnego (patrz _build_snapshot)."""
+    data, packed = _build_snapshot(_encode_rooms())
+    _keep_packed(packed)
+    return data
+
+
+def load_rooms(data):
+    """Odtwarza rejestr pokoi z migawki. Zwraca liczbę przywróconych pokoi.
+
+    Kresek nie dekodujemy od razu (patrz RoomState.strokes), więc start nie czeka
+    na setki tysięcy odcinków, z których większości nikt nie zażąda.
+    """
+    if not data.startswith(SNAPSHOT_MAGIC):
+        return 0
+    view = memoryview(data)
+    offset = len(SNAPSHOT_MAGIC)
+    restored = {}
+    while offset < len(data):
+        record_len, strokes_len = _LENGTHS.unpack_from(view, offset)
+        offset += _LENGTHS.size
+        record = json.loads(bytes(view[offset:offset + record_len]))
+        offset += record_len
+        room = RoomState.from_record(record, bytes(view[offset:offset + strokes_len]))
+        offset += strokes_len
+        restored[room.game_id] = room
+    rooms.clear()
+    rooms.update(restored)
+    return len(rooms)
+
+
+def _write_file(path, data, save_id):
+    """Zapisuje migawkę atomowo (plik tymczasowy + fsync + rename), o ile nie ma już nowszej."""
+    tmp_path = f"{path}.{save_id}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        # Bez fsync po awarii systemu rename może przetrwać, a treść nie - zostałby pusty plik
+        f.flush()
+        os.fsync(f.fileno())
+    with _write_lock:
+        if save_id < _state['written']:
+            os.unlink(tmp_path)
+            return
+        os.replace(tmp_path, path)
+        _state['written'] = save_id
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def _build_and_write(path, entries, save_id):
+    data, packed = _build_snapshot(entries)
+    _write_file(path, data, save_id)
+    return len(data), packed
+
+
+def _run_in_tpool(func, *args):
+    """Wywołuje func w wątku puli eventlet - zlib i zapis zwalniają GIL, hub obsługuje w tym czasie gniazda."""
+    from eventlet import tpool
+    return tpool.execute(func, *args)
+
+
+def save_snapshot(path, chunk=None, offload=None):
+    """Zapisuje migawkę atomowo. Zwraca rozmiar pliku.
+
+    Bez argumentów wszystko dzieje się od razu (SIGTERM, testy, benchmark).
+    Pętla migawek koduje pokoje paczkami po chunk i przekazuje kompresję
+    oraz zapis do offload (np. _run_in_tpool).
+    """
+    # Zmiany w trakcie zapisu (pętla jest oddawana) trafią do następnej migawki
+    _state['dirty'] = False
+    save_id = next(_save_ids)
+    try:
+        entries = _encode_rooms(chunk)
+        if offload is None:
+            size, packed = _build_and_write(path, entries, save_id)
+        else:
+            size, packed = offload(_build_and_write, path, entries, save_id)
+    except BaseException:
+        _state['dirty'] = True
+        raise
+    _keep_packed(packed)
+    return size
+
+
+def _fsync_dir(path):
+    """Utrwala wpis katalogu po rename (POSIX; tam, gdzie się nie da, pomijamy)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def restore_snapshot(path):
+    """Wczytuje migawkę, jeśli istnieje. Zwraca liczbę przywróconych pokoi."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+    try:
+        return load_rooms(data)
+    except (ValueError, TypeError, struct.error) as e:
+        print(f"[SYSTEM] Nie udało się wczytać migawki pokoi {path}: {e}")
+        return 0
+
+
+def _snapshot_loop(path, interval, offload):
+    while True:
+        socketio.sleep(interval)
+        if _state['dirty'] and not _state['shutting_down']:
+            try:
+                save_snapshot(path, SNAPSHOT_CHUNK, offload)
+            except OSError as e:
+                print(f"BŁĄD zapisu migawki pokoi: {e}")
+
+
+def install_sigterm_handler(app):
+    """Zapisuje migawkę przy SIGTERM, a potem woła poprzedni handler (np. gunicorna).
+
+    uvicorn podmienia handlery sygnałów na czas działania serwera, więc tryb ASGI
+    wywołuje tę funkcję ponownie przy starcie (lifespan) - inaczej migawka
+    powstałaby dopiero po rozłączeniu wszystkich klientów.
+    """
+    path = app.config.get('ROOM_SNAPSHOT_PATH')
+    if not path:
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_sigterm(signum, frame):
+        # Od teraz rozłączenia to restart, a nie wyjście graczy - nie czyścimy bazy
+        _state['shutting_down'] = True
+        try:
+            save_snapshot(path)
+            print(f"[SYSTEM] Zapisano migawkę {len(rooms)} pokoi przed zamknięciem.")
+        except OSError as e:
+            print(f"BŁĄD zapisu migawki pokoi: {e}")
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            raise SystemExit(0)
+
+    try:
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    except ValueError:
+        # signal.signal działa tylko w głównym wątku
+        pass
+
+
+def init_app(app):
+    app.config.setdefault(
+        'ROOM_SNAPSHOT_PATH',
+        os.environ.get('ROOM_SNAPSHOT_PATH') or os.path.join(app.instance_path, 'rooms.snapshot')
+    )
+    app.config.setdefault('ROOM_SNAPSHOT_INTERVAL', SNAPSHOT_INTERVAL)
+    path = app.config['ROOM_SNAPSHOT_PATH']
+    if not path:
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    start = time.perf_counter()
+    restored = restore_snapshot(path)
+    if restored:
+        print(f"[SYSTEM] Przywrócono {restored} pokoi z migawki w {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+    # W trybie ASGI pętla migawek to zwykły wątek - zapis może iść w nim
+    offload = _run_in_tpool if app.config['SOCKETIO_ASYNC_MODE'] == 'eventlet' else None
+    socketio.start_background_task(_snapshot_loop, path, app.config['ROOM_SNAPSHOT_INTERVAL'], offload)
+    install_sigterm_handler(app)
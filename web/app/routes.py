@@ -1,6 +1,13 @@
-from flask import flash, Blueprint, render_template, request, redirect, url_for, session, current_app, jsonify
+import hmac
+
+from flask import abort, flash, Blueprint, render_template, request, redirect, url_for, session, current_app, jsonify, Response, stream_with_context
 from .models import Game, Player, Word
-from . import db
+from . import db, admission, fanout, profiling
+from .rooms import drop_room
+from .words import (
+    import_words_from_stream, export_lines, words_page, list_categories,
+    normalize_category, parse_difficulty, DIFFICULTY_LEVELS
+)
 from sqlalchemy.orm import joinedload
 
 bp = Blueprint('main', __name__)
@@ -35,13 +42,16 @@ def create_game():
         pwd = request.form.get('password')
         max_players = int(request.form.get('max_players') or 8)
         round_time = int(request.form.get('round_time') or 90)
-        g = Game(name=name, is_private=private, max_players=max_players,round_time=round_time, creator=username)
+        # Kategorie haseł dla pokoju - brak wyboru oznacza wszystkie hasła
+        categories = sorted({c for c in map(normalize_category, request.form.getlist('categories')) if c})
+        g = Game(name=name, is_private=private, max_players=max_players,round_time=round_time, creator=username,
+                 categories=','.join(categories) or None)
         if private and pwd:
             g.set_password(pwd)
         db.session.add(g)
         db.session.commit()
         return redirect(url_for('main.lobby'))
-    return render_template('create_game.html')
+    return render_template('create_game.html', categories=list_categories())
     
     
 @bp.route('/join/<int:game_id>', methods=['GET', 'POST'])
@@ -63,19 +73,24 @@ def join_game(game_id):
         if request.method == 'POST':
             password = request.form.get('password')
             if game.check_password(password):
-                p = Player(username=username, game_id=game_id)
-                db.session.add(p)
-                db.session.commit()
-                return redirect(url_for('main.game_view', game_id=game_id))
+                return _add_player(game_id, username)
             else:
                 return render_template('enter_password.html', game=game, error="Błędne hasło")
         return render_template('enter_password.html', game=game)
     else:
         # Gra publiczna
-        p = Player(username=username, game_id=game_id)
-        db.session.add(p)
-        db.session.commit()
-        return redirect(url_for('main.game_view', game_id=game_id))
+        return _add_player(game_id, username)
+
+
+def _add_player(game_id, username):
+    # Miejsce zajmujemy atomowo w tej samej transakcji co nowy Player
+    if not admission.reserve_seat(game_id):
+        db.session.rollback()
+        flash("Pokój jest pełny.", "warning")
+        return redirect(url_for('main.lobby'))
+    db.session.add(Player(username=username, game_id=game_id))
+    db.session.commit()
+    return redirect(url_for('main.game_view', game_id=game_id))
 
 @bp.route('/delete_game/<int:game_id>', methods=['POST'])
 def delete_game(game_id):
@@ -108,6 +123,8 @@ def delete_game(game_id):
         
         # 3. Pojedyncze zatwierdzenie transakcji.
         db.session.commit()
+        # Stan rundy w pamięci - inaczej kolejne migawki (i restarty) przywracałyby usunięty pokój
+        drop_room(game_id)
         
         flash(f"Pokój '{game.name}' został pomyślnie usunięty.", "success")
         
@@ -173,20 +190,97 @@ def manage_words():
             if existing:
                 flash("To hasło już istnieje!", "danger")
             else:
-                word = Word(text=new_word)
+                word = Word(
+                    text=new_word,
+                    category=normalize_category(request.form.get('category')),
+                    difficulty=parse_difficulty(request.form.get('difficulty'))
+                )
                 db.session.add(word)
                 db.session.commit()
                 flash("Hasło zostało dodane pomyślnie ✅", "success")
 
         return redirect(url_for('main.manage_words'))
 
-    words = Word.query.order_by(Word.id.desc()).all()
-    return render_template('manage_words.html', words=words)
+    prefix = request.args.get('q', '').strip()
+    words, next_cursor = words_page(prefix=prefix, after=request.args.get('after'))
+    return render_template(
+        'manage_words.html',
+        words=words,
+        q=prefix,
+        next_cursor=next_cursor,
+        categories=list_categories(),
+        difficulty_levels=DIFFICULTY_LEVELS
+    )
     
+@bp.route('/words/import', methods=['POST'])
+def import_words():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Nie wybrano pliku z hasłami.", "warning")
+        return redirect(url_for('main.manage_words'))
+
+    try:
+        stats = import_words_from_stream(
+            upload.stream,
+            category=request.form.get('category'),
+            difficulty=request.form.get('difficulty')
+        )
+    except UnicodeDecodeError:
+        flash("Plik musi być zapisany w kodowaniu UTF-8.", "danger")
+        return redirect(url_for('main.manage_words'))
+
+    flash(
+        f"Import zakończony: dodano {stats['inserted']}, duplikaty {stats['duplicates']}, "
+        f"pominięto {stats['skipped']} (wczytano {stats['read']}).",
+        "success"
+    )
+    return redirect(url_for('main.manage_words'))
+
+
+@bp.route('/words/export')
+def export_words():
+    # Strumieniujemy plik paczkami - cała lista nigdy nie trafia do pamięci
+    return Response(
+        stream_with_context(export_lines()),
+        mimetype='text/plain',
+        headers={'Content-Disposition': 'attachment; filename=hasla.txt'}
+    )
+
 @bp.route('/delete_word/<int:word_id>', methods=['POST'])
 def delete_word(word_id):
     from app import db
     word = Word.query.get_or_404(word_id)
     db.session.delete(word)
     db.session.commit()
-    return redirect(url_for('main.manage_words'))
\ No newline at end of file
+    return redirect(url_for('main.manage_words'))
+
+
+def _require_admin():
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        abort(403)
+
+
+@bp.route('/admin/slow')
+def admin_slow():
+    """Wolne handlery/widoki i zatrzymania pętli (app/profiling.py) jako JSON."""
+    _require_admin()
+    kind = request.args.get('kind') or None
+    limit = request.args.get('limit', profiling.HISTORY, type=int)
+    return jsonify(profiling.report(kind=kind, limit=limit))
+
+
+@bp.route('/admin/admission')
+def admin_admission():
+    """Stan kontroli przyjęć (app/admission.py): gniazda, pokoje, kolejka, opóźnienie pętli."""
+    _require_admin()
+    return jsonify(admission.stats())
+
+
+@bp.route('/admin/fanout')
+def admin_fanout():
+    """Kolejki wychodzące pokoi (app/fanout.py): głębokość, zaległi gracze, zwinięte rysunki."""
+    _require_admin()
+    return jsonify(fanout.stats())
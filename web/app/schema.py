@@ -0,0 +1,76 @@
+"""Uzupełnianie schematu istniejących baz (bez osobnego narzędzia migracji).
+
+db.create_all nie zmienia tabel, które już są - kolumny i indeksy dodane
+do modeli po utworzeniu bazy dokłada `flask schema upgrade` (entrypoint.sh,
+przed startem serwera). Każdy krok sprawdza stan bazy, więc polecenie można
+uruchamiać przy każdym starcie.
+"""
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, inspect, select, text, update
+
+from . import db
+from .models import Game, Player
+
+schema_cli = AppGroup('schema', help='Uzupełnianie schematu bazy.')
+
+
+def add_missing_columns(model, names):
+    """Dodaje brakujące kolumny modelu (ALTER TABLE ADD COLUMN). Zwraca nazwy dodanych.
+
+    Kolumna z server_default jest dodawana jako NOT NULL z tą wartością
+    domyślną (istniejące wiersze ją dostają), pozostałe - jako NULL.
+    """
+    table = model.__table__
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    added = []
+    with db.engine.begin() as connection:
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(db.engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+            connection.execute(text(ddl))
+            added.append(name)
+    return added
+
+
+def create_missing_indexes(model):
+    for index in model.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def upgrade_game_tables():
+    """Dostosowuje tabele game i player z bazy sprzed kategorii i limitów pokoi.
+
+    Stare gry dostają Game.categories = NULL (wszystkie kategorie), a licznik
+    Game.player_count jest uzupełniany z COUNT(player) - bez tego każda stara
+    gra wyglądałaby na pustą i przyjęłaby ponad max_players.
+    Zwraca nazwy dodanych kolumn gry.
+    """
+    if not inspect(db.engine).has_table(Game.__tablename__):
+        return []
+    added = add_missing_columns(Game, ('categories', 'player_count'))
+    create_missing_indexes(Game)
+    create_missing_indexes(Player)
+    if 'player_count' in added:
+        players_in_game = (
+            select(func.count(Player.id)).where(Player.game_id == Game.id).correlate(Game).scalar_subquery()
+        )
+        db.session.execute(update(Game).values(player_count=players_in_game),
+                           execution_options={'synchronize_session': False})
+        db.session.commit()
+    return added
+
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    """Dodaje brakujące kolumny i indeksy gier, graczy i haseł."""
+    from .words import upgrade_word_table
+    added = upgrade_game_tables()
+    if added:
+        click.echo(f"Tabela game: dodano kolumny {', '.join(added)}.")
+    filled = upgrade_word_table()
+    click.echo(f"Uzupełniono random_key dla {filled} haseł.")
@@ -0,0 +1,132 @@
+import bisect
+import json
+import os
+import select
+import struct
+import zlib
+
+from flask import current_app
+from sqlalchemy import text
+
+from . import db, socketio
+
+# Kanał PostgreSQL (LISTEN/NOTIFY) dla zdarzeń lobby w trybie shardowanym
+LOBBY_CHANNEL = 'kalambury_lobby'
+# Tyle punktów na serwer tworzy nginx (hash ... consistent) przy wadze 1
+POINTS_PER_NODE = 160
+
+
+class HashRing:
+    """Pierścień spójnego haszowania zgodny z `hash $key consistent` w nginx.
+
+    Punkty serwera to crc32(HOST \\0 PORT PREV_HASH), a klucz trafia do pierwszego
+    punktu >= crc32(klucz). Dzięki temu aplikacja wie, który worker obsługuje
+    daną grę, tak samo jak nginx, który kieruje do niego ruch.
+    """
+
+    def __init__(self, nodes, points_per_node=POINTS_PER_NODE):
+        self.nodes = list(nodes)
+        points = {}
+        for node in self.nodes:
+            host, _, port = node.rpartition(':')
+            if not port.isdigit():
+                host, port = node, ''
+            base = host.encode() + b'\0' + port.encode()
+            prev_hash = 0
+            for _ in range(points_per_node):
+                prev_hash = zlib.crc32(base + struct.pack('<I', prev_hash))
+                # Przy kolizji nginx zostawia pierwszy punkt
+                points.setdefault(prev_hash, node)
+        self._hashes = sorted(points)
+        self._nodes = [points[h] for h in self._hashes]
+
+    def node_for(self, key):
+        if not self._hashes:
+            return None
+        index = bisect.bisect_left(self._hashes, zlib.crc32(str(key).encode()))
+        return self._nodes[index % len(self._nodes)]
+
+
+def parse_nodes(value):
+    """'web1:5000, web2:5000' -> ['web1:5000', 'web2:5000']"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [node.strip() for node in value if node.strip()]
+
+
+def init_app(app):
+    app.config.setdefault('SHARD_NODES', parse_nodes(os.environ.get('SHARD_NODES')))
+    app.config.setdefault('SHARD_SELF', os.environ.get('SHARD_SELF'))
+    nodes = parse_nodes(app.config['SHARD_NODES'])
+    app.extensions['shard_ring'] = HashRing(nodes) if nodes else None
+
+    if nodes and app.config['SHARD_SELF'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        socketio.start_background_task(_listen_lobby, app)
+
+
+def is_sharded():
+    return current_app.extensions.get('shard_ring') is not None
+
+
+def owner_of(game_id):
+    """Adres workera, który obsługuje grę (None w trybie jednego procesu)."""
+    ring = current_app.extensions.get('shard_ring')
+    return ring.node_for(game_id) if ring else None
+
+
+def owns_game(game_id):
+    owner = owner_of(game_id)
+    return owner is None or owner == current_app.config['SHARD_SELF']
+
+
+def emit_lobby(event, data):
+    """Wysyła zdarzenie lobby do klientów wszystkich workerów.
+
+    Zdarzenia pokoju zostają lokalne (cały pokój siedzi w jednym procesie),
+    tylko zdarzenia lobby idą przez wspólny kanał. Każdy worker (także nadawca)
+    odbiera NOTIFY w _listen_lobby i emituje je swoim klientom.
+    """
+    if not is_sharded() or db.engine.dialect.name != 'postgresql':
+        socketio.emit(event, data)
+        return
+
+    payload = json.dumps({'event': event, 'data': data})
+    with db.engine.begin() as conn:
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': LOBBY_CHANNEL, 'payload': payload})
+
+
+def _listen_lobby(app, timeout=5.0):
+    """Zadanie w tle: LISTEN na kanale lobby i lokalna emisja odebranych zdarzeń."""
+    while True:
+        try:
+            _listen_lobby_connection(app, timeout)
+        except Exception as e:
+            print(f"BŁĄD kanału lobby: {e}")
+            socketio.sleep(timeout)
+
+
+def _listen_lobby_connection(app, timeout):
+    with app.app_context():
+        conn = db.engine.raw_connection()
+    # Osobne połączenie tylko do LISTEN - nie wraca do puli
+    conn.detach()
+    pg_conn = conn.dbapi_connection
+    try:
+        pg_conn.autocommit = True
+        pg_conn.cursor().execute(f"LISTEN {LOBBY_CHANNEL}")
+        while True:
+            # select jest zielony pod eventlet - nie blokuje huba
+            if select.select([pg_conn], [], [], timeout) == ([], [], []):
+                continue
+            pg_conn.poll()
+            while pg_conn.notifies:
+                notify = pg_conn.notifies.pop(0)
+                try:
+                    message = json.loads(notify.payload)
+                except ValueError:
+                    continue
+                socketio.emit(message['event'], message['data'])
+    finally:
+        conn.close()
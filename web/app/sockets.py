@@ -1,19 +1,21 @@
 from . import socketio
 from flask_socketio import emit, join_room, leave_room
-from app.models import Game, Player, Word, db
-import random
+from app.models import Game, Player, db
+from app.words import pick_random_word
+from app.sharding import owns_game, owner_of
+from app.rooms import rooms, get_room, drop_room, mark_dirty, is_shutting_down
+from app import admission, fanout
+from app.connections import ConnectionRegistry
 from flask import request
 from datetime import datetime
 from sqlalchemy.orm import joinedload
 
-# Globalna mapa dla połączonych graczy (używana do obsługi disconnect)
-connected_players = {}
+# Połączeni gracze tego workera: sid -> Connection (app/connections.py), używane m.in. przy disconnect
+connected_players = ConnectionRegistry()
 
 # 🟢 ZAKTUALIZOWANA FUNKCJA: Emitowanie listy graczy z punktami
 def emit_player_list(game):
     """Pobiera i wysyła aktualną listę graczy wraz z punktami do pokoju gry."""
-    room_name = f"game_{game.id}"
-    
     # Wczytujemy grę z rysującym, by wiedzieć, kogo wyróżnić
     game_with_drawer = Game.query.options(joinedload(Game.current_drawer)).get(game.id)
     
@@ -30,7 +32,7 @@ def emit_player_list(game):
     ]
     
     # Emitowanie aktualizacji do klienta
-    emit('update_player_list', {'players': players_data}, room=room_name)
+    fanout.broadcast(game.id, 'update_player_list', {'players': players_data})
 
 # 🟢 FUNKCJA PLACEHOLDERA: Będzie używana do rotacji rysującego
 def _next_round_setup(game):
@@ -38,12 +40,16 @@ def _next_round_setup(game):
     db.session.refresh(game)
     # 1. Pobierz wszystkich graczy w grze, posortowanych po ID dla stabilnej rotacji
     players = Player.query.filter_by(game_id=game.id).order_by(Player.id.asc()).all()
+    room = get_room(game.id)
+    room.end_round()
     
     if not players:
         # Brak graczy, nie ma kogo rotować
         game.current_word = None
         game.current_drawer = None
         db.session.commit()
+        room.drawer = None
+        mark_dirty()
         return
 
     # 2. Znajdź indeks aktualnego rysującego
@@ -73,14 +79,14 @@ def _next_round_setup(game):
     game.current_word = None # Wyczyść hasło
     game.current_drawer = next_drawer # Ustaw nowego rysującego
     db.session.commit()
-    
-    room_name = f"game_{game.id}"
+    room.drawer = next_drawer.username
+    mark_dirty()
     
     # 5. Emituj nowemu rysującemu i wszystkim o zmianie (spowoduje to wyświetlenie przycisku Start)
-    emit('drawer_changed', {
+    fanout.broadcast(game.id, 'drawer_changed', {
         'new_drawer': next_drawer.username, 
         'word_length': 0 
-    }, room=room_name)
+    })
     
     print(f"INFO: Rotacja rysującego dla gry {game.id}: Nowy rysujący to {next_drawer.username}")
     
@@ -93,15 +99,19 @@ def _next_round_setup(game):
 
 @socketio.on('join')
 def handle_join(data):
-    game_id = str(data.get('game_id'))
     username = data.get('username')
+    try:
+        game_id = int(data.get('game_id'))
+    except (ValueError, TypeError):
+        game_id = None
 
     if not game_id or not username:
         print("Join rejected:", data)
         return
 
-    join_room(game_id)
-    emit('system_message', {'msg': f'{username} dołączył do pokoju.'}, to=game_id)
+    # Ten sam pokój co join_game - rozsyłanie idzie przez kolejkę pokoju (app/fanout.py)
+    join_room(f"game_{game_id}")
+    fanout.broadcast(game_id, 'system_message', {'msg': f'{username} dołączył do pokoju.'})
 
 
 @socketio.on('chat_message')
@@ -126,11 +136,10 @@ def handle_chat(data):
     if not game:
         return
         
-    room_name = f"game_{game_id}"
     timestamp = datetime.now().strftime("%H:%M")
 
     # 1. Emituj wiadomość czatu do wszystkich (zanim zostanie sprawdzona jako hasło)
-    emit('chat_message', {'username': username, 'msg': msg, 'time': timestamp}, to=room_name)
+    fanout.broadcast(game_id, 'chat_message', {'username': username, 'msg': msg, 'time': timestamp})
 
     # 2. Sprawdź, czy wiadomość jest poprawnym hasłem
     if game.current_word and msg.strip().lower() == game.current_word.lower():
@@ -148,12 +157,14 @@ def handle_chat(data):
             db.session.refresh(guesser)
             guesser.score += 1
             db.session.commit()
+            get_room(game.id).scores[username] = guesser.score
+            mark_dirty()
             
         # 5. Zakończenie rundy
         emit_player_list(game) 
             
-        emit('system_message', {'msg': f'✅ {username} odgadł słowo "{game.current_word}"!'}, to=room_name)
-        emit('round_ended', {'winner': username, 'word': game.current_word}, to=room_name)
+        fanout.broadcast(game_id, 'system_message', {'msg': f'✅ {username} odgadł słowo "{game.current_word}"!'})
+        fanout.broadcast(game_id, 'round_ended', {'winner': username, 'word': game.current_word})
         
         _next_round_setup(game)
 
@@ -166,8 +177,7 @@ def handle_start_game(data):
     if sid not in connected_players:
         return
 
-    info = connected_players[sid]
-    username = info['username']
+    username = connected_players.get(sid).username
     
     try:
         game_id = int(game_id_raw)
@@ -187,25 +197,31 @@ def handle_start_game(data):
         return
 
 
-    words = Word.query.all()
-    if not words:
-        emit('system_message', {'msg': "Brak dostępnych słów w bazie!"}, room=f"game_{game_id}")
+    # Losowanie z indeksu (random_key) - bez ładowania całej tabeli haseł
+    word = pick_random_word(game.category_list)
+    if not word:
+        fanout.broadcast(game_id, 'system_message', {'msg': "Brak dostępnych słów w bazie!"})
         return
 
-    selected_word = random.choice(words).text
+    selected_word = word.text
     game.current_word = selected_word
     db.session.commit()
 
-    emit('game_started', {
+    room = get_room(game_id)
+    room.drawer = username
+    room.start_round(selected_word, game.round_time)
+
+    fanout.broadcast(game_id, 'game_started', {
         'drawer': username, 
         'word_length': len(selected_word), 
         'round_time': game.round_time
-    }, room=f"game_{game_id}")
+    })
 
-    emit('your_word', {
+    # Przez kolejkę pokoju - rysujący dostanie hasło po game_started
+    fanout.broadcast(game_id, 'your_word', {
         'word': selected_word, 
         'round_time': game.round_time
-    }, to=sid) # Zmieniono 'room=sid' na 'to=sid'
+    }, to=sid)
 
 
 @socketio.on('end_round')
@@ -222,14 +238,19 @@ def handle_end_round(data):
     if not game:
         return
 
-    room_name = f"game_{game_id}"
-
-    emit('system_message', {'msg': '⏱ Runda zakończona!'}, room=room_name)
-    emit('round_ended', {'word': game.current_word or 'Brak hasła'}, room=room_name)
+    fanout.broadcast(game_id, 'system_message', {'msg': '⏱ Runda zakończona!'})
+    fanout.broadcast(game_id, 'round_ended', {'word': game.current_word or 'Brak hasła'})
     
     _next_round_setup(game)
 
 
+@socketio.on('connect')
+def on_connect(auth=None):
+    # Twardy limit gniazd workera - ponad niego nie ma nawet miejsca w kolejce
+    if not admission.accept_connection():
+        return False
+
+
 @socketio.on('join_game')
 def on_join_game(data):
     game_id_raw = data.get('game_id')
@@ -240,30 +261,67 @@ def on_join_game(data):
         print("join_game missing data:", data)
         return
 
+    # Nazwa trafia do bazy, rejestru (sys.intern) i wyników - tylko tekst, zanim zajmiemy miejsce
+    if not isinstance(username, str):
+        print(f"Invalid username type: {type(username).__name__}")
+        return
+
     try:
         game_id = int(game_id_raw)
     except (ValueError, TypeError):
         print(f"Invalid game ID format: {game_id_raw}")
         return
 
+    # Limity workera i opóźnienie pętli - sprawdzane w pamięci, zanim dotkniemy bazy
+    decision, detail = admission.try_admit(sid, game_id, username)
+    if decision == admission.QUEUED:
+        emit('join_queued', {'position': detail}, to=sid)
+        return
+    if decision == admission.REJECTED:
+        emit('join_rejected', {'reason': detail, 'retry_after': admission.RETRY_AFTER}, to=sid)
+        return
+
+    _join_game(sid, game_id, username)
+
+
+def _join_game(sid, game_id, username):
+    """Dołącza przyjęte połączenie do gry (także gracza wpuszczonego z kolejki)."""
     # Wczytujemy grę wraz z aktualnym rysującym
     game = Game.query.options(joinedload(Game.current_drawer)).get(game_id)
     if not game:
         print("Game not found:", game_id)
+        drop_room(game_id)
+        emit('join_rejected', {'reason': 'game_not_found'}, to=sid)
+        _release_admission(sid)
         return
 
-    room_name = f"game_{game_id}"
-    join_room(room_name)
-
-    connected_players[sid] = {'username': username, 'game_id': game_id}
+    # W trybie shardowanym nginx kieruje pokój do jednego workera - jeśli klient trafił
+    # gdzie indziej, transmisje pokoju go nie obejmą
+    if not owns_game(game_id):
+        print(f"WARN: Gra {game_id} należy do workera {owner_of(game_id)}, połączenie trafiło do innego")
 
-    # Sprawdzamy/dodajemy gracza do bazy
+    # Sprawdzamy/dodajemy gracza do bazy - nowy gracz musi zająć miejsce w pokoju
     player = Player.query.filter_by(username=username, game_id=game_id).first()
     if not player:
+        if not admission.reserve_seat(game_id):
+            db.session.rollback()
+            emit('join_rejected', {'reason': 'room_full'}, to=sid)
+            _release_admission(sid)
+            return
         new_player = Player(username=username, game_id=game_id, score=0)
         db.session.add(new_player)
         db.session.commit()
         player = new_player
+
+    room_name = f"game_{game_id}"
+    join_room(room_name, sid=sid)
+
+    # Internowana nazwa - ten sam obiekt w rejestrze i w wynikach pokoju
+    username = connected_players.add(sid, username, game_id).username
+
+    room = get_room(game_id)
+    room.scores.setdefault(username, player.score)
+    mark_dirty()
     
     # 🟢 KLUCZOWA ZMIANA: Ustawienie pierwszego rysującego, jeśli nie jest ustawiony
     current_drawer_username = game.current_drawer.username if game.current_drawer else None
@@ -272,25 +330,67 @@ def on_join_game(data):
         # Ustaw tego gracza jako pierwszego rysującego
         game.current_drawer = player 
         db.session.commit()
+        room.drawer = username
+        mark_dirty()
         
         # Poinformuj klienta (w tym Ciebie) o zmianie rysującego.
         # Spowoduje to wyświetlenie przycisku START dla Ciebie.
-        emit('drawer_changed', {
+        fanout.broadcast(game_id, 'drawer_changed', {
             'new_drawer': username, 
             'word_length': 0 
-        }, room=room_name)
+        })
     
     # 🟢 Jeśli rysujący jest już ustawiony, poinformuj nowego gracza, kto nim jest
     elif username != current_drawer_username:
-        emit('drawer_changed', {
+        fanout.broadcast(game_id, 'drawer_changed', {
             'new_drawer': current_drawer_username, 
             'word_length': 0 
-        }, to=request.sid)
+        }, to=sid)
 
-    emit('system_message', {'msg': f'{username} dołączył do gry.'}, room=room_name)
+    fanout.broadcast(game_id, 'system_message', {'msg': f'{username} dołączył do gry.'})
     
     emit_player_list(game)
 
+    # Trwająca runda (także przywrócona z migawki po restarcie) - stan z pamięci, bez bazy
+    remaining = room.remaining_time()
+    if remaining is not None or room.strokes or room.undone:
+        # Przez kolejkę pokoju - stan rundy nie wyprzedzi zdarzeń, które już w niej czekają
+        fanout.broadcast(game_id, 'round_state', {
+            'drawer': room.drawer,
+            'word_length': len(room.word) if room.word else 0,
+            'remaining': remaining,
+            'strokes': list(room.strokes),
+            'undone': room.undone
+        }, to=sid)
+        if remaining is not None and username == room.drawer:
+            fanout.broadcast(game_id, 'your_word', {'word': room.word, 'round_time': remaining}, to=sid)
+
+
+def _release_admission(sid, closed=False):
+    """Zwalnia miejsce w limitach workera i wpuszcza kolejnych z kolejki."""
+    was_waiting = sid in admission.waiting
+    promoted = admission.connection_closed(sid) if closed else admission.release(sid)
+    for queued_sid, game_id, username in promoted:
+        _join_promoted(queued_sid, game_id, username)
+    if promoted or was_waiting:
+        for position, queued_sid in enumerate(admission.queued_sids(), start=1):
+            emit('join_queued', {'position': position}, to=queued_sid)
+
+
+def _join_promoted(sid, game_id, username):
+    """Dołącza gracza wpuszczonego z kolejki.
+
+    W trybie ASGI handlery pokoju są szeregowane (app/asgi.py), a tu jesteśmy
+    w handlerze pokoju, który zwolnił miejsce - dołączenie idzie więc jako
+    osobne zdarzenie join_game pod blokadą pokoju gracza. Gracz jest już
+    przyjęty, więc try_admit od razu go przepuści.
+    """
+    dispatch_event = getattr(socketio.server, 'dispatch_event', None)
+    if dispatch_event is not None:
+        dispatch_event(sid, 'join_game', {'game_id': game_id, 'username': username})
+    else:
+        _join_game(sid, game_id, username)
+
 
 @socketio.on('leave_game')
 def on_leave_game(data):
@@ -299,13 +399,25 @@ def on_leave_game(data):
     username = data.get('username')
     sid = request.sid
     
-    # ... (kod walidacji)
+    if not game_id_raw or not username:
+        return
+
+    try:
+        game_id = int(game_id_raw)
+    except (ValueError, TypeError):
+        return
 
     room_name = f"game_{game_id}"
 
     leave_room(room_name)
     connected_players.pop(sid, None)
-    
+    try:
+        _player_left(username, game_id)
+    finally:
+        _release_admission(sid)
+
+
+def _player_left(username, game_id):
     game = Game.query.options(joinedload(Game.current_drawer)).get(game_id)
     player = Player.query.filter_by(username=username, game_id=game_id).first()
     
@@ -315,8 +427,11 @@ def on_leave_game(data):
         if game.current_drawer_id == player.id:
             game.current_drawer = None 
             
-        # 2. Usuń gracza. Obie operacje są teraz w tej samej sesji.
+        _forget_player(game_id, username)
+
+        # 2. Usuń gracza i zwolnij jego miejsce. Wszystko w tej samej sesji.
         db.session.delete(player)
+        admission.release_seat(game_id)
         
         # 3. ZATWIERDŹ RAZ.
         try:
@@ -326,12 +441,10 @@ def on_leave_game(data):
             print(f"BŁĄD ZASAD ZMIANY BAZY DANYCH: {e}")
             return
 
-        # 4. Wyczyść pustą grę (z commit() w środku)
-        is_deleted = _cleanup_empty_game(game)
-        
-        if not is_deleted:
+        # 4. Pusty pokój usunie janitor (app/janitor.py) - tu tylko informujemy pozostałych
+        if _room_has_players(game_id):
             emit_player_list(game) 
-            emit('system_message', {'msg': f'{username} opuścił grę.'}, room=room_name)
+            fanout.broadcast(game_id, 'system_message', {'msg': f'{username} opuścił grę.'})
 
     
 @socketio.on('disconnect')
@@ -339,13 +452,20 @@ def on_disconnect(reason=None): # Upewnij się, że argument jest poprawnie odbi
     sid = request.sid
     info = connected_players.pop(sid, None)
 
-    if not info:
+    # Zamknięcie procesu (SIGTERM) to restart, nie wyjście graczy - stan zostaje
+    # w bazie i w migawce pokoi, klienci połączą się ponownie
+    if is_shutting_down():
         return
 
-    username = info['username']
-    game_id_int = int(info['game_id'])
-    room_name = f"game_{game_id_int}"
+    try:
+        if info:
+            _player_disconnected(info.username, info.game_id)
+    finally:
+        # Zwolnione miejsce dostaje kolejka - już po usunięciu gracza z pokoju
+        _release_admission(sid, closed=True)
+
 
+def _player_disconnected(username, game_id_int):
     # Wczytaj Grę i Gracza (użycie joinedload jest nadal dobre)
     game = Game.query.options(joinedload(Game.current_drawer)).get(game_id_int)
     player = Player.query.filter_by(username=username, game_id=game_id_int).first()
@@ -356,9 +476,12 @@ def on_disconnect(reason=None): # Upewnij się, że argument jest poprawnie odbi
         if game.current_drawer_id == player.id:
             # Ustawienie na None zeruje KLUCZ OBCY w bazie, jeśli jest commit
             game.current_drawer = None  
+
+        _forget_player(game_id_int, username)
         
-        # 2. Usuń gracza. Obie operacje są teraz w tej samej sesji (db.session).
+        # 2. Usuń gracza i zwolnij jego miejsce. Wszystko w tej samej sesji (db.session).
         db.session.delete(player)
+        admission.release_seat(game_id_int)
         
         # 3. ZATWIERDŹ RAZ. SQLAlchemy zoptymalizuje operacje:
         #    UPDATE game SET current_drawer_id = NULL WHERE ...;
@@ -370,13 +493,10 @@ def on_disconnect(reason=None): # Upewnij się, że argument jest poprawnie odbi
             print(f"BŁĄD ZASAD ZMIANY BAZY DANYCH: {e}")
             return
 
-        # 4. Wyczyść pustą grę (z commit() w środku)
-        is_deleted = _cleanup_empty_game(game)
-        
-        if not is_deleted:
-            # Jeśli gra istnieje, zaktualizuj listę i wyślij wiadomość
+        # 4. Pusty pokój usunie janitor (app/janitor.py) - tu tylko informujemy pozostałych
+        if _room_has_players(game_id_int):
             emit_player_list(game)
-            emit('system_message', {'msg': f'{username} rozłączył się.'}, room=room_name)
+            fanout.broadcast(game_id_int, 'system_message', {'msg': f'{username} rozłączył się.'})
     
 @socketio.on('drawing_data')
 def handle_drawing_data(data):
@@ -388,24 +508,64 @@ def handle_drawing_data(data):
     except (ValueError, TypeError):
         return
 
-    room_name = f"game_{game_id}"
-    
-    # Emitujemy dane do wszystkich W POKOJU, z wyłączeniem nadawcy (broadcast=True, ale lepiej użyć 'to' i pominąć sid)
-    # W tym przypadku wystarczy, że upewnimy się, że odbiorcami są inni gracze w pokoju.
-    # W naszym przypadku, użyjemy `room` i po prostu nie odfiltrujemy nadawcy, 
-    # ponieważ klient (rysujący) ignoruje własne wiadomości `draw_line` (nie jest to wymagane, 
-    # ale jest bezpieczne, gdyż rysujący już ma to narysowane lokalnie).
-    
-    # Używamy `include_self=False` w emit do pokoju, aby rysujący nie dostawał swoich danych z powrotem,
-    # co jest optymalniejsze i zapobiega podwójnemu rysowaniu/migotaniu.
-    emit('draw_line', {
+    # Pierwszy odcinek pociągnięcia ma new_stroke - serwer nadaje wtedy nowe ID kreski
+    stroke_id = None
+    room = rooms.get(game_id)
+    if room is not None:
+        stroke_id = room.add_stroke(
+            [data['x1'], data['y1'], data['x2'], data['y2'], data['color'], data['width']],
+            new_stroke=bool(data.get('new_stroke'))
+        )
+    
+    # Do kolejki pokoju (app/fanout.py), z pominięciem nadawcy - rysujący ma już odcinek u siebie.
+    # Handler wraca od razu, wolny odbiorca nie opóźnia kolejnych odcinków.
+    fanout.broadcast(game_id, 'draw_line', {
         'x1': data['x1'], 
         'y1': data['y1'],
         'x2': data['x2'], 
         'y2': data['y2'],
         'color': data['color'],
-        'width': data['width']
-    }, room=room_name, include_self=False)
+        'width': data['width'],
+        'stroke_id': stroke_id
+    }, skip_sid=request.sid)
+
+    # Potwierdzenie (ack) dla rysującego - tak poznaje ID swojej kreski
+    return stroke_id
+
+
+def _drawer_room(data):
+    """Stan pokoju, jeśli nadawca jest w nim rysującym (sprawdzane w pamięci, bez bazy)."""
+    try:
+        game_id = int(data.get('game_id'))
+    except (ValueError, TypeError):
+        return None
+    info = connected_players.get(request.sid)
+    room = rooms.get(game_id)
+    if room is None or info is None or info.game_id != game_id or room.drawer != info.username:
+        return None
+    return room
+
+
+@socketio.on('undo_stroke')
+def handle_undo_stroke(data):
+    """Cofa ostatnią kreskę - klienci usuwają ją po ID ze swojej listy, bez ponownego wysyłania rysunku."""
+    room = _drawer_room(data)
+    if room is None:
+        return
+    stroke_id = room.undo_stroke()
+    if stroke_id is not None:
+        fanout.broadcast(room.game_id, 'stroke_undone', {'stroke_id': stroke_id})
+
+
+@socketio.on('redo_stroke')
+def handle_redo_stroke(data):
+    """Przywraca cofniętą kreskę - klienci mają jej odcinki na liście cofniętych."""
+    room = _drawer_room(data)
+    if room is None:
+        return
+    stroke_id = room.redo_stroke()
+    if stroke_id is not None:
+        fanout.broadcast(room.game_id, 'stroke_redone', {'stroke_id': stroke_id})
 
 
 @socketio.on('clear_canvas')
@@ -418,32 +578,26 @@ def handle_clear_canvas(data):
     except (ValueError, TypeError):
         return
         
-    room_name = f"game_{game_id}"
+    room = rooms.get(game_id)
+    if room is not None:
+        room.clear_strokes()
     
     # Emitujemy polecenie do wszystkich W POKOJU, z wyłączeniem nadawcy (rysującego).
-    emit('clear_drawing', {}, room=room_name, include_self=False)
-    
-    
-# 🟢 NOWA FUNKCJA POMOCNICZA: Zarządzanie usuwaniem pustych gier
-def _cleanup_empty_game(game):
-    """Usuwa grę z bazy danych, jeśli nie ma w niej graczy i powiadamia o tym lobby."""
+    fanout.broadcast(game_id, 'clear_drawing', {}, skip_sid=request.sid)
     
-    # Liczenie graczy
-    player_count = Player.query.filter_by(game_id=game.id).count()
     
-    if player_count == 0:
-        game_id = game.id
-        game_name = game.name
-        
-        # 1. Usuń grę
-        db.session.delete(game)
-        db.session.commit()
-        
-        print(f"INFO: Usunięto pustą grę: ID {game_id}, Nazwa: {game_name}")
-        
-        # 2. Emituj zdarzenie do CAŁEGO SERWERA, by lobby się odświeżyło
-        # Używamy `broadcast=True` bez pokoju, aby dotrzeć do wszystkich podłączonych do SocketIO
-        socketio.emit('game_deleted', {'game_id': game_id}, broadcast=True)
-        
-        return True # Gra została usunięta
-    return False # Gra nie została usunięta
\ No newline at end of file
+def _room_has_players(game_id):
+    """Czy ktoś jeszcze gra w pokoju - według listy w pamięci, bez zapytania do bazy."""
+    room = rooms.get(game_id)
+    return room is not None and bool(room.scores)
+
+
+def _forget_player(game_id, username):
+    """Usuwa gracza ze stanu pokoju w pamięci (wyniki, rysujący)."""
+    room = rooms.get(game_id)
+    if room is None:
+        return
+    room.scores.pop(username, None)
+    if room.drawer == username:
+        room.drawer = None
+    mark_dirty()
@@ -1,81 +1,451 @@
-// ----- CANVAS -----
-const canvas = document.getElementById("drawingCanvas");
-const ctx = canvas.getContext("2d");
+// Dane z szablonu (game.html) przekazywane jako JSON - bez wstawiania Jinja w kod JS
+const gameConfig = JSON.parse(document.getElementById('gameConfig').textContent);
+const username = gameConfig.username;
+const gameId = String(gameConfig.gameId);
+
+// game_id w zapytaniu pozwala nginx skierować połączenie do workera obsługującego pokój
+const socket = io({ query: { game_id: gameId } });
+const chatBox = document.getElementById('chatBox');
+const timerDisplay = document.getElementById('timer');
+const currentWordDisplay = document.getElementById('currentWordDisplay');
+const currentDrawerDisplay = document.getElementById('currentDrawer');
+const startGameBtn = document.getElementById('startGameBtn');
+const playerList = document.getElementById('playerList');
+
+// Elementy do rysowania
+const canvas = document.getElementById('drawingCanvas');
+const ctx = canvas.getContext('2d');
+const clearCanvasBtn = document.getElementById('clearCanvasBtn');
+const undoStrokeBtn = document.getElementById('undoStrokeBtn');
+const redoStrokeBtn = document.getElementById('redoStrokeBtn');
+const colorPicker = document.getElementById('colorPicker');
+const lineWidthInput = document.getElementById('lineWidthInput');
+
+let timerInterval = null;
+let isDrawing = false;
+let lastX = 0;
+let lastY = 0;
+
+// Kreski na płótnie w kolejności rysowania: { id, segments: [[x1, y1, x2, y2, color, width], ...] }.
+// ID nadaje serwer - rysujący dostaje ID swojej kreski w potwierdzeniu pierwszego odcinka.
+// Cofnięcie/przywrócenie to tylko ID kreski, odcinki każdy klient ma u siebie.
+const REDO_DEPTH = 20;
+let strokes = [];
+let undoneStrokes = [];
+let currentStroke = null;
+
+// =================== CANVAS SETUP ===================
 
-// Dopasowanie rozmiaru canvas do elementu
 function resizeCanvas() {
-    canvas.width = canvas.offsetWidth;
-    canvas.height = canvas.offsetHeight;
+    const rect = canvas.getBoundingClientRect();
+    canvas.width = rect.width;
+    canvas.height = rect.height;
+    redrawCanvas();
 }
-window.addEventListener('resize', resizeCanvas);
 resizeCanvas();
+window.addEventListener('resize', resizeCanvas);
 
-let drawing = false;
-let color = document.getElementById("colorPicker").value;
 
-canvas.addEventListener("mousedown", (e) => {
-    drawing = true;
+// 🎨 Główna funkcja rysująca
+function drawLine(x1, y1, x2, y2, color, width) {
+    ctx.strokeStyle = color;
+    ctx.lineWidth = width;
+    ctx.lineCap = 'round';
+    ctx.lineJoin = 'round';
     ctx.beginPath();
-    ctx.moveTo(e.offsetX, e.offsetY);
-});
-canvas.addEventListener("mousemove", (e) => {
-    if (drawing) {
-        ctx.lineTo(e.offsetX, e.offsetY);
-        ctx.strokeStyle = color;
-        ctx.lineWidth = 2;
-        ctx.stroke();
+    ctx.moveTo(x1, y1);
+    ctx.lineTo(x2, y2);
+    ctx.stroke();
+}
+
+function drawStroke(stroke) {
+    stroke.segments.forEach(s => drawLine(s[0], s[1], s[2], s[3], s[4], s[5]));
+}
+
+function redrawCanvas() {
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    strokes.forEach(drawStroke);
+}
+
+// Nowa runda, nowy rysujący albo wyczyszczenie płótna - znika też historia cofnięć
+function resetStrokes() {
+    strokes = [];
+    undoneStrokes = [];
+    currentStroke = null;
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+}
+
+// Odcinki z serwera mają ID kreski na końcu: [x1, y1, x2, y2, color, width, stroke_id]
+function groupSegments(segments) {
+    const grouped = [];
+    segments.forEach(s => {
+        let stroke = grouped[grouped.length - 1];
+        if (!stroke || stroke.id !== s[6]) {
+            stroke = { id: s[6], segments: [] };
+            grouped.push(stroke);
+        }
+        stroke.segments.push(s.slice(0, 6));
+    });
+    return grouped;
+}
+
+// Stan płótna z serwera (round_state, canvas_state): kreski i cofnięte kreski
+function loadCanvasState(data) {
+    strokes = groupSegments(data.strokes);
+    undoneStrokes = data.undone.map(([id, segments]) => ({ id, segments: segments.map(s => s.slice(0, 6)) }));
+    currentStroke = null;
+    redrawCanvas();
+}
+
+function handleDrawing(e) {
+    if (!isDrawing) return;
+    
+    const x = e.offsetX;
+    const y = e.offsetY;
+
+    // Rysowanie lokalne
+    const currentColor = colorPicker.value;
+    const currentWidth = lineWidthInput.value;
+    drawLine(lastX, lastY, x, y, currentColor, currentWidth);
+
+    // Wysyłanie do serwera (tylko przez rysującego)
+    if (currentDrawerDisplay.textContent === username) {
+        const payload = {
+            game_id: gameId,
+            x1: lastX,
+            y1: lastY,
+            x2: x,
+            y2: y,
+            color: currentColor,
+            width: currentWidth
+        };
+        const stroke = currentStroke;
+        stroke.segments.push([lastX, lastY, x, y, currentColor, currentWidth]);
+        if (stroke.segments.length === 1) {
+            // Pierwszy odcinek pociągnięcia zaczyna nową kreskę - serwer odsyła jej ID
+            payload.new_stroke = true;
+            socket.emit('drawing_data', payload, strokeId => { stroke.id = strokeId; });
+        } else {
+            socket.emit('drawing_data', payload);
+        }
+    }
+
+    lastX = x;
+    lastY = y;
+}
+
+function startDraw(e) {
+    // 🛑 WALIDACJA: Tylko rysujący może rozpocząć rysowanie
+    if (currentDrawerDisplay.textContent !== username) return; 
+    
+    isDrawing = true;
+    lastX = e.offsetX;
+    lastY = e.offsetY;
+    currentStroke = { id: null, segments: [] };
+    strokes.push(currentStroke);
+    undoneStrokes = [];
+    // Umożliwia rysowanie kropki przy kliknięciu (pojedynczy punkt)
+    drawLine(lastX, lastY, lastX, lastY, colorPicker.value, lineWidthInput.value); 
+}
+
+function stopDraw() {
+    if (isDrawing && currentStroke.segments.length === 0) {
+        // Samo kliknięcie - kropka nie trafia do serwera, więc i nie na listę kresek
+        strokes.pop();
+    }
+    isDrawing = false;
+}
+
+// 🔸 Event Listeners dla rysowania
+canvas.addEventListener('mousedown', startDraw);
+canvas.addEventListener('mousemove', handleDrawing);
+canvas.addEventListener('mouseup', stopDraw);
+canvas.addEventListener('mouseout', stopDraw);
+
+// 🔸 Obsługa czyszczenia
+if (clearCanvasBtn) {
+    clearCanvasBtn.addEventListener('click', () => {
+        // 🛑 WALIDACJA: Tylko rysujący może czyścić
+        if (currentDrawerDisplay.textContent === username) {
+            resetStrokes();
+            socket.emit('clear_canvas', { game_id: gameId });
+        }
+    });
+}
+
+// 🔸 Cofnij / ponów kreskę - serwer rozsyła do wszystkich tylko ID kreski
+function undoStroke() {
+    if (currentDrawerDisplay.textContent === username) {
+        socket.emit('undo_stroke', { game_id: gameId });
+    }
+}
+
+function redoStroke() {
+    if (currentDrawerDisplay.textContent === username) {
+        socket.emit('redo_stroke', { game_id: gameId });
+    }
+}
+
+if (undoStrokeBtn) {
+    undoStrokeBtn.addEventListener('click', undoStroke);
+}
+if (redoStrokeBtn) {
+    redoStrokeBtn.addEventListener('click', redoStroke);
+}
+
+// Ctrl+Z / Ctrl+Shift+Z / Ctrl+Y - poza polem czatu
+document.addEventListener('keydown', e => {
+    if (!(e.ctrlKey || e.metaKey) || e.target.tagName === 'INPUT') return;
+    const key = e.key.toLowerCase();
+    if (key === 'z' && !e.shiftKey) {
+        e.preventDefault();
+        undoStroke();
+    } else if (key === 'y' || (key === 'z' && e.shiftKey)) {
+        e.preventDefault();
+        redoStroke();
     }
 });
-canvas.addEventListener("mouseup", () => {
-    drawing = false;
+// ----------------------------------------------------
+
+
+// =================== SOCKET HANDLERS ===================
+
+socket.on('connect', () => {
+  console.log("[DEBUG] Socket connected:", socket.id);
+  socket.emit('join_game', { game_id: gameId, username: username });
 });
-canvas.addEventListener("mouseout", () => {
-    drawing = false;
+
+// ⏳ Serwer pełny - czekamy w kolejce na miejsce
+socket.on('join_queued', data => {
+  chatBox.innerHTML += `<div class="text-warning">Serwer jest pełny. Twoja pozycja w kolejce: <b>${data.position}</b></div>`;
+  scrollChatToBottom();
 });
 
-// Zmiana koloru
-document.getElementById("colorPicker").addEventListener("change", (e) => {
-    color = e.target.value;
+// 🚫 Odmowa dołączenia: pełny/usunięty pokój albo przeciążony serwer (wtedy ponawiamy)
+socket.on('join_rejected', data => {
+  if (data.reason === 'room_full' || data.reason === 'game_not_found') {
+    alert(data.reason === 'room_full' ? "Pokój jest pełny." : "Ten pokój już nie istnieje.");
+    window.location.href = gameConfig.lobbyUrl;
+    return;
+  }
+  chatBox.innerHTML += `<div class="text-warning">Serwer jest przeciążony, ponowna próba za ${data.retry_after} s...</div>`;
+  scrollChatToBottom();
+  setTimeout(() => socket.emit('join_game', { game_id: gameId, username: username }), data.retry_after * 1000);
 });
 
-// Wyczyść canvas
-document.getElementById("clearCanvas").addEventListener("click", () => {
-    ctx.clearRect(0, 0, canvas.width, canvas.height);
+// 🎨 Odbieranie danych rysowania od innych
+socket.on('draw_line', data => {
+    let stroke = strokes[strokes.length - 1];
+    if (!stroke || stroke.id !== data.stroke_id) {
+        // Nowa kreska - jak na serwerze, kasuje historię cofnięć
+        stroke = { id: data.stroke_id, segments: [] };
+        strokes.push(stroke);
+        undoneStrokes = [];
+    }
+    const segment = [
+        parseFloat(data.x1), parseFloat(data.y1),
+        parseFloat(data.x2), parseFloat(data.y2),
+        data.color, parseFloat(data.width)
+    ];
+    stroke.segments.push(segment);
+    drawLine(...segment);
 });
 
+// ↩️ Cofnięcie kreski - usuwamy ją z listy i przerysowujemy płótno lokalnie
+socket.on('stroke_undone', data => {
+    const index = strokes.findIndex(s => s.id === data.stroke_id);
+    if (index === -1) return;
+    undoneStrokes.push(strokes.splice(index, 1)[0]);
+    if (undoneStrokes.length > REDO_DEPTH) {
+        undoneStrokes.shift();
+    }
+    redrawCanvas();
+});
 
-// ----- CHAT -----
-const chatForm = document.getElementById("chatForm");
-const chatInput = document.getElementById("chatInput");
-const chatBox = document.getElementById("chatBox");
+// ↪️ Przywrócenie kreski - wraca na koniec listy, więc wystarczy ją dorysować
+socket.on('stroke_redone', data => {
+    const index = undoneStrokes.findIndex(s => s.id === data.stroke_id);
+    if (index === -1) return;
+    const stroke = undoneStrokes.splice(index, 1)[0];
+    strokes.push(stroke);
+    drawStroke(stroke);
+});
 
-chatForm.addEventListener("submit", (e) => {
-    e.preventDefault();
-    const message = chatInput.value.trim();
-    if (message === "") return;
+// 🐢 Nie nadążaliśmy z odbiorem - serwer zamiast zaległych odcinków przysyła cały stan płótna
+socket.on('canvas_state', loadCanvasState);
+
+// 🎨 Odbieranie polecenia czyszczenia
+socket.on('clear_drawing', () => {
+    resetStrokes();
+});
 
-    // Dodaj wiadomość do czatu (lokalnie)
-    const msgDiv = document.createElement("div");
-    msgDiv.textContent = message;
-    msgDiv.classList.add("mb-1");
-    chatBox.appendChild(msgDiv);
+/**
+ * Przewija pole czatu na sam dół.
+ */
+function scrollChatToBottom() {
     chatBox.scrollTop = chatBox.scrollHeight;
+}
+
+
+// ✅ Obsługa czatu
+document.getElementById('chatForm').addEventListener('submit', e => {
+  e.preventDefault();
+  const msg = document.getElementById('chatInput').value.trim();
+  if (!msg) return;
+  socket.emit('chat_message', { username, room: gameId, msg });
+  document.getElementById('chatInput').value = '';
+});
 
-    chatInput.value = "";
+// 🟢 KLUCZOWA ZMIANA: Dodanie znacznika czasu (data.time)
+socket.on('chat_message', data => {
+  chatBox.innerHTML += `<div><small class="text-muted">[${data.time}]</small> <b>${data.username}:</b> ${data.msg}</div>`;
+  scrollChatToBottom();
 });
 
-// ----- TIMER -----
-const timerEl = document.getElementById("timer");
-let timeLeft = parseInt(timerEl.textContent);
+socket.on('system_message', data => {
+  chatBox.innerHTML += `<div class="text-muted"><i>${data.msg}</i></div>`;
+  scrollChatToBottom();
+});
 
-function countdown() {
-    if (timeLeft > 0) {
-        timeLeft -= 1;
-        timerEl.textContent = timeLeft;
-    } else {
-        clearInterval(timerInterval);
-        alert("Koniec rundy!");
-    }
+// 🟢 NOWA OBSŁUGA: Aktualizacja listy graczy (wraz z punktami)
+socket.on('update_player_list', data => {
+    playerList.innerHTML = ''; // Wyczyść starą listę
+    data.players.forEach(p => {
+        // Używamy Bootstrapowych klas dla ładniejszego wyglądu
+        const item = document.createElement('div');
+        item.classList.add('d-flex', 'justify-content-between', 'align-items-center', 'py-1', 'border-bottom');
+        item.innerHTML = `
+            <span class="${p.username === username ? 'fw-bold text-primary' : ''}">${p.username}</span>
+            <span class="badge bg-success rounded-pill">${p.score}</span>
+        `;
+        playerList.appendChild(item);
+    });
+});
+
+
+// ✅ Obsługa przycisku START
+if (startGameBtn) {
+  startGameBtn.addEventListener('click', () => {
+    console.log("[DEBUG] Start clicked by", username);
+    socket.emit('start_game', { game_id: gameId });
+  });
 }
 
-const timerInterval = setInterval(countdown, 1000);
+// 🟢 Nowy rysujący
+socket.on('drawer_changed', data => {
+    const is_drawer = data.new_drawer === username;
+    
+    currentDrawerDisplay.textContent = data.new_drawer;
+    currentWordDisplay.textContent = '...'; // Ukryj hasło
+    
+    resetStrokes(); // Wyczyść canvas przy zmianie rysującego
+
+    if (startGameBtn) {
+        if (is_drawer) {
+            startGameBtn.style.display = 'block';
+            startGameBtn.disabled = false;
+            chatBox.innerHTML += `<div class="text-info"><b>Jesteś nowym rysującym!</b> Kliknij "Start rundy".</div>`;
+        } else {
+            startGameBtn.style.display = 'none';
+        }
+    }
+    
+    // Wyczyść ewentualne ukryte hasło z poprzedniej rundy (jeśli nie byłeś rysującym)
+    if (!is_drawer && !data.word) {
+        // Zakładamy, że serwer wysyła word_length dla nie-rysujących.
+        currentWordDisplay.innerHTML = `(Ukryte: ${data.word_length || '?'} liter)`;
+    }
+
+    scrollChatToBottom();
+});
+
+
+// ✅ Rysujący otrzymał hasło (tylko dla niego)
+socket.on('your_word', data => {
+  console.log("[DEBUG] Otrzymano hasło:", data.word);
+  currentWordDisplay.innerHTML = data.word;
+  
+  if (startGameBtn) {
+    startGameBtn.disabled = true;
+  }
+  
+  startTimer(data.round_time);
+  
+  chatBox.innerHTML += `<div class="text-info"><b>Twoje hasło (Rysujący):</b> ${data.word}</div>`;
+  scrollChatToBottom();
+});
+
+
+// ✅ Start gry/rundy (dla wszystkich)
+socket.on('game_started', data => {
+  chatBox.innerHTML += `<div class="text-success"><b>Runda rozpoczęta!</b></div>`;
+  
+  currentDrawerDisplay.textContent = data.drawer;
+  resetStrokes(); // Wyczyść canvas przy starcie rundy
+  
+  if (data.drawer !== username) {
+      // Dla zgadujących: pokaż długość hasła
+      currentWordDisplay.innerHTML = `(Ukryte: ${data.word_length || '?'} liter)`;
+      startTimer(data.round_time);
+  } else {
+      // Dla rysującego: hasło już zostało ustawione w 'your_word'
+      startTimer(data.round_time);
+  }
+
+  if (startGameBtn) {
+    startGameBtn.style.display = 'none';
+  }
+  scrollChatToBottom();
+});
+
+// 🔄 Stan trwającej rundy przy (ponownym) dołączeniu, np. po restarcie serwera
+socket.on('round_state', data => {
+  currentDrawerDisplay.textContent = data.drawer || '';
+
+  if (data.remaining !== null) {
+    if (data.drawer !== username) {
+      currentWordDisplay.innerHTML = `(Ukryte: ${data.word_length || '?'} liter)`;
+    }
+    startTimer(data.remaining);
+    if (startGameBtn) {
+      startGameBtn.style.display = 'none';
+    }
+  }
+
+  // Odtwórz ostatnie kreski i historię cofnięć (do redo)
+  loadCanvasState(data);
+});
+
+// ✅ Zakończenie rundy
+socket.on('round_ended', data => {
+  clearInterval(timerInterval);
+  timerDisplay.textContent = "0";
+  
+  resetStrokes();
+  
+  chatBox.innerHTML += `<div class="text-danger"><b>Koniec rundy!</b> Hasło to: <b>${data.word}</b></div>`;
+  if (data.winner) {
+    chatBox.innerHTML += `<div class="text-success"><b>Wygrywa:</b> ${data.winner}!</div>`;
+  }
+  scrollChatToBottom();
+  
+  // Po zakończeniu rundy ustawiamy hasło na '...'
+  currentWordDisplay.innerHTML = '...'; 
+});
+
+// =================== TIMER ===================
+function startTimer(seconds) {
+  clearInterval(timerInterval);
+  let remaining = seconds;
+  timerDisplay.textContent = remaining;
+  timerInterval = setInterval(() => {
+    remaining--;
+    timerDisplay.textContent = remaining;
+    if (remaining <= 0) {
+      clearInterval(timerInterval);
+      if (currentDrawerDisplay.textContent === username) {
+          socket.emit('end_round', { game_id: gameId });
+      }
+    }
+  }, 1000);
+}
@@ -0,0 +1,103 @@
+# asgi_client.py
+#
+# Klient testowy Socket.IO dla trybu ASGI (app/asgi.py). Podmienia wysyłanie
+# pakietów AsyncServer, więc żyje w testach, a nie w kodzie produkcyjnym.
+
+import uuid
+
+from socketio import packet
+from werkzeug.test import EnvironBuilder
+
+
+class AsgiTestClient:
+    """Odpowiednik SocketIOTestClient z Flask-SocketIO dla trybu ASGI.
+
+    Ma ten sam interfejs (emit, get_received, disconnect, eio_sid), więc
+    testy działają bez zmian w obu trybach.
+    """
+    clients = {}
+
+    def __init__(self, runtime, namespace=None, query_string=None, headers=None):
+        self.runtime = runtime
+        self.sio = runtime.sio
+        self.eio_sid = uuid.uuid4().hex
+        self.clients[self.eio_sid] = self
+        self.connected = {}
+        self.queue = []
+        self.acks = None
+
+        # Handlery wykonywane od razu (nie jako zadania w tle) - emit w teście
+        # wraca dopiero po obsłużeniu zdarzenia
+        self.sio.async_handlers = False
+        self.sio.eio.async_handlers = False
+        self.sio._send_packet = AsgiTestClient._send_packet
+        self.sio._send_eio_packet = AsgiTestClient._send_eio_packet
+        self.sio.manager.initialize()
+        self.connect(namespace=namespace, query_string=query_string, headers=headers)
+
+    @classmethod
+    async def _send_packet(cls, eio_sid, pkt):
+        pkt = packet.Packet(encoded_packet=pkt.encode())
+        client = cls.clients.get(eio_sid)
+        if not client:
+            return
+        if pkt.packet_type in (packet.EVENT, packet.BINARY_EVENT):
+            client.queue.append({'name': pkt.data[0], 'args': pkt.data[1:], 'namespace': pkt.namespace or '/'})
+        elif pkt.packet_type in (packet.ACK, packet.BINARY_ACK):
+            client.acks = {'args': pkt.data, 'namespace': pkt.namespace or '/'}
+        elif pkt.packet_type in (packet.DISCONNECT, packet.CONNECT_ERROR):
+            client.connected[pkt.namespace or '/'] = False
+
+    @classmethod
+    async def _send_eio_packet(cls, eio_sid, eio_pkt):
+        await cls._send_packet(eio_sid, packet.Packet(encoded_packet=eio_pkt.data))
+
+    def is_connected(self, namespace=None):
+        return self.connected.get(namespace or '/', False)
+
+    def connect(self, namespace=None, query_string=None, headers=None):
+        url = '/socket.io'
+        namespace = namespace or '/'
+        if query_string:
+            url += query_string if query_string.startswith('?') else '?' + query_string
+        environ = EnvironBuilder(url, headers=headers).get_environ()
+        environ['flask.app'] = self.runtime.app
+        self.runtime.run(self.sio._handle_eio_connect(self.eio_sid, environ))
+        pkt = packet.Packet(packet.CONNECT, None, namespace=namespace)
+        self.runtime.run(self.sio._handle_eio_message(self.eio_sid, pkt.encode()))
+        if self.sio.manager.sid_from_eio_sid(self.eio_sid, namespace):
+            self.connected[namespace] = True
+
+    def disconnect(self, namespace=None):
+        if not self.is_connected(namespace):
+            raise RuntimeError('not connected')
+        pkt = packet.Packet(packet.DISCONNECT, namespace=namespace)
+        self.runtime.run(self.sio._handle_eio_message(self.eio_sid, pkt.encode()))
+        del self.connected[namespace or '/']
+
+    def emit(self, event, *args, **kwargs):
+        namespace = kwargs.pop('namespace', None)
+        # callback=True - jak w Flask-SocketIO: zwraca potwierdzenie (ack) handlera
+        callback = kwargs.pop('callback', False)
+        if not self.is_connected(namespace):
+            raise RuntimeError('not connected')
+        self.acks = None
+        pkt = packet.Packet(packet.EVENT, data=[event] + list(args), namespace=namespace, id=1 if callback else None)
+        self.runtime.run(self.sio._handle_eio_message(self.eio_sid, pkt.encode()))
+        ack, self.acks = self.acks, None
+        if ack is not None:
+            return ack['args'][0] if len(ack['args']) == 1 else ack['args']
+
+    def get_received(self, namespace=None):
+        namespace = namespace or '/'
+        received = [pkt for pkt in self.queue if pkt['namespace'] == namespace]
+        self.queue = [pkt for pkt in self.queue if pkt['namespace'] != namespace]
+        return received
+
+
+
+def install_test_client(runtime):
+    """socketio.test_client(app) w testach zwraca klienta AsyncServer."""
+    def test_client(app=None, namespace=None, query_string=None, headers=None, **kwargs):
+        return AsgiTestClient(runtime, namespace=namespace, query_string=query_string, headers=headers)
+    return test_client
@@ -1,16 +1,43 @@
+import os
+import difflib
+import re
+from collections import Counter
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 from app import create_app, db, socketio # Załóżmy, że masz create_app() i obiekty app, db, socketio
 from app.models import Game, Player, Word
+from app.rooms import rooms
+from app import admission, fanout
+from app.sockets import connected_players
+
+# KALAMBURY_RUNTIME=asgi pytest - ten sam zestaw testów na AsyncServer (app/asgi.py)
+RUNTIME = os.environ.get('KALAMBURY_RUNTIME', 'eventlet')
 
 
 @pytest.fixture(scope='session')
 def app():
     """Tworzy instancję aplikacji Flask dla testów."""
-    app = create_app({
+    config = {
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', # Użycie bazy in-memory
-        'SQLALCHEMY_TRACK_MODIFICATIONS': False
-    })
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'ROOM_SNAPSHOT_PATH': None, # Bez migawek pokoi i handlera SIGTERM
+        'JANITOR_INTERVAL': 0, # Testy wywołują janitor.sweep() same
+        'SHED_LAG_MS': 0, # Bez pomiaru opóźnienia pętli w tle
+        'FANOUT_ASYNC': False # Zdarzenia pokoju wysyłane od razu w handlerze
+    }
+    if RUNTIME == 'asgi':
+        config['SOCKETIO_ASYNC_MODE'] = 'threading'
+    app = create_app(config)
+
+    if RUNTIME == 'asgi':
+        from app.asgi import install
+        from app.tests.asgi_client import install_test_client
+        runtime = install(app)
+        # socketio.test_client(app) w testach zwraca klienta AsyncServer
+        socketio.test_client = install_test_client(runtime)
     return app
 
 @pytest.fixture(scope='function')
@@ -21,9 +48,83 @@ def db_session(app):
         yield db
         db.session.remove()
         db.drop_all()
+        rooms.clear()
+        for registry in (admission.admitted, admission.room_members, admission.waiting, fanout.queues,
+                         connected_players):
+            registry.clear()
 
 @pytest.fixture(scope='function')
 def socket_client(app):
     """Tworzy klienta testowego Socket.IO."""
     # Użycie klienta testowego z flask_socketio
-    return socketio.test_client(app)
\ No newline at end of file
+    return socketio.test_client(app)
+
+
+# ---------- budżety zapytań SQL ----------
+
+def _statement_shape(statement):
+    """Zapytanie bez zmiennych części: białe znaki i długość list IN (?, ?, ...)."""
+    statement = ' '.join(statement.split())
+    return re.sub(r'\((?:\?|%\(\w+\)s)(?:, (?:\?|%\(\w+\)s))*\)', '(...)', statement)
+
+
+class QueryLog:
+    """Zapytania SQL (i COMMIT-y) wysłane do bazy w bloku ``with``."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(_statement_shape(statement))
+
+    def _on_commit(self, conn):
+        self.statements.append('COMMIT')
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        event.listen(self.engine, 'commit', self._on_commit)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        event.remove(self.engine, 'commit', self._on_commit)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def report(self, budget, label):
+        lines = [f"{label}: {len(self)} zapytań SQL, budżet {budget}"]
+        for number, statement in enumerate(self.statements, start=1):
+            marker = '+' if number > budget else ' '
+            lines.append(f"{marker} {number:3}  {statement}")
+        repeated = [(count, shape) for shape, count in Counter(self.statements).items() if count > 1]
+        if repeated:
+            lines.append("Powtórzone zapytania (N+1?):")
+            lines.extend(f"  {count}x  {shape}" for count, shape in sorted(repeated, reverse=True))
+        return '\n'.join(lines)
+
+    def diff(self, other, label, other_label):
+        """Różnica między zapytaniami dwóch przebiegów, np. w małym i pełnym pokoju."""
+        return '\n'.join(difflib.unified_diff(
+            self.statements, other.statements, fromfile=label, tofile=other_label, lineterm=''
+        ))
+
+
+@pytest.fixture
+def query_budget(db_session):
+    """``with query_budget(3, 'chat_message'):`` - test nie przejdzie, gdy blok wyśle więcej zapytań.
+
+    Komunikat błędu wypisuje wszystkie zapytania (ponad budżet oznaczone +)
+    i zapytania powtórzone, czyli typowe N+1.
+    """
+    @contextmanager
+    def budget(limit, label):
+        # Handlery w testach dzielą sesję z testem (wspólny kontekst aplikacji), więc
+        # zaczynamy od pustej - jak każde zdarzenie i żądanie na produkcji
+        db_session.session.remove()
+        with QueryLog(db_session.engine) as log:
+            yield log
+        if len(log) > limit:
+            pytest.fail(log.report(limit, label), pytrace=False)
+    return budget
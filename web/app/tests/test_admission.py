@@ -0,0 +1,59 @@
+# test_admission.py
+
+from app import admission, socketio
+from app.models import Game, Player
+
+
+def make_game(db_session, **kwargs):
+    game = Game(name="Limity", creator="Tester", **kwargs)
+    db_session.session.add(game)
+    db_session.session.commit()
+    return game.id
+
+
+def events(client, name):
+    return [e['args'][0] for e in client.get_received() if e['name'] == name]
+
+
+def test_room_capacity_is_enforced(db_session, app):
+    """Trzeci gracz nie wejdzie do pokoju na dwie osoby, a wyjście zwalnia miejsce."""
+    game_id = make_game(db_session, max_players=2)
+    clients = [socketio.test_client(app) for _ in range(3)]
+    for i, client in enumerate(clients):
+        client.emit('join_game', {'game_id': game_id, 'username': f'Gracz{i}'})
+
+    assert events(clients[2], 'join_rejected') == [{'reason': 'room_full'}]
+    assert Player.query.filter_by(game_id=game_id).count() == 2
+    assert db_session.session.get(Game, game_id).player_count == 2
+
+    clients[0].disconnect()
+    db_session.session.expire_all()
+    assert db_session.session.get(Game, game_id).player_count == 1
+
+
+def test_full_worker_queues_joins_and_admits_in_order(db_session, app, monkeypatch):
+    """Ponad MAX_SOCKETS gracz czeka w kolejce z pozycją i wchodzi po zwolnieniu miejsca."""
+    monkeypatch.setitem(admission._limits, 'sockets', 2)
+    game_id = make_game(db_session)
+    clients = [socketio.test_client(app) for _ in range(4)]
+    for i, client in enumerate(clients):
+        client.emit('join_game', {'game_id': game_id, 'username': f'Gracz{i}'})
+    assert events(clients[2], 'join_queued') == [{'position': 1}]
+    assert events(clients[3], 'join_queued') == [{'position': 2}]
+
+    clients[0].disconnect()
+    players = events(clients[2], 'update_player_list')[-1]['players']
+    assert sorted(p['username'] for p in players) == ['Gracz1', 'Gracz2']
+    assert events(clients[3], 'join_queued') == [{'position': 1}]
+
+
+def test_joins_are_shed_when_event_loop_lags(db_session, socket_client, monkeypatch):
+    """Przy opóźnieniu pętli ponad SHED_LAG_MS nowe dołączenie dostaje odmowę z retry_after."""
+    monkeypatch.setitem(admission._limits, 'shed_lag', 0.25)
+    monkeypatch.setitem(admission._state, 'lag', 1.0)
+    game_id = make_game(db_session)
+
+    socket_client.emit('join_game', {'game_id': game_id, 'username': 'Spozniony'})
+
+    assert events(socket_client, 'join_rejected') == [{'reason': 'overloaded', 'retry_after': admission.RETRY_AFTER}]
+    assert Player.query.filter_by(game_id=game_id).count() == 0
@@ -0,0 +1,77 @@
+# test_asgi.py
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get('KALAMBURY_RUNTIME', 'eventlet') != 'asgi', reason="tylko tryb ASGI (app/asgi.py)"
+)
+
+
+@pytest.fixture
+def probe(app):
+    """Rejestruje handler 'probe' na czas testu i wywołuje go kilka razy naraz."""
+    runtime = app.extensions['asgi_runtime']
+
+    def register(handler):
+        runtime.register_handler('probe', handler)
+
+        def trigger(*payloads):
+            async def all_at_once():
+                await asyncio.gather(*(
+                    runtime.sio._trigger_event('probe', '/', sid, data) for sid, data in payloads
+                ))
+            runtime.run(all_at_once())
+        return trigger
+
+    yield register
+    runtime.sio.handlers['/'].pop('probe', None)
+    runtime.handlers['/'].pop('probe', None)
+
+
+def test_handlers_of_one_room_never_overlap(probe):
+    """Zdarzenia jednego pokoju wykonują się po kolei, choć pula ma wiele wątków."""
+    lock = threading.Lock()
+    state = {'active': 0, 'max': 0}
+
+    def handler(sid, data):
+        with lock:
+            state['active'] += 1
+            state['max'] = max(state['max'], state['active'])
+        time.sleep(0.01)
+        with lock:
+            state['active'] -= 1
+
+    trigger = probe(handler)
+    trigger(*[(f'sid{i}', {'game_id': 7}) for i in range(5)])
+    assert state['max'] == 1
+
+
+def test_handlers_of_different_rooms_run_concurrently(probe):
+    """Pokoje się nie blokują - obaj uczestnicy muszą jednocześnie dojść do bariery."""
+    barrier = threading.Barrier(2, timeout=5)
+    trigger = probe(lambda sid, data: barrier.wait())
+    trigger(('a', {'game_id': 1}), ('b', {'room': '2'}))
+    assert not barrier.broken
+
+
+def test_fanout_reads_room_members_on_the_loop(app, monkeypatch):
+    """Wątek opróżniający kolejkę pokoju czyta członków pokoju w pętli, która je zmienia."""
+    from app import fanout
+
+    runtime = app.extensions['asgi_runtime']
+    runtime.start_loop_thread()
+    threads = []
+    get_participants = runtime.sio.manager.get_participants
+
+    def recording(namespace, room):
+        threads.append(threading.current_thread())
+        return get_participants(namespace, room)
+
+    monkeypatch.setattr(runtime.sio.manager, 'get_participants', recording)
+    members = fanout._members('game_0')
+    assert members == {} and threads == [runtime._loop_thread]
@@ -0,0 +1,78 @@
+# test_assets.py
+
+import gzip
+import json
+import os
+
+from app.assets import asset_url, build_assets
+
+
+def test_build_assets_hashes_and_compresses(tmp_path):
+    """Build nadaje nazwy z hashem treści, tworzy .gz i manifest, usuwa pliki spoza buildów."""
+    static_dir = tmp_path / "static"
+    (static_dir / "vendor").mkdir(parents=True)
+    (static_dir / "game.js").write_text("console.log('kalambury');\n" * 20)
+    (static_dir / "vendor" / "lib.js").write_text("x")
+    dist_dir = static_dir / "dist"
+    dist_dir.mkdir()
+    (dist_dir / "game.stary.js").write_text("stary build")
+
+    manifest = build_assets(str(static_dir), str(dist_dir), assets=["game.js", "vendor/lib.js"])
+
+    assert manifest["game.js"].startswith("dist/game.") and manifest["game.js"].endswith(".js")
+    assert manifest["vendor/lib.js"].startswith("dist/vendor/lib.")
+    assert not (dist_dir / "game.stary.js").exists()
+    assert json.loads((dist_dir / "manifest.json").read_text()) == manifest
+
+    built = static_dir / manifest["game.js"]
+    with gzip.open(f"{built}.gz") as gz:
+        assert gz.read() == built.read_bytes()
+    # Zbyt małych plików nie kompresujemy
+    assert not os.path.exists(static_dir / (manifest["vendor/lib.js"] + ".gz"))
+
+    # Ta sama treść - ta sama nazwa (stabilne URL-e między buildami)
+    assert build_assets(str(static_dir), str(dist_dir), assets=["game.js"])["game.js"] == manifest["game.js"]
+
+
+def test_build_assets_keeps_previous_builds(tmp_path):
+    """Pliki poprzednich buildów zostają (wdrożenie stopniowe), usuwane są dopiero starsze niż keep_builds."""
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+    dist_dir = static_dir / "dist"
+    builds = []
+    for version in range(3):
+        (static_dir / "game.js").write_text(f"console.log({version});\n" * 20)
+        builds.append(build_assets(str(static_dir), str(dist_dir), assets=["game.js"], keep_builds=2))
+
+    first, second, third = (static_dir / b["game.js"] for b in builds)
+    assert not first.exists() and not os.path.exists(f"{first}.gz")
+    assert second.exists() and os.path.exists(f"{second}.gz") and third.exists()
+    assert json.loads((dist_dir / "manifest.json").read_text()) == builds[-1]
+
+
+def test_asset_url_uses_manifest(app):
+    with app.test_request_context():
+        app.extensions['assets_manifest'] = {'game.js': 'dist/game.abc123.js'}
+        try:
+            assert asset_url('game.js') == '/static/dist/game.abc123.js'
+            # Brak wpisu w manifeście (np. dev bez buildu) - zwykły plik
+            assert asset_url('vendor/socket.io.min.js') == '/static/vendor/socket.io.min.js'
+        finally:
+            app.extensions.pop('assets_manifest')
+
+
+def test_asset_url_picks_up_manifest_built_after_start(app, tmp_path, monkeypatch):
+    """Shard bez własnego buildu (BUILD_ASSETS=0) nie zapamiętuje braku manifestu - łapie build web1."""
+    static_dir = tmp_path / "static"
+    (static_dir / "vendor").mkdir(parents=True)
+    (static_dir / "game.js").write_text("console.log('gra');\n" * 50)
+    (static_dir / "vendor" / "socket.io.min.js").write_text("var io;\n" * 50)
+    monkeypatch.setattr(app, 'static_folder', str(static_dir))
+    with app.test_request_context():
+        try:
+            assert asset_url('game.js') == '/static/game.js'
+            manifest = build_assets(str(static_dir), str(static_dir / "dist"))
+            assert asset_url('game.js') == f"/static/{manifest['game.js']}"
+            assert app.extensions['assets_manifest'] == manifest
+        finally:
+            app.extensions.pop('assets_manifest', None)
@@ -0,0 +1,79 @@
+# test_connections.py
+
+import threading
+
+from app import admission, socketio
+from app.connections import ConnectionRegistry
+from app.models import Game, Player
+from app.rooms import rooms
+from app.sockets import connected_players
+
+
+def test_registry_keeps_reverse_index_in_sync():
+    """Ponowne dołączenie przenosi sid do nowej gry, a pusta gra znika z indeksu."""
+    registry = ConnectionRegistry()
+    registry.add('a', 'Ala', '1')
+    registry.add('b', 'Ola', 1)
+    assert sorted(registry.sids(1)) == ['a', 'b']
+
+    registry.add('a', 'Ala', 2)
+    assert registry.sids(1) == ('b',) and registry.sids(2) == ('a',)
+    assert registry.is_playing(2, 'Ala') and not registry.is_playing(1, 'Ala')
+
+    assert registry.pop('b').username == 'Ola'
+    assert registry.pop('b') is None
+    assert registry.sids(1) == () and len(registry) == 1
+
+
+def test_registry_survives_concurrent_disconnects_from_one_game():
+    """Równoległe pop z jednej gry (tryb ASGI) nie gubią indeksu ani nie rzucają KeyError."""
+    registry = ConnectionRegistry()
+    for i in range(4000):
+        registry.add(f'sid{i}', f'Gracz{i}', 1)
+    errors = []
+
+    def disconnect(start):
+        try:
+            for i in range(start, 4000, 4):
+                registry.pop(f'sid{i}')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=disconnect, args=(start,)) for start in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and len(registry) == 0 and registry.sids(1) == ()
+
+
+def test_join_registers_interned_username(db_session, app):
+    """Rejestr i wyniki pokoju dzielą jeden obiekt nazwy gracza; rozłączenie czyści wpis."""
+    game = Game(name="Rejestr", creator="Gracz")
+    db_session.session.add(game)
+    db_session.session.commit()
+    client = socketio.test_client(app)
+    client.emit('join_game', {'game_id': game.id, 'username': ''.join(['Gr', 'acz'])})
+
+    (sid,) = connected_players.sids(game.id)
+    connection = connected_players.get(sid)
+    assert connection.game_id == game.id
+    (score_name,) = rooms[game.id].scores
+    assert score_name is connection.username
+
+    client.disconnect()
+    assert sid not in connected_players and connected_players.sids(game.id) == ()
+
+
+def test_join_with_non_text_username_takes_no_seat(db_session, app):
+    """Nazwa spoza str (np. liczba z JSON) jest odrzucana przed przyjęciem - bez miejsca i wiersza Player."""
+    game = Game(name="Rejestr", creator="Gracz")
+    db_session.session.add(game)
+    db_session.session.commit()
+    client = socketio.test_client(app)
+    client.emit('join_game', {'game_id': game.id, 'username': 123})
+
+    db_session.session.refresh(game)
+    assert game.player_count == 0
+    assert Player.query.filter_by(game_id=game.id).count() == 0
+    assert connected_players.sids(game.id) == () and len(admission.admitted) == 0
@@ -0,0 +1,165 @@
+# test_fanout.py
+
+import time
+
+from app import fanout, socketio
+from app.models import Game
+
+
+def make_room(db_session, app, players):
+    game = Game(name="Kolejki", creator="Gracz0")
+    db_session.session.add(game)
+    db_session.session.commit()
+    clients = []
+    for i in range(players):
+        client = socketio.test_client(app)
+        client.emit('join_game', {'game_id': game.id, 'username': f'Gracz{i}'})
+        clients.append(client)
+    for client in clients:
+        client.get_received()
+    return game.id, clients
+
+
+def names(client):
+    return [e['name'] for e in client.get_received()]
+
+
+def draw(client, game_id, x):
+    client.emit('drawing_data', {
+        'game_id': game_id, 'x1': x, 'y1': 0, 'x2': x + 1, 'y2': 1, 'color': '#000000', 'width': 2,
+        'new_stroke': x == 0
+    })
+
+
+def collect(clients, done, timeout=2):
+    """Zbiera zdarzenia klientów, aż done(odebrane) albo minie timeout.
+
+    W trybie kolejek zdarzenia wysyła greenthread (wątek w ASGI) w tle -
+    socketio.sleep oddaje mu pętlę.
+    """
+    received = {client: [] for client in clients}
+    deadline = time.monotonic() + timeout
+    while not done(received) and time.monotonic() < deadline:
+        socketio.sleep(0.01)
+        for client in clients:
+            received[client] += client.get_received()
+    return received
+
+
+def summary(events):
+    """(nazwa, x1 odcinka albo treść czatu) - do sprawdzania kolejności."""
+    args = [e['args'][0] for e in events]
+    return [(e['name'], a.get('x1', a.get('msg'))) for e, a in zip(events, args)]
+
+
+def test_slow_client_gets_canvas_snapshot_instead_of_backlog(db_session, app, monkeypatch):
+    """Zaległy gracz nie dostaje odcinków; po nadrobieniu - zaległy czat i jeden canvas_state."""
+    game_id, (drawer, fast, slow) = make_room(db_session, app, 3)
+    backlog = {slow.eio_sid: fanout.CLIENT_BUFFER + 1}
+    monkeypatch.setattr(fanout, '_backlog_size', lambda eio_sid: backlog.get(eio_sid, 0))
+
+    for x in range(3):
+        draw(drawer, game_id, x)
+    fast.emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': 'dom?'})
+    assert names(fast) == ['draw_line'] * 3 + ['chat_message']
+    assert names(slow) == []
+
+    backlog.clear()
+    fast.emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': 'kot?'})
+    received = slow.get_received()
+    assert [e['name'] for e in received] == ['chat_message', 'chat_message', 'canvas_state']
+    assert [s[:2] for s in received[-1]['args'][0]['strokes']] == [[0, 0], [1, 0], [2, 0]]
+
+    stats = fanout.stats()
+    assert stats['collapsed'] >= 3 and stats['snapshots'] >= 1 and stats['lagging_clients'] == 0
+
+
+def test_background_drain_delivers_and_reports_depth(db_session, app, monkeypatch):
+    """W trybie kolejek handler tylko kolejkuje; zdarzenie dociera po opróżnieniu kolejki w tle."""
+    game_id, (drawer, guesser) = make_room(db_session, app, 2)
+    monkeypatch.setitem(fanout._settings, 'async', True)
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'sekret')
+
+    drawer.emit('chat_message', {'username': 'Gracz0', 'room': game_id, 'msg': 'hej'})
+    received = collect([guesser], lambda got: got[guesser] and not fanout.queues)
+    assert [e['name'] for e in received[guesser]] == ['chat_message']
+
+    response = app.test_client().get('/admin/fanout', headers={'X-Admin-Token': 'sekret'})
+    assert response.json['async_mode'] is True
+    assert response.json['rooms_queued'] == 0 and response.json['queued_messages'] == 0
+
+
+def test_background_drain_keeps_event_order(db_session, app, monkeypatch):
+    """Odcinki i czat przeplatane przez różnych graczy docierają w kolejności wywołań broadcast."""
+    game_id, (drawer, guesser) = make_room(db_session, app, 2)
+    monkeypatch.setitem(fanout._settings, 'async', True)
+
+    expected = []
+    for x in range(30):
+        draw(drawer, game_id, x)
+        expected.append(('draw_line', x))
+        if x % 7 == 3:
+            guesser.emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': f'm{x}'})
+            expected.append(('chat_message', f'm{x}'))
+
+    received = collect([guesser], lambda got: len(got[guesser]) >= len(expected) and not fanout.queues)
+    assert summary(received[guesser]) == expected
+
+
+def test_background_drain_collapses_lagging_drawing_into_canvas_state(db_session, app, monkeypatch):
+    """W tle zaległy gracz czeka bez odcinków, a po nadrobieniu dostaje czat i jeden canvas_state."""
+    game_id, (drawer, fast, slow) = make_room(db_session, app, 3)
+    monkeypatch.setitem(fanout._settings, 'async', True)
+    backlog = {slow.eio_sid: fanout.CLIENT_BUFFER + 1}
+    monkeypatch.setattr(fanout, '_backlog_size', lambda eio_sid: backlog.get(eio_sid, 0))
+    collapsed = fanout.stats()['collapsed']
+
+    for x in range(3):
+        draw(drawer, game_id, x)
+    fast.emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': 'dom?'})
+    received = collect([fast, slow], lambda got: len(got[fast]) >= 4)
+    assert summary(received[fast]) == [('draw_line', 0), ('draw_line', 1), ('draw_line', 2), ('chat_message', 'dom?')]
+    assert received[slow] == []
+    # Zaległy gracz trzyma kolejkę pokoju przy życiu, aż nadrobi
+    assert len(fanout.queues[game_id].lagging) == 1
+    assert fanout.stats()['collapsed'] - collapsed == 3
+
+    backlog.clear()
+    received = collect([slow], lambda got: got[slow] and not fanout.queues)
+    assert [e['name'] for e in received[slow]] == ['chat_message', 'canvas_state']
+    assert [s[:2] for s in received[slow][-1]['args'][0]['strokes']] == [[0, 0], [1, 0], [2, 0]]
+
+
+def test_background_drain_drops_oldest_held_events(db_session, app, monkeypatch):
+    """Bufor zaległego gracza ma FANOUT_CLIENT_BUFFER miejsc - nadmiar wypiera najstarsze zdarzenia."""
+    game_id, (fast, slow) = make_room(db_session, app, 2)
+    monkeypatch.setitem(fanout._settings, 'async', True)
+    monkeypatch.setitem(fanout._settings, 'client_buffer', 4)
+    backlog = {slow.eio_sid: 5}
+    monkeypatch.setattr(fanout, '_backlog_size', lambda eio_sid: backlog.get(eio_sid, 0))
+    dropped = fanout.stats()['dropped']
+
+    for i in range(6):
+        fast.emit('chat_message', {'username': 'Gracz0', 'room': game_id, 'msg': f'm{i}'})
+    # Kolejka wysyła zdarzenie do pokoju przed odłożeniem go zaległemu - czekamy na oba
+    received = collect([fast, slow], lambda got: len(got[fast]) >= 6 and fanout.stats()['dropped'] - dropped >= 2)
+    assert len(received[fast]) == 6 and received[slow] == []
+    assert fanout.stats()['dropped'] - dropped == 2
+
+    backlog.clear()
+    received = collect([slow], lambda got: got[slow] and not fanout.queues)
+    assert summary(received[slow]) == [('chat_message', f'm{i}') for i in range(2, 6)]
+
+
+def test_legacy_join_broadcasts_through_room_queue(db_session, app, monkeypatch):
+    """Stare zdarzenie 'join' dołącza do pokoju gry i rozsyła powitanie przez kolejkę pokoju."""
+    game_id, (player,) = make_room(db_session, app, 1)
+    queued = []
+    broadcast = fanout.broadcast
+    monkeypatch.setattr(fanout, 'broadcast', lambda *args, **kwargs: (queued.append(args[:2]), broadcast(*args, **kwargs)))
+
+    guest = socketio.test_client(app)
+    guest.emit('join', {'game_id': game_id, 'username': 'Gosc'})
+
+    assert queued == [(game_id, 'system_message')]
+    assert names(player) == ['system_message'] and names(guest) == ['system_message']
@@ -0,0 +1,66 @@
+# test_janitor.py
+
+from datetime import datetime, timedelta
+
+from app import janitor, socketio
+from app.models import Game, Player
+from app.rooms import RoomState, rooms
+
+
+def make_game(db_session, name="Pokój", age=0, players=()):
+    game = Game(name=name, creator="Tester", created_at=datetime.utcnow() - timedelta(seconds=age))
+    db_session.session.add(game)
+    db_session.session.flush()
+    for username in players:
+        db_session.session.add(Player(username=username, game_id=game.id))
+    game.player_count = len(players)
+    db_session.session.commit()
+    return game.id
+
+
+def test_orphaned_players_are_removed_on_second_sweep(db_session, app):
+    """Gracz bez połączenia znika dopiero w drugim przebiegu, a licznik miejsc jest przeliczany."""
+    game_id = make_game(db_session, players=['Duch'])
+    client = socketio.test_client(app)
+    client.emit('join_game', {'game_id': game_id, 'username': 'Gracz'})
+
+    assert janitor.sweep() == (0, [])
+    assert janitor.sweep() == (1, [])
+
+    assert [p.username for p in Player.query.filter_by(game_id=game_id)] == ['Gracz']
+    assert db_session.session.get(Game, game_id).player_count == 1
+    assert 'Duch' not in rooms[game_id].scores
+    client.disconnect()
+
+
+def test_empty_games_are_deleted_in_batches_with_one_lobby_event(db_session, app, socket_client):
+    """Puste gry starsze niż okres karencji znikają, świeże zostają; lobby dostaje jedno zdarzenie."""
+    old_ids = [make_game(db_session, name=f"Stary {i}", age=600) for i in range(5)]
+    fresh_id = make_game(db_session, name="Nowy")
+    socket_client.get_received()
+
+    removed_players, deleted = janitor.sweep(batch_size=2, empty_grace=300)
+
+    assert removed_players == 0
+    assert sorted(deleted) == old_ids
+    assert [g.id for g in Game.query.all()] == [fresh_id]
+    events = [e for e in socket_client.get_received() if e['name'] == 'games_deleted']
+    assert len(events) == 1 and sorted(events[0]['args'][0]['game_ids']) == old_ids
+
+    assert janitor.sweep(empty_grace=0)[1] == [fresh_id]
+
+
+def test_rooms_of_deleted_games_are_dropped(db_session, app):
+    """Usunięcie gry przez twórcę porzuca jej pokój; pokój z migawki bez gry w bazie porzuca janitor."""
+    game_id = make_game(db_session, players=['Tester'])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = 'Tester'
+    rooms[game_id] = RoomState(game_id, drawer='Tester')
+    rooms[999] = RoomState(999, drawer='Nikt')  # gra usunięta przed restartem
+
+    client.post(f"/delete_game/{game_id}")
+    assert game_id not in rooms and 999 in rooms
+
+    janitor.sweep()
+    assert rooms == {}
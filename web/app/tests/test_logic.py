@@ -57,7 +57,7 @@ def test_start_game_word_picking(db_session, socket_client):
     socket_client.emit('join_game', {'game_id': game_id, 'username': "Drawer"})
     
     # Mapowanie SID klienta testowego do gracza (wymagane przez handle_start_game)
-    connected_players[sid] = {'username': "Drawer", 'game_id': game_id}
+    connected_players.add(sid, "Drawer", game_id)
     
     # 🟢 KLUCZOWA ZMIANA 2: Wyczyść wiadomości, które przyszły po 'join'
     # (np. system_message, że gracz dołączył), aby nie zakłócały testu
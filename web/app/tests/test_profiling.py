@@ -0,0 +1,92 @@
+# test_profiling.py
+
+import threading
+
+import pytest
+
+from app import profiling
+from app.models import Word
+
+
+class Clock:
+    """Ręcznie przesuwany zegar - testy nie zależą od szybkości maszyny."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(profiling, '_now', clock)
+    return clock
+
+
+@pytest.fixture
+def profiler(clock):
+    # Bez wątku watchdoga - testy wołają profiling._check() same
+    profiling.enable(slow_ms=50, stall_ms=100)
+    yield profiling
+    profiling.disable()
+    profiling.records.clear()
+    profiling._watchdog.update(beat=None, hub_thread=None, stall=None)
+
+
+def slow_handler_body(clock):
+    Word.query.count()
+    clock.advance(0.2)
+    profiling._check()  # watchdog próbkuje stos, gdy handler wciąż działa
+
+
+def test_slow_handler_is_recorded_with_sql_and_stack(db_session, profiler, clock):
+    """Handler powyżej progu trafia do historii z zapytaniami SQL i stosem z chwili działania."""
+    with profiling.track('event', 'start_game', game_id=7):
+        slow_handler_body(clock)
+    with profiling.track('event', 'chat_message', game_id=7):
+        clock.advance(0.01)  # szybki - poniżej progu
+
+    [record] = profiling.records
+    assert (record['kind'], record['name'], record['game_id']) == ('event', 'start_game', 7)
+    assert record['duration_ms'] == 200.0
+    assert record['sql_count'] == 1 and 'FROM word' in record['sql'][0]['statement']
+    assert 'slow_handler_body' in record['stack']
+
+
+def test_hub_stall_dumps_blocking_stack(profiler, clock):
+    """Brak pulsu pętli dłużej niż HUB_STALL_MS zapisuje zatrzymanie ze stosem blokującego kodu."""
+    profiling._watchdog.update(beat=clock(), hub_thread=threading.get_ident())
+    with profiling.track('event', 'drawing_data', game_id=3):
+        clock.advance(0.05)
+        profiling._check()  # jeszcze w normie
+        assert profiling._watchdog['stall'] is None
+        clock.advance(0.35)  # "blokujemy pętlę" - puls się nie odzywa
+        profiling._check()
+    profiling._watchdog['beat'] = clock()
+    profiling._check()
+
+    [stall] = [r for r in profiling.records if r['kind'] == 'stall']
+    assert stall['duration_ms'] == round((0.4 - profiling.HEARTBEAT_INTERVAL) * 1000, 1)
+    assert 'test_hub_stall_dumps_blocking_stack' in stall['stack']
+    assert stall['active'][0]['name'] == 'drawing_data'
+
+
+def test_admin_endpoint_requires_token(app, db_session, profiler, clock, monkeypatch):
+    """Panel /admin/slow jest wyłączony bez ADMIN_TOKEN i wymaga poprawnego tokenu."""
+    client = app.test_client()
+    assert client.get('/admin/slow').status_code == 404
+
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'sekret')
+    assert client.get('/admin/slow', headers={'X-Admin-Token': 'zly'}).status_code == 403
+
+    with profiling.track('view', 'main.lobby'):
+        clock.advance(0.06)
+    response = client.get('/admin/slow?kind=view', headers={'X-Admin-Token': 'sekret'})
+    assert response.status_code == 200
+    assert response.json['enabled'] is True
+    assert [r['name'] for r in response.json['records']] == ['main.lobby']
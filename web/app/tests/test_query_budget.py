@@ -0,0 +1,291 @@
+# test_query_budget.py
+#
+# Budżety zapytań SQL dla zdarzeń Socket.IO (app/sockets.py) i widoków (app/routes.py).
+# Każde zdarzenie sprawdzamy w małym pokoju i w pokoju z 50 graczami - liczba
+# zapytań nie może rosnąć z liczbą graczy (N+1). Podniesienie budżetu wymaga
+# uzasadnienia w review; obniżenie jest zawsze mile widziane.
+
+import io
+
+import pytest
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import socketio
+from app.models import Game, Player, Word
+
+SMALL_ROOM = 2
+FULL_ROOM = 50
+
+EVENT_BUDGETS = {
+    'connect': 0,
+    'join': 0,
+    'join_game': 8,
+    'join_game_again': 3,
+    'chat_message': 1,
+    'chat_message_guess': 16,
+    'start_game': 5,
+    'end_round': 8,
+    'drawing_data': 0,
+    'clear_canvas': 0,
+    'undo_stroke': 0,
+    'redo_stroke': 0,
+    'leave_game': 8,
+    'disconnect': 8,
+}
+
+VIEW_BUDGETS = {
+    'index': 0,
+    'lobby': 1,
+    'create_game_form': 1,
+    'create_game': 2,
+    'join_game': 5,
+    'join_game_private': 2,
+    'game_view': 2,
+    'delete_game': 4,
+    'manage_words': 2,
+    'manage_words_add': 3,
+    'import_words': 2,
+    'delete_word': 3,
+    'export_words': 2,
+    'admin_slow': 0,
+    'admin_admission': 0,
+    'admin_fanout': 0,
+}
+
+
+@pytest.fixture
+def room(db_session, app):
+    """Fabryka pokoi z graczami połączonymi przez Socket.IO (Gracz0 rysuje)."""
+    clients = []
+    # random_key=1.0 - losowanie hasła zawsze trafia za pierwszym zapytaniem, bez zawijania
+    db_session.session.add(Word(text="KOT", random_key=1.0))
+
+    def make(players, **game_kwargs):
+        game = Game(name="Budżet", creator="Gracz0", max_players=FULL_ROOM + 10, **game_kwargs)
+        db_session.session.add(game)
+        db_session.session.commit()
+        game_clients = []
+        for i in range(players):
+            client = socketio.test_client(app)
+            client.emit('join_game', {'game_id': game.id, 'username': f'Gracz{i}'})
+            game_clients.append(client)
+        clients.extend(game_clients)
+        for client in game_clients:
+            client.get_received()
+        return game.id, game_clients
+
+    yield make
+    for client in clients:
+        if client.is_connected():
+            client.disconnect()
+
+
+def start_round(game_id, clients):
+    clients[0].emit('start_game', {'game_id': game_id})
+
+
+def stroke(game_id):
+    return {'game_id': game_id, 'x1': 1, 'y1': 2, 'x2': 3, 'y2': 4, 'color': '#000000', 'width': 3}
+
+
+# Scenariusz: (game_id, klienci, app) -> przygotowanie; zwraca akcję mierzoną budżetem
+def connect_scenario(game_id, clients, app):
+    return lambda: clients.append(socketio.test_client(app))
+
+
+def join_scenario(game_id, clients, app):
+    return lambda: clients[1].emit('join', {'game_id': game_id, 'username': 'Gracz1'})
+
+
+def join_game_scenario(game_id, clients, app):
+    newcomer = socketio.test_client(app)
+    clients.append(newcomer)
+    return lambda: newcomer.emit('join_game', {'game_id': game_id, 'username': 'Nowy'})
+
+
+def join_game_again_scenario(game_id, clients, app):
+    return lambda: clients[1].emit('join_game', {'game_id': game_id, 'username': 'Gracz1'})
+
+
+def chat_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    return lambda: clients[1].emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': 'pies?'})
+
+
+def guess_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    return lambda: clients[1].emit('chat_message', {'username': 'Gracz1', 'room': game_id, 'msg': 'kot'})
+
+
+def start_game_scenario(game_id, clients, app):
+    return lambda: start_round(game_id, clients)
+
+
+def end_round_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    return lambda: clients[0].emit('end_round', {'game_id': game_id})
+
+
+def drawing_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    return lambda: clients[0].emit('drawing_data', stroke(game_id))
+
+
+def clear_canvas_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    clients[0].emit('drawing_data', stroke(game_id))
+    return lambda: clients[0].emit('clear_canvas', {'game_id': game_id})
+
+
+def undo_scenario(game_id, clients, app):
+    start_round(game_id, clients)
+    clients[0].emit('drawing_data', dict(stroke(game_id), new_stroke=True))
+    return lambda: clients[0].emit('undo_stroke', {'game_id': game_id})
+
+
+def redo_scenario(game_id, clients, app):
+    undo_scenario(game_id, clients, app)()
+    return lambda: clients[0].emit('redo_stroke', {'game_id': game_id})
+
+
+def leave_scenario(game_id, clients, app):
+    return lambda: clients[0].emit('leave_game', {'game_id': game_id, 'username': 'Gracz0'})
+
+
+def disconnect_scenario(game_id, clients, app):
+    return lambda: clients[0].disconnect()
+
+
+EVENT_SCENARIOS = {
+    'connect': connect_scenario,
+    'join': join_scenario,
+    'join_game': join_game_scenario,
+    'join_game_again': join_game_again_scenario,
+    'chat_message': chat_scenario,
+    'chat_message_guess': guess_scenario,
+    'start_game': start_game_scenario,
+    'end_round': end_round_scenario,
+    'drawing_data': drawing_scenario,
+    'clear_canvas': clear_canvas_scenario,
+    'undo_stroke': undo_scenario,
+    'redo_stroke': redo_scenario,
+    'leave_game': leave_scenario,
+    'disconnect': disconnect_scenario,
+}
+
+
+def test_every_event_handler_has_a_budget(app):
+    """Nowy handler w app/sockets.py musi dostać budżet zapytań w tym pliku."""
+    handlers = set(socketio.server.handlers['/'])
+    assert 'join_game' in handlers
+    assert handlers <= set(EVENT_BUDGETS), handlers - set(EVENT_BUDGETS)
+
+
+@pytest.mark.parametrize('name', sorted(EVENT_SCENARIOS))
+def test_event_query_budget(name, app, room, query_budget):
+    """Zdarzenie mieści się w budżecie i wysyła te same zapytania w małym i pełnym pokoju."""
+    budget = EVENT_BUDGETS[name]
+    logs = []
+    for players in (SMALL_ROOM, FULL_ROOM):
+        game_id, clients = room(players)
+        action = EVENT_SCENARIOS[name](game_id, clients, app)
+        with query_budget(budget, f"{name} ({players} graczy)") as log:
+            action()
+        logs.append(log)
+
+    small, full = logs
+    assert small.statements == full.statements, small.diff(
+        full, f"{name}: {SMALL_ROOM} graczy", f"{name}: {FULL_ROOM} graczy"
+    )
+
+
+# ---------- widoki ----------
+
+def make_game(db_session, players=0, **kwargs):
+    game = Game(name="Widok", creator="Gracz0", max_players=FULL_ROOM + 10, **kwargs)
+    db_session.session.add(game)
+    db_session.session.flush()
+    db_session.session.execute(insert(Player), [{'username': f'Gracz{i}', 'game_id': game.id} for i in range(players)])
+    game.player_count = players
+    db_session.session.commit()
+    return game.id
+
+
+def logged_in(app, username='Gracz0'):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = username
+    return client
+
+
+@pytest.fixture
+def lobby(app, db_session, monkeypatch):
+    """50 gier po 50 graczy, pusta gra publiczna i prywatna oraz 50 haseł."""
+    monkeypatch.setitem(app.config, 'ADMIN_TOKEN', 'sekret')
+    game_ids = [make_game(db_session, players=FULL_ROOM) for _ in range(FULL_ROOM)]
+    # Tani hash - set_password liczy domyślny (wolny) hash przy każdym teście
+    private_game = Game(name="Prywatna", creator="Gracz0", is_private=True,
+                        password_hash=generate_password_hash("tajne", method='pbkdf2:sha256:1'))
+    db_session.session.add(private_game)
+    db_session.session.add_all([Word(text=f"HASLO{i}") for i in range(FULL_ROOM)])
+    db_session.session.commit()
+    return {
+        'full': game_ids[0],
+        'public': make_game(db_session),
+        'private': private_game.id,
+        'word': Word.query.first().id,
+    }
+
+
+VIEW_REQUESTS = {
+    'index': lambda client, ids: client.get('/'),
+    'lobby': lambda client, ids: client.get('/lobby'),
+    'create_game_form': lambda client, ids: client.get('/create'),
+    'create_game': lambda client, ids: client.post('/create', data={'name': 'Nowa'}),
+    'join_game': lambda client, ids: client.get(f"/join/{ids['public']}"),
+    'join_game_private': lambda client, ids: client.get(f"/join/{ids['private']}"),
+    'game_view': lambda client, ids: client.get(f"/game/{ids['full']}"),
+    'delete_game': lambda client, ids: client.post(f"/delete_game/{ids['full']}"),
+    'manage_words': lambda client, ids: client.get('/words'),
+    'manage_words_add': lambda client, ids: client.post('/words', data={'word': 'NOWE'}),
+    'import_words': lambda client, ids: client.post('/words/import', data={
+        'file': (io.BytesIO('PIES\nKOT\nHASLO1\n'.encode()), 'hasla.txt')
+    }),
+    'delete_word': lambda client, ids: client.post(f"/delete_word/{ids['word']}"),
+    'export_words': lambda client, ids: client.get('/words/export'),
+    'admin_slow': lambda client, ids: client.get('/admin/slow', headers={'X-Admin-Token': 'sekret'}),
+    'admin_admission': lambda client, ids: client.get('/admin/admission', headers={'X-Admin-Token': 'sekret'}),
+    'admin_fanout': lambda client, ids: client.get('/admin/fanout', headers={'X-Admin-Token': 'sekret'}),
+}
+
+
+def test_every_view_has_a_budget(app):
+    """Nowy widok w app/routes.py musi dostać budżet zapytań w tym pliku."""
+    views = {rule.endpoint.split('.', 1)[1] for rule in app.url_map.iter_rules() if rule.endpoint.startswith('main.')}
+    # Warianty widoku mają nazwy z przyrostkiem, np. join_game_private
+    missing = {view for view in views if not any(name == view or name.startswith(view + '_') for name in VIEW_BUDGETS)}
+    assert not missing, missing
+
+
+@pytest.mark.parametrize('name', sorted(VIEW_BUDGETS))
+def test_view_query_budget(name, app, lobby, query_budget):
+    """Widok mieści się w budżecie przy 50 grach z 50 graczami w lobby."""
+    client = logged_in(app)
+    with query_budget(VIEW_BUDGETS[name], name):
+        response = VIEW_REQUESTS[name](client, lobby)
+        response.get_data()  # strumieniowane odpowiedzi wysyłają zapytania dopiero tu
+    assert response.status_code < 400
+
+
+def test_budget_failure_shows_statements(db_session, query_budget):
+    """Przekroczenie budżetu wypisuje zapytania i wskazuje powtórzone (N+1)."""
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with query_budget(1, 'n_plus_one'):
+            for game_id in (1, 2):
+                Player.query.filter_by(game_id=game_id).all()
+
+    message = str(failure.value)
+    assert message.startswith("n_plus_one: 2 zapytań SQL, budżet 1")
+    assert "+   2  SELECT player.id" in message
+    assert "2x  SELECT player.id" in message
@@ -0,0 +1,161 @@
+# test_rooms.py
+
+import os
+import threading
+
+from app import rooms as rooms_module, socketio
+from app.models import Game, Word
+from app.rooms import RoomState, rooms, dump_rooms, load_rooms, save_snapshot, restore_snapshot
+
+
+def test_snapshot_roundtrip_keeps_room_state():
+    """Migawka odtwarza hasło, rysującego, wyniki (w kolejności), koniec rundy, kreski i cofnięcia."""
+    room = RoomState(7, drawer="Ala", scores={"Ala": 2, "Bob": 0})
+    room.start_round("kot", 60)
+    room.add_stroke([0, 0, 10, 10, "#000000", 5])
+    room.add_stroke([5, 5, 6, 6, "#ff0000", 2], new_stroke=True)
+    room.undo_stroke()
+    rooms[7] = room
+
+    data = dump_rooms()
+    rooms.clear()
+    assert load_rooms(data) == 1
+
+    restored = rooms[7]
+    assert (restored.word, restored.drawer, restored.round_deadline) == ("kot", "Ala", room.round_deadline)
+    assert list(restored.scores.items()) == [("Ala", 2), ("Bob", 0)]
+    assert list(restored.strokes) == [[0, 0, 10, 10, "#000000", 5, 1]]
+    assert restored.undone == [[2, [[5, 5, 6, 6, "#ff0000", 2, 2]]]]
+    assert restored.add_stroke([1, 1, 2, 2, "#000000", 1], new_stroke=True) == 3
+    assert 58 <= restored.remaining_time() <= 60
+    rooms.clear()
+
+
+def test_corrupt_strokes_in_snapshot_give_empty_canvas():
+    """Uszkodzony blok kresek nie psuje pokoju - płótno jest puste, reszta stanu zostaje."""
+    room = RoomState(7, drawer="Ala", scores={"Ala": 2})
+    room.add_stroke([0, 0, 10, 10, "#000000", 5])
+    rooms[7] = room
+    data = bytearray(dump_rooms())
+    data[-3:] = b'xyz'  # koniec bloku kresek (ostatni w pliku)
+    rooms.clear()
+    assert load_rooms(bytes(data)) == 1
+
+    restored = rooms[7]
+    assert list(restored.strokes) == [] and restored.drawer == "Ala"
+    # Kolejna migawka nie przepisuje uszkodzonego bloku
+    data = dump_rooms()
+    rooms.clear()
+    assert load_rooms(data) == 1 and list(rooms[7].strokes) == []
+    rooms.clear()
+
+
+def test_periodic_snapshot_yields_between_chunks_and_writes_off_the_loop(tmp_path, monkeypatch):
+    """Pętla migawek oddaje hub co paczkę pokoi, a kompresję i zapis robi wątek puli."""
+    for game_id in range(1, 8):
+        rooms[game_id] = RoomState(game_id, drawer="Ala")
+        rooms[game_id].add_stroke([game_id, 0, 1, 1, "#000000", 2])
+    sleeps = []
+    monkeypatch.setattr(socketio, 'sleep', sleeps.append)
+    writers = []
+    write_file = rooms_module._write_file
+
+    def write_in_pool(path, data, save_id):
+        writers.append(threading.get_ident())
+        # Gracz rysuje w trakcie zapisu - ta kreska trafi do następnej migawki
+        rooms[1].add_stroke([9, 9, 9, 9, "#000000", 2])
+        write_file(path, data, save_id)
+
+    monkeypatch.setattr(rooms_module, '_write_file', write_in_pool)
+    path = str(tmp_path / "rooms.snapshot")
+    save_snapshot(path, chunk=3, offload=rooms_module._run_in_tpool)
+
+    assert sleeps == [0, 0]
+    assert writers and writers[0] != threading.get_ident()
+    assert rooms[1]._packed_strokes is None and rooms[2]._packed_strokes is not None
+    assert rooms_module._state['dirty']
+
+    rooms.clear()
+    assert restore_snapshot(path) == 7
+    assert list(rooms[1].strokes) == [[1, 0, 1, 1, "#000000", 2, 1]]
+    rooms.clear()
+
+
+def test_older_snapshot_never_replaces_newer(tmp_path):
+    """Migawka z wątku puli kończąca się po zapisie przy SIGTERM nie nadpisuje go."""
+    path = str(tmp_path / "rooms.snapshot")
+    older, newer = next(rooms_module._save_ids), next(rooms_module._save_ids)
+    rooms_module._write_file(path, b'nowsza', newer)
+    rooms_module._write_file(path, b'starsza', older)
+    with open(path, 'rb') as f:
+        assert f.read() == b'nowsza'
+    assert os.listdir(tmp_path) == ["rooms.snapshot"]
+
+
+def test_rejoin_after_restore_resumes_round(db_session, socket_client, app, tmp_path):
+    """Po restarcie (migawka -> pusta pamięć -> wczytanie) gracz dostaje stan rundy i kreski."""
+    db_session.session.add(Word(text="DOM"))
+    game = Game(name="Restart", creator="Rysownik", round_time=90)
+    db_session.session.add(game)
+    db_session.session.commit()
+    game_id = game.id
+
+    socket_client.emit('join_game', {'game_id': game_id, 'username': 'Rysownik'})
+    socket_client.emit('start_game', {'game_id': game_id})
+    socket_client.emit('drawing_data', {
+        'game_id': game_id, 'x1': 1, 'y1': 2, 'x2': 3, 'y2': 4, 'color': '#ff0000', 'width': 3, 'new_stroke': True
+    })
+
+    path = str(tmp_path / "rooms.snapshot")
+    save_snapshot(path)
+    rooms.clear()
+    assert restore_snapshot(path) == 1
+
+    guesser = socketio.test_client(app)
+    guesser.emit('join_game', {'game_id': game_id, 'username': 'Zgadujacy'})
+    state = next(e['args'][0] for e in guesser.get_received() if e['name'] == 'round_state')
+
+    assert state['drawer'] == 'Rysownik'
+    assert state['word_length'] == 3
+    assert 0 < state['remaining'] <= 90
+    assert state['strokes'] == [[1, 2, 3, 4, '#ff0000', 3, 1]]
+    assert list(rooms[game_id].scores) == ['Rysownik', 'Zgadujacy']
+
+
+def test_undo_and_redo_send_only_stroke_id(db_session, socket_client, app):
+    """Cofnięcie/przywrócenie to samo ID kreski; historia na serwerze zgadza się dla późno dołączających."""
+    game = Game(name="Cofanie", creator="Rysownik")
+    db_session.session.add(game)
+    db_session.session.commit()
+    game_id = game.id
+    socket_client.emit('join_game', {'game_id': game_id, 'username': 'Rysownik'})
+    guesser = socketio.test_client(app)
+    guesser.emit('join_game', {'game_id': game_id, 'username': 'Zgadujacy'})
+
+    def draw(x, new_stroke=False):
+        segment = {'game_id': game_id, 'x1': x, 'y1': 0, 'x2': x + 1, 'y2': 1, 'color': '#000000', 'width': 2}
+        return socket_client.emit('drawing_data', dict(segment, new_stroke=new_stroke), callback=True)
+
+    assert [draw(0, new_stroke=True), draw(1), draw(10, new_stroke=True), draw(11)] == [1, 1, 2, 2]
+    guesser.emit('undo_stroke', {'game_id': game_id})  # tylko rysujący może cofać
+    guesser.get_received()
+
+    socket_client.emit('undo_stroke', {'game_id': game_id})
+    assert [e for e in guesser.get_received() if e['name'] != 'draw_line'] == [
+        {'name': 'stroke_undone', 'args': [{'stroke_id': 2}], 'namespace': '/'}
+    ]
+
+    late = socketio.test_client(app)
+    late.emit('join_game', {'game_id': game_id, 'username': 'Spozniony'})
+    state = next(e['args'][0] for e in late.get_received() if e['name'] == 'round_state')
+    assert [s[6] for s in state['strokes']] == [1, 1]
+    assert [stroke_id for stroke_id, _ in state['undone']] == [2]
+
+    socket_client.emit('redo_stroke', {'game_id': game_id})
+    assert [e['args'][0] for e in late.get_received() if e['name'] == 'stroke_redone'] == [{'stroke_id': 2}]
+    assert [s[6] for s in rooms[game_id].strokes] == [1, 1, 2, 2]
+
+    # Nowa kreska kasuje historię redo
+    socket_client.emit('undo_stroke', {'game_id': game_id})
+    assert draw(20, new_stroke=True) == 3
+    assert rooms[game_id].undone == []
@@ -0,0 +1,44 @@
+# test_schema.py
+
+from sqlalchemy import inspect, text
+
+from app.models import Game
+from app.schema import upgrade_game_tables
+
+# Tabele gier i graczy z bazy sprzed kategorii pokoi, licznika miejsc i indeksów
+LEGACY_TABLES = [
+    "CREATE TABLE game (id INTEGER PRIMARY KEY, name VARCHAR(80), created_at DATETIME, is_private BOOLEAN, "
+    "password_hash VARCHAR(512), max_players INTEGER, round_time INTEGER, current_word VARCHAR(200), "
+    "current_drawer_id INTEGER REFERENCES player(id) ON DELETE SET NULL, creator VARCHAR(64) NOT NULL)",
+    "CREATE TABLE player (id INTEGER PRIMARY KEY, username VARCHAR(80), score INTEGER, sid VARCHAR(120), "
+    "game_id INTEGER REFERENCES game(id))",
+]
+
+
+def make_legacy_tables(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE player"))
+        connection.execute(text("DROP TABLE game"))
+        for ddl in LEGACY_TABLES:
+            connection.execute(text(ddl))
+        connection.execute(text(
+            "INSERT INTO game (id, name, max_players, creator) VALUES (1, 'Pełna', 8, 'Ala'), (2, 'Pusta', 8, 'Ola')"
+        ))
+        connection.execute(text("INSERT INTO player (username, score, game_id) VALUES ('Ala', 0, 1), ('Ela', 0, 1)"))
+
+
+def test_upgrade_adds_game_columns_and_counts_players(db_session, app):
+    """Stara tabela game dostaje kategorie i licznik miejsc policzony z graczy, a game/player - nowe indeksy."""
+    engine = db_session.engine
+    make_legacy_tables(engine)
+
+    assert upgrade_game_tables() == ['categories', 'player_count']
+    assert upgrade_game_tables() == []
+    assert {game.id: game.player_count for game in Game.query.all()} == {1: 2, 2: 0}
+    assert Game.query.get(1).category_list == []
+    inspector = inspect(engine)
+    assert 'ix_game_created_at' in {index['name'] for index in inspector.get_indexes('game')}
+    assert 'ix_player_game_id' in {index['name'] for index in inspector.get_indexes('player')}
+
+    result = app.test_cli_runner().invoke(args=['schema', 'upgrade'])
+    assert result.exit_code == 0 and 'dla 0 haseł' in result.output
@@ -0,0 +1,46 @@
+# test_sharding.py
+
+from app import janitor, socketio
+from app.sharding import HashRing, parse_nodes
+
+
+def test_hash_ring_is_stable_and_spreads_games():
+    """Ta sama gra zawsze trafia do tego samego workera, a gry rozkładają się na wszystkie."""
+    nodes = parse_nodes("web1:5000, web2:5000,web3:5000")
+    ring = HashRing(nodes)
+
+    owners = {game_id: ring.node_for(game_id) for game_id in range(1, 3001)}
+    assert owners == {game_id: HashRing(nodes).node_for(str(game_id)) for game_id in range(1, 3001)}
+
+    counts = {node: list(owners.values()).count(node) for node in nodes}
+    assert all(count > 500 for count in counts.values()), counts
+
+
+def test_hash_ring_moves_only_games_of_added_worker():
+    """Po dodaniu workera gry przechodzą tylko do niego (spójne haszowanie)."""
+    before = HashRing(["web1:5000", "web2:5000", "web3:5000"])
+    after = HashRing(["web1:5000", "web2:5000", "web3:5000", "web4:5000"])
+
+    moved = [g for g in range(1, 2001) if before.node_for(g) != after.node_for(g)]
+    assert moved
+    assert all(after.node_for(g) == "web4:5000" for g in moved)
+    assert len(moved) < 2000 * 0.4
+
+
+def test_game_deleted_reaches_lobby_without_sharding(db_session, socket_client, app):
+    """Bez SHARD_NODES zdarzenia lobby są emitowane lokalnie, jak dotychczas."""
+    from app.models import Game
+
+    game = Game(name="Pusta", creator="Tester")
+    db_session.session.add(game)
+    db_session.session.commit()
+    game_id = game.id
+
+    player_client = socketio.test_client(app)
+    player_client.emit('join_game', {'game_id': game_id, 'username': 'Gracz'})
+    socket_client.get_received()
+    player_client.disconnect()
+    janitor.sweep()
+
+    received = socket_client.get_received()
+    assert any(e['name'] == 'games_deleted' and game_id in e['args'][0]['game_ids'] for e in received)
@@ -0,0 +1,108 @@
+# test_words.py
+
+import io
+
+from sqlalchemy import inspect, text
+
+from app.models import Game, Word
+from app.words import (
+    import_words, import_words_from_stream, export_lines, pick_random_word, words_page, upgrade_word_table
+)
+
+
+def test_import_words_deduplicates_and_counts(db_session):
+    """Import pomija duplikaty (w pliku i w bazie), puste linie i za długie hasła."""
+    db_session.session.add(Word(text="kot"))
+    db_session.session.commit()
+
+    lines = ["kot\n", "pies\n", "\n", "pies\n", "# komentarz\n", "x" * 101 + "\n", "żółw\n"]
+    stats = import_words(lines, chunk_size=2)
+
+    assert stats == {'read': 5, 'inserted': 2, 'duplicates': 2, 'skipped': 1}
+    assert sorted(w.text for w in Word.query.all()) == ["kot", "pies", "żółw"]
+
+
+def test_import_from_stream_and_export_roundtrip(db_session):
+    """Plik UTF-8 (z BOM) importuje się w całości, a eksport zwraca te same hasła."""
+    payload = "﻿zebra\r\nżyrafa\nłoś\n".encode('utf-8')
+    stats = import_words_from_stream(io.BytesIO(payload))
+    assert stats['inserted'] == 3
+
+    assert list(export_lines(batch_size=2)) == ["zebra\n", "żyrafa\n", "łoś\n"]
+
+
+def test_import_and_export_views(db_session, app):
+    """Endpoint uploadu importuje plik, a eksport jest strumieniowany jako tekst."""
+    client = app.test_client()
+    response = client.post('/words/import', data={
+        'file': (io.BytesIO("alfa\nbeta\nalfa\n".encode('utf-8')), 'hasla.txt')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert Word.query.count() == 2
+
+    response = client.get('/words/export')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "alfa\nbeta\n"
+
+
+def test_pick_random_word_respects_categories_and_wraps(db_session):
+    """Losowanie bierze hasła tylko z wybranych kategorii i zawija się za ostatnim kluczem."""
+    db_session.session.add_all([
+        Word(text="kot", category="zwierzęta", random_key=0.1),
+        Word(text="pies", category="zwierzęta", random_key=0.5),
+        Word(text="gitara", category="muzyka", random_key=0.3),
+        Word(text="rower", category=None, random_key=0.9),
+    ])
+    db_session.session.commit()
+
+    for _ in range(20):
+        assert pick_random_word(["zwierzęta"]).text in {"kot", "pies"}
+        assert pick_random_word(["muzyka", "zwierzęta"]).text in {"kot", "pies", "gitara"}
+    assert pick_random_word(["brak"]) is None
+    assert pick_random_word().text in {"kot", "pies", "gitara", "rower"}
+
+
+def test_words_page_keyset_pagination_and_prefix_search(db_session):
+    """Panel haseł stronicuje po kursorze i wyszukuje po prefiksie (z ucieczką % i _)."""
+    db_session.session.add_all([Word(text=f"slowo{i}") for i in range(5)] + [Word(text="sl%wo")])
+    db_session.session.commit()
+
+    first, cursor = words_page(page_size=4)
+    second, last_cursor = words_page(after=cursor, page_size=4)
+    assert [w.text for w in first + second] == ["sl%wo", "slowo4", "slowo3", "slowo2", "slowo1", "slowo0"]
+    assert last_cursor is None
+
+    found, cursor = words_page(prefix="slowo", page_size=3)
+    assert [w.text for w in found] == ["slowo0", "slowo1", "slowo2"]
+    found, cursor = words_page(prefix="slowo", after=cursor, page_size=3)
+    assert [w.text for w in found] == ["slowo3", "slowo4"]
+    assert [w.text for w in words_page(prefix="sl%")[0]] == ["sl%wo"]
+
+
+def test_create_game_stores_selected_categories(db_session, app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = "Tworca"
+    client.post('/create', data={'name': "Kategorie", 'categories': ["Muzyka", "zwierzęta", ""]})
+
+    game = Game.query.filter_by(name="Kategorie").first()
+    assert game.category_list == ["muzyka", "zwierzęta"]
+
+
+def test_backfill_upgrades_legacy_word_table(db_session, app):
+    """Stara tabela word (bez kategorii i random_key) dostaje kolumny, indeksy i klucze losowania."""
+    engine = db_session.engine
+    Word.__table__.drop(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE word (id INTEGER PRIMARY KEY, text VARCHAR(100) NOT NULL UNIQUE)"))
+        connection.execute(text("INSERT INTO word (text) VALUES ('kot'), ('pies'), ('dom')"))
+
+    assert upgrade_word_table(batch_size=2) == 3
+    assert upgrade_word_table() == 0
+    indexes = {index['name'] for index in inspect(engine).get_indexes('word')}
+    assert {'ix_word_random_key', 'ix_word_category_random_key'} <= indexes
+    assert {w.difficulty for w in Word.query.all()} == {2}
+    assert pick_random_word().text in {'kot', 'pies', 'dom'}
+
+    result = app.test_cli_runner().invoke(args=['words', 'backfill'])
+    assert result.exit_code == 0 and 'dla 0 haseł' in result.output
@@ -0,0 +1,291 @@
+import io
+import random
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect, select, insert, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import Word
+from .schema import add_missing_columns, create_missing_indexes
+
+# Rozmiar paczki dla importu - jeden wielowierszowy INSERT na paczkę.
+# SQLite (>= 3.32) pozwala na 32766 parametrów, więc 1000 słów jest bezpieczne.
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_BATCH_SIZE = 5000
+
+# Limit długości kolumny Word.text
+MAX_WORD_LENGTH = Word.__table__.c.text.type.length
+MAX_CATEGORY_LENGTH = Word.__table__.c.category.type.length
+
+DIFFICULTY_LEVELS = {1: 'łatwe', 2: 'średnie', 3: 'trudne'}
+DEFAULT_DIFFICULTY = 2
+
+# Rozmiar strony w panelu haseł
+WORDS_PAGE_SIZE = 50
+# Paczka losowania random_key dla haseł ze starej bazy
+BACKFILL_BATCH_SIZE = 1000
+
+words_cli = AppGroup('words', help='Import i eksport listy haseł.')
+
+
+def iter_word_chunks(lines, chunk_size=IMPORT_CHUNK_SIZE, stats=None):
+    """Czyta hasła linia po linii i zwraca je paczkami (bez duplikatów w paczce).
+
+    Puste linie i komentarze (#) są pomijane, zbyt długie hasła liczone jako 'skipped'.
+    """
+    chunk = []
+    seen = set()
+    for line in lines:
+        text = line.strip()
+        if not text or text.startswith('#'):
+            continue
+        if stats is not None:
+            stats['read'] += 1
+        if len(text) > MAX_WORD_LENGTH:
+            if stats is not None:
+                stats['skipped'] += 1
+            continue
+        if text in seen:
+            continue
+        seen.add(text)
+        chunk.append(text)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+            seen = set()
+    if chunk:
+        yield chunk
+
+
+def normalize_category(category):
+    """Kategorie przechowujemy małymi literami; pusta wartość oznacza brak kategorii."""
+    category = (category or '').strip().lower()
+    return category[:MAX_CATEGORY_LENGTH] or None
+
+
+def parse_difficulty(value):
+    try:
+        difficulty = int(value)
+    except (ValueError, TypeError):
+        return DEFAULT_DIFFICULTY
+    return difficulty if difficulty in DIFFICULTY_LEVELS else DEFAULT_DIFFICULTY
+
+
+def _insert_chunk(chunk, category=None, difficulty=DEFAULT_DIFFICULTY):
+    """Wstawia paczkę haseł jednym zapytaniem, ignorując konflikty na Word.text.
+
+    Zwraca liczbę faktycznie dodanych wierszy.
+    """
+    rows = [
+        {'text': text, 'category': category, 'difficulty': difficulty, 'random_key': random.random()}
+        for text in chunk
+    ]
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(Word).values(rows).on_conflict_do_nothing(index_elements=['text'])
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(Word).values(rows).on_conflict_do_nothing(index_elements=['text'])
+    else:
+        # Inne bazy: odfiltruj istniejące hasła jednym zapytaniem IN
+        existing = set(db.session.scalars(select(Word.text).where(Word.text.in_(chunk))))
+        rows = [r for r in rows if r['text'] not in existing]
+        if not rows:
+            return 0
+        stmt = insert(Word).values(rows)
+
+    result = db.session.execute(stmt)
+    return result.rowcount
+
+
+def import_words(lines, chunk_size=IMPORT_CHUNK_SIZE, category=None, difficulty=DEFAULT_DIFFICULTY):
+    """Importuje hasła z iterowalnego źródła linii (np. otwartego pliku).
+
+    Każda paczka jest zatwierdzana osobno, więc duże pliki nie trzymają
+    jednej długiej transakcji. Wszystkie hasła z pliku dostają tę samą
+    kategorię i trudność. Zwraca słownik z licznikami.
+    """
+    category = normalize_category(category)
+    difficulty = parse_difficulty(difficulty)
+    stats = {'read': 0, 'inserted': 0, 'duplicates': 0, 'skipped': 0}
+    for chunk in iter_word_chunks(lines, chunk_size, stats):
+        try:
+            stats['inserted'] += _insert_chunk(chunk, category, difficulty)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    stats['duplicates'] = stats['read'] - stats['skipped'] - stats['inserted']
+    return stats
+
+
+def import_words_from_stream(stream, chunk_size=IMPORT_CHUNK_SIZE, category=None, difficulty=DEFAULT_DIFFICULTY):
+    """Importuje hasła z binarnego strumienia UTF-8 (np. przesłanego pliku)."""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline=None)
+    try:
+        return import_words(text_stream, chunk_size, category, difficulty)
+    finally:
+        # Nie zamykamy strumienia źródłowego - należy do wywołującego
+        text_stream.detach()
+
+
+def iter_words(batch_size=EXPORT_BATCH_SIZE):
+    """Zwraca wszystkie hasła w kolejności ID, pobierając je paczkami (keyset)."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Word.id, Word.text)
+            .where(Word.id > last_id)
+            .order_by(Word.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row.text
+        last_id = rows[-1].id
+
+
+def export_lines(batch_size=EXPORT_BATCH_SIZE):
+    """Generator linii pliku eksportu (jedno hasło na linię)."""
+    for text in iter_words(batch_size):
+        yield text + '\n'
+
+
+def pick_random_word(categories=None):
+    """Losuje hasło (opcjonalnie z podanych kategorii) bez ładowania całej tabeli.
+
+    Losujemy punkt r i bierzemy hasło o najmniejszym random_key >= r. Dla listy
+    kategorii robimy osobne wyszukiwanie w indeksie (category, random_key) dla
+    każdej z nich i wybieramy minimum - to samo, co jedno zapytanie po sumie
+    kategorii, ale każda gałąź to pojedynczy skok w indeksie. Gdy r wypadnie
+    za ostatnim kluczem, zawijamy na początek.
+    """
+    r = random.random()
+    word = _first_word_from(r, categories)
+    if word is None:
+        word = _first_word_from(0.0, categories)
+    return word
+
+
+def _first_word_from(start, categories):
+    if not categories:
+        return db.session.scalars(
+            select(Word).where(Word.random_key >= start).order_by(Word.random_key).limit(1)
+        ).first()
+
+    branches = [
+        select(Word.id, Word.random_key)
+        .where(Word.category == category, Word.random_key >= start)
+        .order_by(Word.random_key)
+        .limit(1)
+        .subquery()
+        for category in categories
+    ]
+    candidates = union_all(*(select(b.c.id, b.c.random_key) for b in branches)).subquery()
+    word_id = db.session.scalar(
+        select(candidates.c.id).order_by(candidates.c.random_key).limit(1)
+    )
+    return db.session.get(Word, word_id) if word_id is not None else None
+
+
+def list_categories():
+    """Zwraca posortowaną listę istniejących kategorii (z indeksu na Word.category)."""
+    return list(db.session.scalars(
+        select(Word.category).where(Word.category.isnot(None)).distinct().order_by(Word.category)
+    ))
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def words_page(prefix=None, after=None, page_size=WORDS_PAGE_SIZE):
+    """Jedna strona panelu haseł (paginacja keyset zamiast OFFSET).
+
+    Bez wyszukiwania sortujemy po ID malejąco, a kursorem jest ostatnie ID.
+    Przy wyszukiwaniu po prefiksie sortujemy po tekście (ten sam indeks co LIKE),
+    a kursorem jest ostatnie hasło. Zwraca (hasła, kursor następnej strony).
+    """
+    query = select(Word)
+    if prefix:
+        query = query.where(Word.text.like(_escape_like(prefix) + '%', escape='\\'))
+        if after:
+            query = query.where(Word.text > after)
+        query = query.order_by(Word.text.asc())
+    else:
+        try:
+            after_id = int(after) if after else None
+        except ValueError:
+            after_id = None
+        if after_id is not None:
+            query = query.where(Word.id < after_id)
+        query = query.order_by(Word.id.desc())
+
+    words = list(db.session.scalars(query.limit(page_size + 1)))
+    next_cursor = None
+    if len(words) > page_size:
+        words = words[:page_size]
+        last = words[-1]
+        next_cursor = last.text if prefix else str(last.id)
+    return words, next_cursor
+
+
+def upgrade_word_table(batch_size=BACKFILL_BATCH_SIZE):
+    """Dostosowuje tabelę word z bazy sprzed kategorii i losowania po indeksie.
+
+    Dodaje brakujące kolumny (category, difficulty z domyślną wartością w bazie,
+    random_key - najpierw jako NULL, bo SQLite nie doda kolumny NOT NULL
+    z losową wartością domyślną) i indeksy, a potem paczkami losuje random_key
+    hasłom, które go nie mają. Hasło bez klucza nigdy nie zostałoby wylosowane.
+    Bezpieczne do wielokrotnego uruchamiania. Zwraca liczbę uzupełnionych haseł.
+    """
+    if not inspect(db.engine).has_table(Word.__tablename__):
+        return 0
+    add_missing_columns(Word, ('category', 'difficulty', 'random_key'))
+    create_missing_indexes(Word)
+
+    filled = 0
+    while True:
+        ids = db.session.scalars(select(Word.id).where(Word.random_key.is_(None)).limit(batch_size)).all()
+        if not ids:
+            return filled
+        db.session.execute(update(Word), [{'id': word_id, 'random_key': random.random()} for word_id in ids])
+        db.session.commit()
+        filled += len(ids)
+
+
+@words_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig', lazy=False))
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True, help='Liczba haseł na jeden INSERT.')
+@click.option('--category', default=None, help='Kategoria przypisywana wszystkim hasłom z pliku.')
+@click.option('--difficulty', type=click.IntRange(1, 3), default=DEFAULT_DIFFICULTY, show_default=True,
+              help='Trudność haseł (1-3).')
+def import_command(source, chunk_size, category, difficulty):
+    """Importuje hasła z pliku UTF-8 (jedno hasło na linię, '-' = stdin)."""
+    stats = import_words(source, chunk_size, category, difficulty)
+    click.echo(
+        f"Wczytano: {stats['read']}, dodano: {stats['inserted']}, "
+        f"duplikaty: {stats['duplicates']}, pominięto: {stats['skipped']}"
+    )
+
+
+@words_cli.command('export')
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+def export_command(target):
+    """Eksportuje wszystkie hasła do pliku UTF-8 ('-' = stdout)."""
+    count = 0
+    for line in export_lines():
+        target.write(line)
+        count += 1
+    click.echo(f"Wyeksportowano {count} haseł.", err=True)
+
+
+@words_cli.command('backfill')
+@click.option('--batch-size', default=BACKFILL_BATCH_SIZE, show_default=True, help='Liczba haseł na jeden UPDATE.')
+def backfill_command(batch_size):
+    """Dodaje brakujące kolumny i indeksy haseł i losuje random_key starym hasłom."""
+    filled = upgrade_word_table(batch_size)
+    click.echo(f"Uzupełniono random_key dla {filled} haseł.")
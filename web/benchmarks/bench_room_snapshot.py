@@ -0,0 +1,115 @@
+"""Benchmark migawki pokoi (ciepły restart): czas zapisu, rozmiar pliku i czas odtworzenia.
+
+Pokoje mają trwającą rundę, kilku graczy i zapełnioną historię kresek
+(domyślnie pełne RECENT_STROKES - najgorszy przypadek). Zapis w tle (jak
+w pętli migawek pod eventlet) mierzy najdłuższą przerwę huba - tyle czekają
+wtedy wszystkie gniazda.
+
+Uruchomienie (z katalogu web/):
+    python benchmarks/bench_room_snapshot.py --rooms 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eventlet  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.rooms import (  # noqa: E402
+    RoomState, RECENT_STROKES, SNAPSHOT_CHUNK, rooms, save_snapshot, restore_snapshot, _run_in_tpool
+)
+
+
+def fill_rooms(count, players, strokes):
+    rooms.clear()
+    rng = random.Random(0)
+    for game_id in range(1, count + 1):
+        room = RoomState(game_id, scores={f"gracz{i}": rng.randint(0, 20) for i in range(players)})
+        room.drawer = "gracz0"
+        room.start_round(f"haslo{game_id}", 90)
+        for _ in range(strokes):
+            # Jak z game.js: offsetX/offsetY w pikselach, grubość jako wartość pola <input>
+            x, y = rng.randint(0, 800), rng.randint(0, 600)
+            room.add_stroke([x, y, x + 3, y + 2, "#000000", "5"])
+        rooms[game_id] = room
+
+
+def longest_hub_pause(save):
+    """Najdłuższa przerwa między taktami greenthreadu podczas save() (ms)."""
+    ticks = []
+
+    def ticker():
+        while True:
+            ticks.append(time.perf_counter())
+            eventlet.sleep(0.001)
+
+    thread = eventlet.spawn(ticker)
+    eventlet.sleep(0.01)
+    save()
+    eventlet.sleep(0.01)
+    thread.kill()
+    return max(b - a for a, b in zip(ticks, ticks[1:])) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--strokes', type=int, default=RECENT_STROKES, help='Kresek na pokój.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Aplikacja tylko dla socketio.sleep (eventlet) - bez bazy, migawek i zadań w tle
+    create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'ROOM_SNAPSHOT_PATH': None,
+                'JANITOR_INTERVAL': 0, 'SHED_LAG_MS': 0})
+    path = os.path.join(tempfile.mkdtemp(), 'rooms.snapshot')
+    fill_rooms(args.rooms, args.players, args.strokes)
+
+    # Pierwszy zapis koduje kreski wszystkich pokoi (każdy pokój rysował od ostatniej migawki)
+    start = time.perf_counter()
+    size = save_snapshot(path)
+    cold_save = time.perf_counter() - start
+
+    # Ten sam zapis w tle: kodowanie paczkami na hubie, kompresja i fsync w tpool
+    fill_rooms(args.rooms, args.players, args.strokes)
+    blocking_pause = longest_hub_pause(lambda: save_snapshot(path))
+    fill_rooms(args.rooms, args.players, args.strokes)
+    background_pause = longest_hub_pause(lambda: save_snapshot(path, SNAPSHOT_CHUNK, _run_in_tpool))
+
+    save_times, restore_times, decode_times = [], [], []
+    for _ in range(args.repeat):
+        rooms.clear()
+        start = time.perf_counter()
+        restored = restore_snapshot(path)
+        restore_times.append(time.perf_counter() - start)
+        assert restored == args.rooms
+
+        # Zapis po restarcie, gdy nikt jeszcze nie rysował - kreski z pamięci podręcznej
+        start = time.perf_counter()
+        save_snapshot(path)
+        save_times.append(time.perf_counter() - start)
+
+        # Dekodowanie kresek wszystkich pokoi (każdy gracz wrócił i dostał round_state)
+        start = time.perf_counter()
+        for room in rooms.values():
+            room.strokes
+        decode_times.append(time.perf_counter() - start)
+
+    print(f"{args.rooms} pokoi x {args.players} graczy, {args.strokes} kresek na pokój")
+    print(f"Plik:                {size / 1024:,.0f} KiB ({size / args.rooms:,.0f} B/pokój)")
+    print(f"Zapis (wszystkie zmienione): {cold_save * 1000:,.1f} ms")
+    print(f"Zapis (bez zmian kresek):    {min(save_times) * 1000:,.1f} ms")
+    print(f"Przerwa huba, zapis od razu: {blocking_pause:,.1f} ms")
+    print(f"Przerwa huba, zapis w tle:   {background_pause:,.1f} ms (paczki po {SNAPSHOT_CHUNK} pokoi)")
+    print(f"Odtworzenie przy starcie:    {min(restore_times) * 1000:,.1f} ms (najlepszy z {args.repeat})")
+    print(f"Dekodowanie kresek wszystkich pokoi: {min(decode_times) * 1000:,.1f} ms")
+    os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
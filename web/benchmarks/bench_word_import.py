@@ -0,0 +1,79 @@
+"""Benchmark importu listy haseł (words/s).
+
+Uruchomienie (z katalogu web/):
+    python benchmarks/bench_word_import.py --words 50000
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/bench_word_import.py
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import Word  # noqa: E402
+from app.words import import_words_from_stream, iter_words, IMPORT_CHUNK_SIZE  # noqa: E402
+
+
+def make_word_file(count, duplicate_ratio):
+    """Generuje plik UTF-8 z hasłami; część linii to celowe duplikaty."""
+    lines = []
+    unique = int(count * (1 - duplicate_ratio))
+    for i in range(count):
+        n = i if i < unique else i % max(unique, 1)
+        lines.append(f"hasło-{n:07d}")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--words', type=int, default=50000)
+    parser.add_argument('--duplicates', type=float, default=0.1, help='Udział duplikatów w pliku (0-1).')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db_file = None
+    config = {}
+    if not os.environ.get('DATABASE_URL'):
+        db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_file.name}"
+
+    app = create_app(config)
+    payload = make_word_file(args.words, args.duplicates)
+
+    with app.app_context():
+        db.create_all()
+        Word.query.delete()
+        db.session.commit()
+
+        start = time.perf_counter()
+        stats = import_words_from_stream(io.BytesIO(payload), args.chunk_size)
+        import_time = time.perf_counter() - start
+
+        # Drugi import tego samego pliku - sama deduplikacja
+        start = time.perf_counter()
+        import_words_from_stream(io.BytesIO(payload), args.chunk_size)
+        reimport_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = sum(1 for _ in iter_words())
+        export_time = time.perf_counter() - start
+
+        print(f"Baza: {db.engine.dialect.name}, paczka: {args.chunk_size}")
+        print(f"Import:    {stats['read']} linii, dodano {stats['inserted']}, "
+              f"duplikaty {stats['duplicates']} -> {stats['read'] / import_time:,.0f} words/s")
+        print(f"Reimport:  {stats['read'] / reimport_time:,.0f} words/s")
+        print(f"Eksport:   {exported} haseł -> {exported / export_time:,.0f} words/s")
+
+        Word.query.delete()
+        db.session.commit()
+
+    if db_file is not None:
+        os.unlink(db_file.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Wspólne narzędzia benchmarków: lokalne serwery, baza z grami i klienci Socket.IO.
+
+Wymaga zależności z benchmarks/requirements.txt (klient Socket.IO, psutil).
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+WEB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, WEB_DIR)
+
+
+def prepare_database(db_path, rooms, words=100, max_players=None):
+    """Tworzy bazę SQLite z `rooms` grami i kilkoma hasłami. Zwraca listę ID gier."""
+    from app import create_app, db
+    from app.models import Game, Word
+
+    if os.path.exists(db_path):
+        os.unlink(db_path)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}", 'ROOM_SNAPSHOT_PATH': None})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Word(text=f"haslo{i}") for i in range(words)])
+        capacity = {'max_players': max_players} if max_players else {}
+        games = [Game(name=f"Bench {i}", creator="bench", **capacity) for i in range(rooms)]
+        db.session.add_all(games)
+        db.session.commit()
+        return [g.id for g in games]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Serwer na porcie {port} nie wystartował")
+
+
+def start_server(port, db_path, extra_env=None, command=None):
+    """Uruchamia jeden proces serwera (domyślnie run.py - socketio.run na eventlet)."""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{db_path}", 'PORT': str(port),
+        # Osobna migawka pokoi dla każdego serwera - inaczej workery nadpisywałyby sobie plik
+        'ROOM_SNAPSHOT_PATH': f"{db_path}.{port}.rooms",
+    })
+    env.update(extra_env or {})
+    if command is None:
+        command = [sys.executable, 'run.py']
+    # Logi serwera (każde połączenie, print-y handlerów) zagłuszyłyby wyniki
+    proc = subprocess.Popen(command, cwd=WEB_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        proc.kill()
+        raise
+    return proc
+
+
+def stop_servers(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def connect_client(url, game_id=None, **handlers):
+    """Łączy klienta Socket.IO (websocket) i rejestruje podane handlery zdarzeń."""
+    import socketio as socketio_client
+
+    client = socketio_client.Client(reconnection=False)
+    for event, handler in handlers.items():
+        client.on(event, handler)
+    query = f"?game_id={game_id}" if game_id is not None else ''
+    client.connect(url + query, transports=['websocket'], wait_timeout=10)
+    return client
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
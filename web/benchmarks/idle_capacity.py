@@ -0,0 +1,181 @@
+"""Pamięć bezczynnych połączeń: RSS serwera na połączenie.
+
+Uruchamia serwer (run.py, eventlet), mierzy RSS procesu bez klientów, potem
+otwiera --connections połączeń Socket.IO (websocket), mierzy RSS, a na koniec
+każde połączenie dołącza do jednego z --rooms pokoi (join_game) i RSS jest
+mierzony ponownie. Klienci nic nie wysyłają poza odpowiedziami na ping.
+
+Klient to surowy websocket (Engine.IO v4) obsługiwany przez jeden wątek
+z selektorem - klient Socket.IO z wątkami na połączenie nie udźwignąłby
+10 000 połączeń w jednym procesie.
+
+Uruchomienie (z katalogu web/):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/idle_capacity.py --connections 10000 --rooms 1000
+"""
+import argparse
+import json
+import os
+import resource
+import selectors
+import tempfile
+import time
+
+import psutil
+import websocket
+
+from harness import prepare_database, free_port, start_server, stop_servers
+
+
+class IdleClient:
+    """Jedno połączenie Engine.IO/Socket.IO, które tylko odpowiada na ping."""
+
+    def __init__(self, url, game_id):
+        self.game_id = game_id
+        self.joined = False
+        self.rejected = False
+        self.lost = False
+        self.ws = websocket.create_connection(
+            f"{url}/socket.io/?EIO=4&transport=websocket&game_id={game_id}", timeout=30
+        )
+        # websocket-client zeruje ws.sock po zamknięciu - selektor potrzebuje stałego obiektu
+        self.sock = self.ws.sock
+        opening = self.ws.recv()
+        if not opening.startswith('0'):
+            raise RuntimeError(f"Nieoczekiwany pakiet otwarcia: {opening!r}")
+        self.ws.send('40')
+
+    def join(self, username):
+        self.ws.send('42' + json.dumps(['join_game', {'game_id': self.game_id, 'username': username}]))
+
+    @property
+    def finished(self):
+        return self.joined or self.rejected or self.lost
+
+    def on_readable(self, selector):
+        try:
+            packet = self.ws.recv()
+        except websocket.WebSocketConnectionClosedException:
+            # Serwer zamknął połączenie (np. pong nie zdążył przed ping_timeout)
+            self.lost = True
+            selector.unregister(self.sock)
+            return
+        if packet == '2':
+            self.ws.send('3')
+        elif packet.startswith('42'):
+            event = json.loads(packet[2:])[0]
+            if event == 'join_rejected':
+                self.rejected = True
+            elif event in ('update_player_list', 'round_state', 'drawer_changed'):
+                self.joined = True
+
+
+def pump(selector, seconds):
+    """Obsługuje przychodzące pakiety (pingi, zdarzenia pokoju) przez podany czas."""
+    deadline = time.monotonic() + seconds
+    while True:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return
+        for key, _ in selector.select(timeout):
+            key.data.on_readable(selector)
+
+
+def join_all(selector, clients, rooms, window):
+    """Dołącza klientów do pokoi, najwyżej `window` dołączeń naraz.
+
+    Wszystkie join_game wysłane jednocześnie ustawiłyby pongi w kolejce za
+    tysiącami handlerów i serwer zamykałby połączenia po ping_timeout.
+    """
+    finished = 0
+    for i, client in enumerate(clients):
+        client.join(f"gracz{i // rooms}")
+        while i + 1 - finished >= window:
+            pump(selector, 0.01)
+            while finished <= i and clients[finished].finished:
+                finished += 1
+    deadline = time.monotonic() + 60
+    while finished < len(clients) and time.monotonic() < deadline:
+        pump(selector, 0.1)
+        while finished < len(clients) and clients[finished].finished:
+            finished += 1
+
+
+def settle(selector, server_proc, seconds):
+    """Daje serwerowi chwilę bezczynności (obsługując pingi) i zwraca jego RSS."""
+    pump(selector, seconds)
+    return server_proc.memory_info().rss
+
+
+def raise_fd_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--join-window', type=int, default=50, help='Najwięcej dołączeń w toku naraz.')
+    parser.add_argument('--settle', type=float, default=3.0, help='Czas bezczynności przed pomiarem (s).')
+    args = parser.parse_args()
+
+    # Klient i serwer (dziedziczy limit) trzymają po jednym deskryptorze na połączenie
+    fd_limit = raise_fd_limit(args.connections + 1000)
+    if fd_limit < args.connections + 100:
+        parser.error(f"Limit deskryptorów ({fd_limit}) za niski dla {args.connections} połączeń (ulimit -n)")
+
+    per_room = -(-args.connections // args.rooms)
+    db_path = os.path.join(tempfile.mkdtemp(), 'idle_bench.db')
+    game_ids = prepare_database(db_path, args.rooms, max_players=per_room)
+    port = free_port()
+    server = start_server(port, db_path, {
+        'MAX_SOCKETS': str(args.connections), 'MAX_ACTIVE_ROOMS': str(args.rooms),
+        # Fala połączeń spowalnia pętlę - bez zrzucania obciążenia i sprzątania w tle
+        'SHED_LAG_MS': '0', 'JANITOR_INTERVAL': '0',
+    })
+    server_proc = psutil.Process(server.pid)
+    url = f"ws://127.0.0.1:{port}"
+    selector = selectors.DefaultSelector()
+    clients = []
+    try:
+        # Rozgrzewka: pierwsze połączenie ładuje leniwie importowane moduły serwera
+        warmup = IdleClient(url, game_ids[0])
+        warmup.ws.close()
+        baseline = settle(selector, server_proc, args.settle)
+
+        started = time.perf_counter()
+        for i in range(args.connections):
+            client = IdleClient(url, game_ids[i % args.rooms])
+            selector.register(client.sock, selectors.EVENT_READ, client)
+            clients.append(client)
+            if i % 500 == 499:
+                pump(selector, 0)
+        connect_time = time.perf_counter() - started
+        connected = settle(selector, server_proc, args.settle)
+
+        started = time.perf_counter()
+        join_all(selector, clients, args.rooms, args.join_window)
+        join_time = time.perf_counter() - started
+        joined = settle(selector, server_proc, args.settle)
+    finally:
+        for client in clients:
+            client.ws.close()
+        stop_servers([server])
+
+    mb = 1024 * 1024
+    n = args.connections
+    print(f"Połączenia: {n} w {args.rooms} pokojach ({per_room} na pokój)")
+    print(f"Dołączyło: {sum(c.joined for c in clients)}, odrzucono: {sum(c.rejected for c in clients)}, "
+          f"zerwanych: {sum(c.lost for c in clients)}")
+    print(f"Łączenie: {connect_time:.1f} s, dołączanie: {join_time:.1f} s")
+    print(f"{'etap':<22} {'RSS MB':>9} {'KB/połączenie':>14}")
+    print(f"{'bez klientów':<22} {baseline / mb:>9.1f} {'-':>14}")
+    print(f"{'połączeni (bez gry)':<22} {connected / mb:>9.1f} {(connected - baseline) / n / 1024:>14.1f}")
+    print(f"{'w pokojach':<22} {joined / mb:>9.1f} {(joined - baseline) / n / 1024:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Pojemność pokoi w trybie shardowanym vs liczba workerów.
+
+Dla każdej liczby workerów uruchamia tyle procesów serwera (run.py, eventlet),
+ile podano, z SHARD_NODES/SHARD_SELF jak w docker-compose.sharded.yml. Rolę
+nginx pełni tu HashRing: każdy klient łączy się z workerem, do którego
+`hash $game_id consistent` skierowałby jego pokój.
+
+W każdym pokoju rysujący wysyła drawing_data ze stałą częstotliwością,
+a pozostali gracze mierzą opóźnienie draw_line. Obciążenie mieści się
+w normie (SLA), jeśli dostarczono >= 99% zdarzeń, a p95 opóźnienia mieści się
+w budżecie.
+
+Pojemność to największa liczba pokoi w normie: liczba pokoi rośnie od
+--start-rooms (razy --growth) do pierwszego pomiaru poza normą, a potem jest
+zawężana bisekcją między ostatnim udanym a nieudanym pomiarem.
+
+Uruchomienie (z katalogu web/):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/shard_capacity.py --workers 1,2,4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from harness import prepare_database, free_port, start_server, stop_servers, connect_client, percentile
+
+from app.sharding import HashRing
+
+
+def run_rooms(task):
+    """Proces generatora ruchu: obsługuje część pokoi i zwraca statystyki."""
+    rooms, nodes, players, rate, duration = task
+    ring = HashRing(nodes)
+    latencies = []
+    received = [0]
+    lock = threading.Lock()
+
+    def on_draw_line(data):
+        latency = time.time() - float(data['x1'])
+        with lock:
+            received[0] += 1
+            latencies.append(latency)
+
+    clients = []
+    drawers = []
+    for game_id in rooms:
+        url = f"http://{ring.node_for(game_id)}"
+        for i in range(players):
+            client = connect_client(url, game_id, draw_line=on_draw_line)
+            client.emit('join_game', {'game_id': game_id, 'username': f"gracz{i}"})
+            clients.append(client)
+            if i == 0:
+                drawers.append((game_id, client))
+    time.sleep(1.0)
+
+    sent = [0]
+
+    def draw(game_id, client):
+        interval = 1.0 / rate
+        next_at = time.monotonic()
+        end = next_at + duration
+        while next_at < end:
+            client.emit('drawing_data', {
+                'game_id': game_id, 'x1': time.time(), 'y1': 0, 'x2': 1, 'y2': 1,
+                'color': '#000000', 'width': 2
+            })
+            with lock:
+                sent[0] += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    threads = [threading.Thread(target=draw, args=d) for d in drawers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(1.0)
+
+    for client in clients:
+        client.disconnect()
+    return sent[0] * (players - 1), received[0], latencies
+
+
+def measure(worker_count, rooms, args, db_path):
+    """Jeden pomiar: rooms pokoi na worker_count workerach. Zwraca (oczekiwane, dostarczone, opóźnienia)."""
+    # Świeża baza dla każdego pomiaru: tyle gier, ile pokoi w tym kroku. Zatrzymanie
+    # serwera (SIGTERM) zostawia graczy poprzedniego pomiaru w bazie
+    game_ids = prepare_database(db_path, rooms)
+    ports = [free_port() for _ in range(worker_count)]
+    nodes = [f"127.0.0.1:{p}" for p in ports]
+    procs = [
+        start_server(port, db_path, {'SHARD_NODES': ','.join(nodes), 'SHARD_SELF': node})
+        for port, node in zip(ports, nodes)
+    ]
+    try:
+        loaders = args.load_processes
+        tasks = [
+            (game_ids[i::loaders], nodes, args.players, args.rate, args.duration)
+            for i in range(loaders)
+        ]
+        with multiprocessing.Pool(loaders) as pool:
+            results = pool.map(run_rooms, tasks)
+    finally:
+        stop_servers(procs)
+
+    expected = sum(r[0] for r in results)
+    received = sum(r[1] for r in results)
+    latencies = [lat for r in results for lat in r[2]]
+    return expected, received, latencies
+
+
+def within_sla(result, args):
+    expected, received, latencies = result
+    return expected > 0 and received / expected >= 0.99 and percentile(latencies, 95) <= args.latency_budget
+
+
+def print_step(worker_count, rooms, result, args, ok):
+    expected, received, latencies = result
+    delivered_ratio = received / expected if expected else 0.0
+    print(f"{worker_count:>8} {rooms:>7} {received / args.duration:>14,.0f} {delivered_ratio:>11.1%} "
+          f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+          f"{'tak' if ok else 'NIE':>5}", flush=True)
+
+
+def find_capacity(worker_count, args, db_path):
+    """Największa liczba pokoi w normie (0, gdy nie mieści się nawet --start-rooms)."""
+    def step(rooms):
+        result = measure(worker_count, rooms, args, db_path)
+        ok = within_sla(result, args)
+        print_step(worker_count, rooms, result, args, ok)
+        return ok
+
+    passed, failed = 0, None
+    rooms = args.start_rooms
+    while rooms <= args.max_rooms:
+        if not step(rooms):
+            failed = rooms
+            break
+        passed = rooms
+        rooms = max(rooms + 1, int(rooms * args.growth))
+    # Bisekcja do dokładności --precision (względem ostatniego udanego pomiaru)
+    while failed is not None and failed - passed > max(1, passed * args.precision):
+        rooms = (passed + failed) // 2
+        if step(rooms):
+            passed = rooms
+        else:
+            failed = rooms
+    return passed, failed is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='Liczby workerów do porównania, np. 1,2,4')
+    parser.add_argument('--start-rooms', type=int, default=25, help='Liczba pokoi w pierwszym pomiarze.')
+    parser.add_argument('--growth', type=float, default=1.5, help='Mnożnik liczby pokoi między pomiarami.')
+    parser.add_argument('--max-rooms', type=int, default=2000, help='Górny limit (np. przez limit klientów).')
+    parser.add_argument('--precision', type=float, default=0.1, help='Dokładność bisekcji (ułamek pojemności).')
+    parser.add_argument('--players', type=int, default=4, help='Graczy na pokój (1 rysujący).')
+    parser.add_argument('--rate', type=float, default=30.0, help='drawing_data/s na pokój.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Czas pomiaru (s).')
+    parser.add_argument('--latency-budget', type=float, default=0.1, help='Budżet p95 opóźnienia (s).')
+    parser.add_argument('--load-processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'shard_bench.db')
+
+    print(f"Pokoje po {args.players} graczy, {args.rate:g} drawing_data/s na pokój, "
+          f"norma: >= 99% dostarczonych i p95 <= {args.latency_budget * 1000:g} ms")
+    print(f"{'workery':>8} {'pokoje':>7} {'dostarczone/s':>14} {'dostarczono':>12} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'norma':>5}")
+    capacities = []
+    for worker_count in (int(w) for w in args.workers.split(',')):
+        capacities.append((worker_count, *find_capacity(worker_count, args, db_path)))
+
+    print()
+    print(f"{'workery':>8} {'pojemność (pokoje)':>19} {'vs 1. pomiar':>13}")
+    baseline = capacities[0][1]
+    for worker_count, capacity, hit_limit in capacities:
+        scale = f"x{capacity / baseline:.2f}" if baseline else '-'
+        limit = f"  (>= {capacity}, osiągnięto --max-rooms)" if hit_limit else ''
+        print(f"{worker_count:>8} {capacity:>19} {scale:>13}{limit}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Porównanie trybów serwera: eventlet (run.py) vs ASGI (uvicorn run_asgi:app).
+
+Dla każdego trybu uruchamia serwer, łączy klientów (po kilku na pokój, każdy
+wysyła join_game), a potem rysujący we wszystkich pokojach wysyłają drawing_data
+ze stałą częstotliwością. Czas CPU procesu serwera (psutil) pozwala podać wyniki
+na rdzeń: połączenia/s na rdzeń i dostarczone zdarzenia/s na rdzeń.
+
+Uruchomienie (z katalogu web/):
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/socket_load.py --runtime eventlet,asgi --rooms 50 --players 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+from harness import prepare_database, free_port, start_server, stop_servers, connect_client, percentile
+
+SERVER_COMMANDS = {
+    'eventlet': lambda port: [sys.executable, 'run.py'],
+    'asgi': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'run_asgi:app',
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'
+    ],
+}
+
+
+def load_process(url, rooms, players, rate, duration, barrier, results):
+    received = [0]
+    latencies = []
+    lock = threading.Lock()
+
+    def on_draw_line(data):
+        latency = time.time() - float(data['x1'])
+        with lock:
+            received[0] += 1
+            latencies.append(latency)
+
+    clients = []
+    drawers = []
+    for game_id in rooms:
+        for i in range(players):
+            client = connect_client(url, game_id, draw_line=on_draw_line)
+            client.emit('join_game', {'game_id': game_id, 'username': f"gracz{i}"})
+            clients.append(client)
+            if i == 0:
+                drawers.append((game_id, client))
+    barrier.wait()  # 1: wszyscy połączeni
+    barrier.wait()  # 2: start rysowania
+
+    sent = [0]
+
+    def draw(game_id, client):
+        interval = 1.0 / rate
+        next_at = time.monotonic()
+        end = next_at + duration
+        while next_at < end:
+            client.emit('drawing_data', {
+                'game_id': game_id, 'x1': time.time(), 'y1': 0, 'x2': 1, 'y2': 1,
+                'color': '#000000', 'width': 2
+            })
+            with lock:
+                sent[0] += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    threads = [threading.Thread(target=draw, args=d) for d in drawers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(0.5)
+    barrier.wait()  # 3: koniec rysowania
+
+    for client in clients:
+        client.disconnect()
+    results.put((sent[0] * (players - 1), received[0], latencies))
+
+
+def cpu_seconds(proc):
+    times = proc.cpu_times()
+    return times.user + times.system
+
+
+def measure(runtime, args, db_path):
+    game_ids = prepare_database(db_path, args.rooms)
+    port = free_port()
+    server = start_server(port, db_path, command=SERVER_COMMANDS[runtime](port))
+    server_proc = psutil.Process(server.pid)
+    url = f"http://127.0.0.1:{port}"
+
+    loaders = args.load_processes
+    barrier = multiprocessing.Barrier(loaders + 1)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=load_process, args=(
+            url, game_ids[i::loaders], args.players, args.rate, args.duration, barrier, results
+        ))
+        for i in range(loaders)
+    ]
+    try:
+        cpu_start, wall_start = cpu_seconds(server_proc), time.perf_counter()
+        for p in procs:
+            p.start()
+        barrier.wait()
+        connect_cpu = cpu_seconds(server_proc) - cpu_start
+        connect_wall = time.perf_counter() - wall_start
+
+        cpu_start, wall_start = cpu_seconds(server_proc), time.perf_counter()
+        barrier.wait()
+        barrier.wait()
+        events_cpu = cpu_seconds(server_proc) - cpu_start
+        events_wall = time.perf_counter() - wall_start
+
+        collected = [results.get(timeout=60) for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        stop_servers([server])
+
+    connections = args.rooms * args.players
+    received = sum(r[1] for r in collected)
+    expected = sum(r[0] for r in collected)
+    latencies = [lat for r in collected for lat in r[2]]
+    return {
+        'connections': connections,
+        'conn_per_s': connections / connect_wall,
+        'conn_per_core': connections / connect_cpu if connect_cpu else float('inf'),
+        'events_per_s': received / events_wall,
+        'events_per_core': received / events_cpu if events_cpu else float('inf'),
+        'delivered': received / expected if expected else 0.0,
+        'p95_ms': percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runtime', default='eventlet,asgi', help='Tryby do porównania: eventlet, asgi')
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--players', type=int, default=5)
+    parser.add_argument('--rate', type=float, default=30.0, help='drawing_data/s na pokój.')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--load-processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'load_bench.db')
+    print(f"{args.rooms} pokoi x {args.players} graczy, {args.rate:g} drawing_data/s na pokój, {args.duration:g} s")
+    print(f"{'tryb':>9} {'poł./s':>8} {'poł./s/rdzeń':>13} {'zdarz./s':>9} {'zdarz./s/rdzeń':>15} "
+          f"{'dostarczono':>12} {'p95 ms':>7}")
+    for runtime in args.runtime.split(','):
+        r = measure(runtime, args, db_path)
+        print(f"{runtime:>9} {r['conn_per_s']:>8,.0f} {r['conn_per_core']:>13,.0f} {r['events_per_s']:>9,.0f} "
+              f"{r['events_per_core']:>15,.0f} {r['delivered']:>11.1%} {r['p95_ms']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,4 +2,17 @@
 # wait for DB (simple loop) - optional: you can use better wait-for script
 sleep 1
 # Run DB migrations? (not implemented here) - just start app
-exec gunicorn --worker-class eventlet -w 1 -b 0.0.0.0:5000 "run:app"
+# Baza sprzed nowych kolumn: brakujące kolumny i indeksy gier, graczy i haseł (idempotentne)
+flask --app run.py schema upgrade
+# Pliki statyczne z hashem + .gz do wspólnego wolumenu (serwuje je nginx)
+if [ "${BUILD_ASSETS:-1}" = "1" ]; then
+    flask --app run.py assets build
+fi
+# RUNTIME=asgi - handlery Socket.IO na asyncio (app/asgi.py) zamiast eventlet
+if [ "${RUNTIME:-eventlet}" = "asgi" ]; then
+    exec uvicorn run_asgi:app --host 0.0.0.0 --port 5000
+fi
+# Każdy websocket zajmuje jedno połączenie workera - domyślne 1000 gunicorna ucinałoby
+# połączenia poniżej limitów kontroli przyjęć (jak max_size w run.py)
+WORKER_CONNECTIONS=${MAX_CONNECTIONS:-$(( ${MAX_SOCKETS:-5000} + ${ADMISSION_QUEUE_LIMIT:-1000} + 1024 ))}
+exec gunicorn --worker-class eventlet -w 1 --worker-connections "$WORKER_CONNECTIONS" -b 0.0.0.0:5000 "run:app"
@@ -1,7 +1,12 @@
+import os
 from app import create_app, socketio
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Każdy websocket zajmuje greenthread serwera WSGI na cały czas połączenia - domyślna
+    # pula eventlet (1024) ucinałaby połączenia dużo poniżej limitów kontroli przyjęć
+    max_connections = int(os.environ.get('MAX_CONNECTIONS') or
+                          app.config['MAX_SOCKETS'] + app.config['ADMISSION_QUEUE_LIMIT'] + 1024)
     # Ważne: używamy socketio.run(), a nie app.run()
-    socketio.run(app, host='0.0.0.0', port=5000)
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), max_size=max_connections)